@@ -0,0 +1 @@
+# Micro/macro benchmarks. Run from the repo root: python -m benchmarks.<name> [args]
@@ -0,0 +1,227 @@
+"""
+Shared helpers for benchmarks: realistic event shapes, synthetic journals, timing.
+Benchmarks run outside the packaged app, so APPDATA falls back to the temp dir.
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("APPDATA", tempfile.gettempdir())
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+TS = "2026-03-14T18:22:05Z"
+
+# fmt: off
+EVENT_SHAPES = {
+    "FSDJump": {
+        "timestamp": TS, "event": "FSDJump", "Taxi": False, "Multicrew": False,
+        "StarSystem": "Synuefe XR-H d11-102", "SystemAddress": 3515254557027,
+        "StarPos": [357.34375, -49.34375, -74.75], "SystemAllegiance": "",
+        "SystemEconomy": "$economy_None;", "SystemEconomy_Localised": "None",
+        "SystemSecondEconomy": "$economy_None;", "SystemSecondEconomy_Localised": "None",
+        "SystemGovernment": "$government_None;", "SystemGovernment_Localised": "None",
+        "SystemSecurity": "$GAlAXY_MAP_INFO_state_anarchy;",
+        "SystemSecurity_Localised": "Anarchy", "Population": 0, "Body": "Synuefe XR-H d11-102 A",
+        "BodyID": 1, "BodyType": "Star", "JumpDist": 48.512, "FuelUsed": 5.31, "FuelLevel": 26.4,
+    },
+    "Scan": {
+        "timestamp": TS, "event": "Scan", "ScanType": "Detailed",
+        "BodyName": "Synuefe XR-H d11-102 A 3", "BodyID": 14,
+        "Parents": [{"Star": 1}, {"Null": 0}], "StarSystem": "Synuefe XR-H d11-102",
+        "SystemAddress": 3515254557027, "DistanceFromArrivalLS": 1123.41, "TidalLock": False,
+        "TerraformState": "", "PlanetClass": "High metal content body",
+        "Atmosphere": "thin sulfur dioxide atmosphere", "AtmosphereType": "SulphurDioxide",
+        "AtmosphereComposition": [{"Name": "SulphurDioxide", "Percent": 100.0}],
+        "Volcanism": "", "MassEM": 0.62, "Radius": 5120330.5, "SurfaceGravity": 9.41,
+        "SurfaceTemperature": 512.3, "SurfacePressure": 4120.7, "Landable": True,
+        "Materials": [
+            {"Name": n, "Percent": p}
+            for n, p in (("iron", 21.3), ("nickel", 16.1), ("sulphur", 15.9), ("carbon", 13.4),
+                         ("chromium", 9.6), ("manganese", 8.8), ("phosphorus", 8.6),
+                         ("zinc", 5.8), ("niobium", 1.4), ("tungsten", 1.2))
+        ],
+        "Composition": {"Ice": 0.0, "Rock": 0.67, "Metal": 0.33}, "SemiMajorAxis": 3.36e11,
+        "Eccentricity": 0.0012, "OrbitalInclination": -0.07, "Periapsis": 211.5,
+        "OrbitalPeriod": 8.1e7, "AscendingNode": 97.2, "MeanAnomaly": 301.4,
+        "RotationPeriod": 121033.2, "AxialTilt": 0.21, "WasDiscovered": False,
+        "WasMapped": False, "WasFootfalled": False,
+    },
+    "Loadout": {
+        "timestamp": TS, "event": "Loadout", "Ship": "anaconda", "ShipID": 12,
+        "ShipName": "Silent Running", "ShipIdent": "TAO-03", "HullValue": 142447820,
+        "ModulesValue": 612335221, "HullHealth": 1.0, "UnladenMass": 1101.8, "CargoCapacity": 64,
+        "MaxJumpRange": 72.81, "FuelCapacity": {"Main": 32.0, "Reserve": 1.07}, "Rebuy": 37739152,
+        "Modules": [
+            {
+                "Slot": f"Slot{i:02d}_Size{1 + i % 6}",
+                "Item": f"int_module_size{1 + i % 6}_class5",
+                "On": True, "Priority": i % 4, "Health": 1.0, "Value": 1000000 + i * 777,
+                "Engineering": {
+                    "Engineer": "Felicity Farseer", "EngineerID": 300100, "BlueprintID": 128673693,
+                    "BlueprintName": "Misc_LightWeight", "Level": 5, "Quality": 1.0,
+                    "Modifiers": [
+                        {"Label": "Mass", "Value": 1.3, "OriginalValue": 2.6, "LessIsGood": 1},
+                        {"Label": "Integrity", "Value": 40.0, "OriginalValue": 51.0,
+                         "LessIsGood": 0},
+                    ],
+                },
+            }
+            for i in range(28)
+        ],
+    },
+    "Materials": {
+        "timestamp": TS, "event": "Materials",
+        "Raw": [{"Name": f"raw_{i}", "Count": 150 + i} for i in range(30)],
+        "Manufactured": [
+            {"Name": f"manufactured_{i}", "Name_Localised": f"Manufactured {i}", "Count": 90 + i}
+            for i in range(60)
+        ],
+        "Encoded": [
+            {"Name": f"encoded_{i}", "Name_Localised": f"Encoded {i}", "Count": 120 + i}
+            for i in range(45)
+        ],
+    },
+    "ShipLocker": {
+        "timestamp": TS, "event": "ShipLocker",
+        "Items": [
+            {"Name": f"item_{i}", "Name_Localised": f"Item {i}", "OwnerID": 0, "Count": 1 + i % 9}
+            for i in range(40)
+        ],
+        "Components": [
+            {"Name": f"component_{i}", "Name_Localised": f"Component {i}", "OwnerID": 0,
+             "Count": 5 + i}
+            for i in range(20)
+        ],
+        "Consumables": [
+            {"Name": n, "Name_Localised": n.title(), "OwnerID": 0, "Count": 4}
+            for n in ("healthpack", "energycell", "amm_grenade_emp", "amm_grenade_frag")
+        ],
+        "Data": [
+            {"Name": f"data_{i}", "Name_Localised": f"Data {i}", "OwnerID": 0, "MissionID": 0,
+             "Count": 1 + i % 4}
+            for i in range(50)
+        ],
+    },
+    "Statistics": {
+        "timestamp": TS, "event": "Statistics",
+        **{
+            section: {f"{section}_Stat_{i}": i * 1117 for i in range(12)}
+            for section in ("Bank_Account", "Combat", "Crime", "Smuggling", "Trading", "Mining",
+                            "Exploration", "Passengers", "Search_And_Rescue", "Crafting", "Crew",
+                            "Multicrew", "Material_Trader_Stats", "Exobiology")
+        },
+    },
+}
+
+# Rough event mix of an exploration-heavy session (weights ~ lines per hour)
+_NOISE_SHAPES = {
+    "Music": {"timestamp": TS, "event": "Music", "MusicTrack": "Supercruise"},
+    "ReceiveText": {
+        "timestamp": TS, "event": "ReceiveText", "From": "", "Message": "$COMMS_entered:#name=X;",
+        "Message_Localised": "Entered Channel: X", "Channel": "npc",
+    },
+    "FuelScoop": {"timestamp": TS, "event": "FuelScoop", "Scooped": 5.0, "Total": 32.0},
+    "FSSSignalDiscovered": {
+        "timestamp": TS, "event": "FSSSignalDiscovered", "SystemAddress": 3515254557027,
+        "SignalName": "$MULTIPLAYER_SCENARIO42_TITLE;", "SignalType": "NavBeacon",
+        "IsStation": False,
+    },
+    "ShieldState": {"timestamp": TS, "event": "ShieldState", "ShieldsUp": True},
+    "StartJump": {"timestamp": TS, "event": "StartJump", "JumpType": "Hyperspace"},
+    "SupercruiseExit": {
+        "timestamp": TS, "event": "SupercruiseExit", "Taxi": False, "Multicrew": False,
+        "StarSystem": "Sol", "SystemAddress": 10477373803, "Body": "Earth", "BodyID": 3,
+        "BodyType": "Planet",
+    },
+}
+_MIX = {
+    "Music": 30, "ReceiveText": 25, "FuelScoop": 40, "FSSSignalDiscovered": 35,
+    "ShieldState": 2, "StartJump": 10, "SupercruiseExit": 6,
+    "FSDJump": 10, "Scan": 45, "Loadout": 2, "Materials": 1,
+}
+# fmt: on
+
+
+def synthetic_journal(path, lines=50_000, seed=7):
+    """Writes a journal with a realistic event mix. Returns the path."""
+    rng = random.Random(seed)
+    shapes = {**_NOISE_SHAPES, **EVENT_SHAPES}
+    names = list(_MIX)
+    weights = [_MIX[n] for n in names]
+    path = Path(path)
+    with open(path, "w", encoding="utf-8") as f:
+        header = {
+            "timestamp": TS,
+            "event": "Fileheader",
+            "part": 1,
+            "Odyssey": True,
+            "gameversion": "4.1.0.100",
+            "build": "r310000/r0 ",
+        }
+        f.write(json.dumps(header, separators=(", ", ":")) + "\n")
+        load = {
+            "timestamp": TS,
+            "event": "LoadGame",
+            "Commander": "Bench",
+            "Horizons": True,
+            "Odyssey": True,
+            "gameversion": "4.1.0.100",
+            "build": "r310000/r0 ",
+        }
+        f.write(json.dumps(load, separators=(", ", ":")) + "\n")
+        for _ in range(lines):
+            name = rng.choices(names, weights)[0]
+            f.write(json.dumps(shapes[name], separators=(", ", ":")) + "\n")
+    return path
+
+
+def journal_arg(default_lines=50_000):
+    """Journal from argv[1] (a real Journal.*.log), or a synthetic one in the temp dir."""
+    if len(sys.argv) > 1:
+        return Path(sys.argv[1])
+    return synthetic_journal(
+        Path(tempfile.gettempdir()) / "skylink_bench_journal.log", lines=default_lines
+    )
+
+
+def best_of(fn, repeat=5, number=1):
+    """Best wall time in seconds for `number` calls of fn, over `repeat` runs."""
+    return compare([fn], repeat=repeat, number=number)[0]
+
+
+def compare(fns, repeat=7, number=1):
+    """
+    Best times for several callables, interleaved run by run to even out machine noise.
+    GC is disabled while timing, as in timeit.
+    """
+    best = [float("inf")] * len(fns)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for i, fn in enumerate(fns):
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                best[i] = min(best[i], time.perf_counter() - start)
+                gc.collect()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def report(title, rows):
+    """Prints rows of (label, value) aligned under a title."""
+    print(f"\n== {title} ==")
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f"  {label.ljust(width)}  {value}")
@@ -0,0 +1,43 @@
+"""
+Request body compression on the bundled event shapes and on a 50-event batch: bytes on
+the wire and CPU per body for each available algorithm, plus the transfer time saved on a
+slow link (default 256 kbit/s, roughly a congested satellite or mobile uplink).
+Usage: python -m benchmarks.bench_compression [link_kbit_per_sec]
+"""
+
+import sys
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, compare, report
+from src.services import json_codec
+from src.services.body_compressor import GZIP, ZSTD, BodyCompressor
+
+NUMBER = 200
+
+
+def main():
+    link_bytes_per_sec = (float(sys.argv[1]) if len(sys.argv) > 1 else 256) * 1000 / 8
+    compressors = [BodyCompressor("bench", GZIP, min_bytes=0)]
+    zstd = BodyCompressor("bench", ZSTD, min_bytes=0)
+    if zstd.algorithm == ZSTD:
+        compressors.append(zstd)
+    bodies = {name: json_codec.dumps(event) for name, event in EVENT_SHAPES.items()}
+    bodies["batch of 50 Scan"] = json_codec.dumps([EVENT_SHAPES["Scan"]] * 50)
+    for name, body in bodies.items():
+        times = compare([lambda c=c: c.encode(body) for c in compressors], number=NUMBER)
+        rows = []
+        for compressor, elapsed in zip(compressors, times):
+            packed, _ = compressor.encode(body)
+            saved_ms = (len(body) - len(packed)) / link_bytes_per_sec * 1000
+            rows.append(
+                (
+                    compressor.algorithm,
+                    f"{len(packed):7d} bytes ({len(packed) / len(body):5.1%}), "
+                    f"{elapsed * 1e6 / NUMBER:7.1f} us, -{saved_ms:.0f} ms on the link",
+                )
+            )
+        report(f"{name} ({len(body)} bytes raw)", rows)
+
+
+if __name__ == "__main__":
+    main()
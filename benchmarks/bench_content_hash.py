@@ -0,0 +1,55 @@
+"""
+Dedup content digest per event: the old inline formula (copy + json.dumps(sort_keys) +
+sha256), the legacy-compatible scheme and the default blake2b scheme. Events are filtered
+through the events.json field rules first, as the sender does before hashing.
+Usage: python -m benchmarks.bench_content_hash
+"""
+
+import hashlib
+import json
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, compare, report
+from config import Config
+from src.services import content_hash, json_codec
+from utils import filter_event_fields
+
+NUMBER = 2000
+
+
+def old_formula(event, commander):
+    content_to_hash = event.copy()
+    content_to_hash.pop("timestamp", None)
+    content_to_hash.pop("event", None)
+    content_str = f"{commander}|{json.dumps(content_to_hash, sort_keys=True)}"
+    return hashlib.sha256(content_str.encode("utf-8")).hexdigest()
+
+
+def main():
+    config = Config()
+    print(f"Active JSON backend: {json_codec.backend_name()}")
+    for event_type, shape in EVENT_SHAPES.items():
+        rules = config.field_rules.get("filters", {}).get(event_type, {})
+        event = filter_event_fields(shape, rules)
+        size = len(json.dumps(event))
+        # The legacy scheme must stay byte-compatible with the old formula
+        legacy = content_hash.legacy_digest(event, "Bench")
+        assert legacy == bytes.fromhex(old_formula(event, "Bench"))[:16]
+        t_old, t_legacy, t_fast = compare(
+            [
+                lambda: old_formula(event, "Bench"),
+                lambda: content_hash.legacy_digest(event, "Bench"),
+                lambda: content_hash.fast_digest(event, "Bench"),
+            ],
+            number=NUMBER,
+        )
+        rows = [
+            ("old inline sha256", f"{t_old * 1e6 / NUMBER:7.1f} us"),
+            ("sha256 (legacy)", f"{t_legacy * 1e6 / NUMBER:7.1f} us"),
+            ("blake2b", f"{t_fast * 1e6 / NUMBER:7.1f} us ({t_old / t_fast:.1f}x)"),
+        ]
+        report(f"{event_type} ({size} bytes after field filter)", rows)
+
+
+if __name__ == "__main__":
+    main()
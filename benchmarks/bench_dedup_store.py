@@ -0,0 +1,66 @@
+"""
+Per-event cost of persisting one dedup hash: the legacy full rewrite of
+deduplication_cache.json (indent=2, the whole dict every time) against one append to the
+DedupStore log. Compaction runs are included in the append timing.
+Usage: python -m benchmarks.bench_dedup_store [events]
+"""
+
+import hashlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import compare, report
+from src.services.dedup_store import DedupStore
+
+
+def _hashes(size):
+    return {
+        f"Cmdr{i % 7}|Event{i}": hashlib.sha256(str(i).encode()).hexdigest() for i in range(size)
+    }
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rows = []
+    for size in (100, 1_000, 10_000):
+        base = Path(tempfile.mkdtemp())
+        hashes = _hashes(size)
+        keys = list(hashes)
+        legacy_path = base / "legacy.json"
+        store = DedupStore(base / "deduplication_cache.json")
+        for key, value in hashes.items():
+            store.put(key, value)
+        store.compact(wait=True)
+
+        runs = iter(range(1_000_000))  # fresh values per run: an unchanged put is a no-op
+
+        def legacy():
+            run = next(runs)
+            for i in range(events):
+                hashes[keys[i % size]] = f"{run:032x}{i:032x}"
+                with open(legacy_path, "w") as f:
+                    json.dump(hashes, f, indent=2)
+
+        def append_log():
+            run = next(runs)
+            for i in range(events):
+                store.put(keys[i % size], f"{run:032x}{i:032x}")
+
+        legacy_sec, append_sec = compare([legacy, append_log], repeat=3)
+        store.close()
+        rows.append(
+            (
+                f"{size:>6} entries",
+                f"full rewrite {legacy_sec / events * 1e6:8.1f} us/event, "
+                f"append {append_sec / events * 1e6:6.1f} us/event "
+                f"({legacy_sec / append_sec:.0f}x)",
+            )
+        )
+    report(f"dedup cache write per event ({events} events)", rows)
+
+
+if __name__ == "__main__":
+    main()
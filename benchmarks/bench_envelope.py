@@ -0,0 +1,100 @@
+"""
+Retry storm: every event fails its live attempts, goes to the offline queue and is then
+replayed. The legacy path encodes the event for each attempt, rebuilds the headers
+(base64 of the commander name) per request, encodes again for the offline queue and
+decodes + re-encodes on replay. Envelopes encode once and share cached headers.
+Reports CPU per event and the peak memory traced while a whole storm is in flight.
+Usage: python -m benchmarks.bench_envelope [attempts]
+"""
+
+import base64
+import sys
+import tracemalloc
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, compare, report
+from src.services import json_codec
+from src.services.envelope import Envelope, portal_headers
+
+EVENTS = 200
+URL = "https://example.invalid/api/telemetry/skylink"
+USER_AGENT = "SkyLink-Bench"
+
+
+def legacy_headers(commander):
+    return {
+        "Content-Type": "application/json",
+        "User-Agent": USER_AGENT,
+        "x-api-key": "key",
+        "x-commander": base64.b64encode(commander.encode("utf-8")).decode("ascii"),
+    }
+
+
+def legacy_storm(events, attempts):
+    sent = []
+    for event in events:
+        for _ in range(attempts):
+            sent.append((json_codec.dumps(event), legacy_headers("Bench")))
+        stored = json_codec.dumps(event)  # офлайн-очередь
+        replayed = json_codec.loads(stored)
+        sent.append((json_codec.dumps(replayed), legacy_headers("Bench")))
+    return sent
+
+
+def envelope_storm(events, attempts):
+    sent = []
+    for event in events:
+        envelope = Envelope.encode(event, "Bench", portal_headers("Bench", "key", USER_AGENT), URL)
+        for _ in range(attempts):
+            sent.append((envelope.body, envelope.headers))
+            envelope = envelope.retried()
+        # офлайн-очередь хранит тело как есть; воспроизведение строит конверт без декодирования
+        replayed = Envelope(
+            envelope.body,
+            envelope.event_type,
+            envelope.commander,
+            portal_headers("Bench", "key", USER_AGENT),
+            URL,
+            envelope.attempt,
+            envelope.queued,
+        )
+        sent.append((replayed.body, replayed.headers))
+    return sent
+
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"Active JSON backend: {json_codec.backend_name()}, {attempts} live attempts")
+    for event_type, shape in EVENT_SHAPES.items():
+        events = [dict(shape, BodyID=i) for i in range(EVENTS)]
+        t_legacy, t_envelope = compare(
+            [lambda: legacy_storm(events, attempts), lambda: envelope_storm(events, attempts)]
+        )
+        m_legacy = peak_bytes(lambda: legacy_storm(events, attempts))
+        m_envelope = peak_bytes(lambda: envelope_storm(events, attempts))
+        rows = [
+            (
+                "legacy re-encode",
+                f"{t_legacy * 1e6 / EVENTS:7.1f} us/event, peak {m_legacy / 1024:7.0f} KiB",
+            ),
+            (
+                "envelope",
+                f"{t_envelope * 1e6 / EVENTS:7.1f} us/event, peak {m_envelope / 1024:7.0f} KiB "
+                f"({t_legacy / t_envelope:.1f}x, {m_legacy / m_envelope:.1f}x less memory)",
+            ),
+        ]
+        size = len(json_codec.dumps(shape))
+        report(f"{event_type} ({size} bytes, {EVENTS} events)", rows)
+
+
+if __name__ == "__main__":
+    main()
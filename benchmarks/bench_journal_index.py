@@ -0,0 +1,57 @@
+"""
+Finding the latest journal in a veteran-sized directory: glob + stat (previous
+behaviour) vs the in-memory JournalIndex, plus incremental rollover.
+Usage: python -m benchmarks.bench_journal_index [journal_count]
+"""
+
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import compare, report
+from src.services.journal_index import JournalIndex
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        journal_dir = Path(tmp)
+        start = datetime(2021, 5, 19, 12, 0, 0)
+        for i in range(count):
+            stamp = (start + timedelta(hours=7 * i)).strftime("%Y-%m-%dT%H%M%S")
+            (journal_dir / f"Journal.{stamp}.01.log").touch()
+        (journal_dir / "JournalAlpha.2099-01-01T000000.01.log").touch()
+
+        def glob_and_stat():
+            return max(journal_dir.glob("Journal.*.log"), key=lambda f: f.stat().st_mtime)
+
+        def index_build():
+            index = JournalIndex(journal_dir)
+            index.build()
+            return index.latest()
+
+        index = JournalIndex(journal_dir)
+        index.build()
+        rollover_names = [f"Journal.2099-01-01T{h:02d}0000.01.log" for h in range(24)]
+
+        def rollover():
+            for name in rollover_names:
+                index.add(name)
+            for name in rollover_names:
+                index.remove(name)
+
+        t_glob, t_build, t_roll = compare([glob_and_stat, index_build, rollover], repeat=5)
+        report(
+            f"Latest journal among {count} files",
+            [
+                ("glob + stat every file", f"{t_glob * 1000:.2f} ms"),
+                ("JournalIndex.build + latest", f"{t_build * 1000:.2f} ms"),
+                ("rollover (add + remove)", f"{t_roll * 1e6 / len(rollover_names):.1f} us"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
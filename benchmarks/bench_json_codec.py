@@ -0,0 +1,36 @@
+"""
+JSON backends on the bundled event shapes: decode, compact encode, canonical encode.
+Usage: python -m benchmarks.bench_json_codec
+"""
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, compare, report
+from src.services import json_codec
+
+NUMBER = 2000
+
+
+def main():
+    backends = [json_codec.get_backend(name) for name in json_codec.available_backends()]
+    print(f"Active backend: {json_codec.backend_name()}")
+    for event_type, event in EVENT_SHAPES.items():
+        raw = json_codec.get_backend("json").dumps(event)
+        size = len(raw)
+        rows = []
+        for backend in backends:
+            # Decoded objects must be equal across backends, so dedup hashes match too
+            assert backend.loads(raw) == event, backend.name
+            t_loads, t_dumps = compare(
+                [lambda b=backend: b.loads(raw), lambda b=backend: b.dumps(event)],
+                number=NUMBER,
+            )
+            per_loads = t_loads * 1e6 / NUMBER
+            per_dumps = t_dumps * 1e6 / NUMBER
+            rows.append((backend.name, f"loads {per_loads:7.1f} us   dumps {per_dumps:7.1f} us"))
+        (t_canonical,) = compare([lambda: json_codec.dumps_canonical(event)], number=NUMBER)
+        rows.append(("canonical", f"dumps {t_canonical * 1e6 / NUMBER:7.1f} us (stdlib, all)"))
+        report(f"{event_type} ({size} bytes)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+API-key lookup per event for a fleet of commanders: the legacy linear case-insensitive scan
+(with accounts.json re-read on every miss) against the KeyResolver index. Three cases: a
+name spelled as in accounts.json, a name in another case, and a commander with no key.
+Usage: python -m benchmarks.bench_key_resolution [commanders]
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import compare, report
+from config import Config
+from src.services.key_resolver import KeyResolver
+
+NUMBER = 2000
+
+
+def legacy_lookup(config, name):
+    """Sender._find_key_insensitive + the reload from disk on a miss, as before."""
+
+    def find(accounts):
+        if name in accounts:
+            return accounts[name]
+        target = name.lower()
+        for account, key in accounts.items():
+            if account.lower() == target:
+                return key
+        return None
+
+    api_key = find(config.accounts)
+    if api_key:
+        return api_key
+    config.load_accounts()
+    return find(config.accounts)
+
+
+def main():
+    fleet = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    config = Config()
+    config.accounts_file = Path(tempfile.mkdtemp()) / "accounts.json"
+    config._save_json(
+        config.accounts_file, {"accounts": {f"Cmdr Fleet {i}": f"key-{i}" for i in range(fleet)}}
+    )
+    config.load_accounts()
+    resolver = KeyResolver(config)
+    last = f"Cmdr Fleet {fleet - 1}"
+    cases = {
+        "exact name": last,
+        "other case": last.upper(),
+        "no key": "Cmdr Unlinked",
+    }
+    number = {"exact name": NUMBER, "other case": NUMBER, "no key": NUMBER // 20}
+    for title, name in cases.items():
+        assert legacy_lookup(config, name) == resolver.get(name)
+        t_legacy, t_index = compare(
+            [lambda: legacy_lookup(config, name), lambda: resolver.get(name)],
+            number=number[title],
+        )
+        rows = [
+            ("legacy scan", f"{t_legacy * 1e6 / number[title]:9.2f} us"),
+            ("indexed", f"{t_index * 1e6 / number[title]:9.2f} us ({t_legacy / t_index:.0f}x)"),
+        ]
+        report(f"{title} ({fleet} commanders)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Durable offline queue costs: hot-path put per event (what every upload pays while the
+portal is unreachable) and how fast a backlog is read back for the bulk drain.
+Usage: python -m benchmarks.bench_offline_store [events]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, report
+from src.services.offline_store import OfflineStore
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    names = ("FSDJump", "Scan", "Loadout", "Materials")
+    bodies = [json.dumps(EVENT_SHAPES[name]).encode() for name in names]
+    store = OfflineStore(Path(tempfile.mkdtemp()) / "offline_queue.sqlite3")
+
+    started = time.perf_counter()
+    for i in range(events):
+        store.put(bodies[i % 4], names[i % 4], "Bench" if i % 3 else "Alt")
+    put_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    drained = 0
+    for commander in store.commanders():
+        while True:
+            rows = store.peek(commander, 100)
+            if not rows:
+                break
+            store.ack([row[0] for row in rows])
+            drained += len(rows)
+    drain_sec = time.perf_counter() - started
+    store.close()
+
+    report(
+        f"{events} events, {sum(map(len, bodies)) // 4} bytes on average",
+        [
+            ("put", f"{put_sec / events * 1e6:.1f} us/event"),
+            ("drain (peek + ack)", f"{drained / drain_sec:,.0f} events/s"),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Portal upload cost of an FSS burst: one POST per event vs size/time-bounded batches.
+A real Sender posts to the local portal stub, which adds a fixed latency per request to
+stand in for the HTTPS round trip.
+Usage: python -m benchmarks.bench_portal_batching [events] [latency_ms]
+"""
+
+import copy
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, report
+from config import Config
+from sender import Sender
+from tests.portal_stub import PortalStub
+
+
+def run(stub, events, batching):
+    config = Config()
+    config.API_URL = stub.url
+    config.accounts = {"Bench": "bench-key"}
+    config.portal_batching = batching
+    # Без клиентских лимитов темпа: сравнивается только конвейер
+    config.portal_rate_per_sec = config.portal_key_rate_per_sec = config.eddn_rate_per_sec = 0
+    cache_path = Path(tempfile.mkdtemp()) / "sent_events_cache.json"
+    sender = Sender(cache_path, config)
+    sender.start()
+    stub.reset()
+    started = time.perf_counter()
+    for i in range(events):
+        event = copy.deepcopy(EVENT_SHAPES["Scan"])
+        event["BodyID"] = i  # разные тела — дедупликация не срабатывает
+        event.update(_send_to_portal=True, _skip_eddn=True, _commander="Bench")
+        sender.queue_event(event)
+    sender.event_queue.join()
+    elapsed = time.perf_counter() - started
+    sender.stop()
+    sender.join(timeout=2)
+    return elapsed, len(stub.requests), len(stub.events), sender.get_batch_stats()
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    latency_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    stub = PortalStub(latency_ms=latency_ms).start()
+    try:
+        single = run(stub, events, batching=False)
+        batched = run(stub, events, batching=True)
+    finally:
+        stub.stop()
+
+    report(
+        f"{events} Scan events, {latency_ms} ms per request",
+        [
+            ("single: wall", f"{single[0] * 1000:.0f} ms ({single[1]} requests)"),
+            ("batched: wall", f"{batched[0] * 1000:.0f} ms ({batched[1]} requests)"),
+            ("speedup", f"{single[0] / batched[0]:.1f}x"),
+            ("delivered", f"{single[2]} / {batched[2]}"),
+            ("batch stats", batched[3]),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Parse cost of a journal with and without the event-name prefilter, for the active JSON
+backend. The watcher enables the prefilter only for backends where it wins
+(watcher.PREFILTER_BACKENDS); compare with SKYLINK_JSON_BACKEND=orjson|msgspec|json.
+Usage: python -m benchmarks.bench_prefilter [path/to/Journal.*.log]
+"""
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import compare, journal_arg, report
+from config import Config
+from src.services import json_codec
+from utils import extract_event_name, parse_json_line
+from watcher import PREFILTER_BACKENDS, build_prefilter
+
+
+def main():
+    path = journal_arg()
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    config = Config()
+    skip = build_prefilter(config.event_rules, config.default_action)
+
+    def full_decode():
+        for line in lines:
+            parse_json_line(line)
+
+    def prefiltered():
+        for line in lines:
+            if extract_event_name(line) in skip:
+                continue
+            parse_json_line(line)
+
+    skipped_lines = [line for line in lines if extract_event_name(line) in skip]
+    skipped = len(skipped_lines)
+
+    def decode_skipped():
+        for line in skipped_lines:
+            parse_json_line(line)
+
+    def extract_skipped():
+        for line in skipped_lines:
+            extract_event_name(line)
+
+    t_full, t_pre, t_dec, t_ext = compare(
+        [full_decode, prefiltered, decode_skipped, extract_skipped]
+    )
+    backend = json_codec.backend_name()
+    enabled = "on" if backend in PREFILTER_BACKENDS else "off"
+    report(
+        f"Prefilter on {path.name} ({len(lines)} lines), {backend} backend (watcher: {enabled})",
+        [
+            ("lines skipped without decode", f"{skipped} ({skipped / len(lines):.1%})"),
+            ("json.loads every line", f"{t_full * 1000:.1f} ms"),
+            ("prefilter + json.loads", f"{t_pre * 1000:.1f} ms"),
+            ("saving", f"{(1 - t_pre / t_full):.1%}"),
+            ("skipped lines: json.loads", f"{t_dec * 1e9 / max(skipped, 1):.0f} ns/line"),
+            ("skipped lines: name extraction", f"{t_ext * 1e9 / max(skipped, 1):.0f} ns/line"),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
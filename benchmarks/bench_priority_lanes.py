@@ -0,0 +1,76 @@
+"""
+Latency of a control event (Shutdown) queued behind a burst of bulk portal uploads for the
+same commander: one FIFO class for everything vs the priority classes from events.json.
+Rate limits are off, so the portal latency alone builds the backlog.
+Usage: python -m benchmarks.bench_priority_lanes [burst] [portal_ms]
+"""
+
+import copy
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, report
+from config import CURRENT_SESSION, Config
+from sender import Sender
+from tests.portal_stub import PortalStub
+
+CONTROL_EVENT = {"event": "Shutdown", "timestamp": "2026-01-01T00:00:00Z"}
+
+
+def run(portal, burst, fifo):
+    config = Config()
+    config.API_URL = portal.url
+    config.accounts = {"Bench": "bench-key"}
+    config.portal_rate_per_sec = config.portal_key_rate_per_sec = 0
+    if fifo:
+        for rule in config.event_rules.values():
+            rule.pop("priority", None)
+    sender = Sender(Path(tempfile.mkdtemp()) / "sent_events_cache.json", config)
+    sender.start()
+    portal.reset()
+    for i in range(burst):
+        event = copy.deepcopy(EVENT_SHAPES["Materials"])
+        event["Raw"][0]["Count"] = i  # без дедупликации
+        event.update(_send_to_portal=True, _commander="Bench")
+        sender.queue_event(event)
+    started = time.perf_counter()
+    sender.queue_event(dict(CONTROL_EVENT, _send_to_portal=True, _commander="Bench"))
+    while not any(event.get("event") == "Shutdown" for event in list(portal.events)):
+        time.sleep(0.005)
+    control = time.perf_counter() - started
+    sender.event_queue.join()
+    total = time.perf_counter() - started
+    sender.stop()
+    sender.join(timeout=2)
+    return control, total
+
+
+def main():
+    burst = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    portal_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    portal = PortalStub(latency_ms=portal_ms).start()
+    CURRENT_SESSION.update(commander="Bench", gameversion="4.1.0.100", gamebuild="r310000/r0 ")
+    try:
+        fifo = run(portal, burst, fifo=True)
+        lanes = run(portal, burst, fifo=False)
+    finally:
+        portal.stop()
+
+    report(
+        f"Shutdown behind {burst} Materials, portal {portal_ms} ms",
+        [
+            ("FIFO", f"Shutdown after {fifo[0] * 1000:6.0f} ms, all done {fifo[1] * 1000:.0f} ms"),
+            (
+                "priority",
+                f"Shutdown after {lanes[0] * 1000:6.0f} ms, all done {lanes[1] * 1000:.0f} ms "
+                f"({fifo[0] / lanes[0]:.0f}x sooner)",
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Watcher -> sender hand-off: the previous `asyncio.to_thread(event_queue.get, timeout=1)`
+loop vs the call_soon_threadsafe bridge in Sender. Measures per-event queueing latency
+(queue_event -> process_event) for a paced producer, the time to drain a burst of the
+same size queued at once, and CPU time burned while idle.
+Usage: python -m benchmarks.bench_sender_bridge [events] [idle_seconds]
+"""
+
+import asyncio
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import report
+from config import Config
+from sender import Sender
+from src.services.spill_queue import SpillQueue
+
+PACE_SEC = 0.002  # ~500 событий/с, как при FSS-скане с дополнительными событиями
+
+
+class LegacyConsumer(threading.Thread):
+    """The pre-bridge worker loop, kept for comparison."""
+
+    def __init__(self, latencies):
+        super().__init__(daemon=True)
+        self.event_queue = SpillQueue(Path(tempfile.mkdtemp()))
+        self.latencies = latencies
+        self.stop_event = threading.Event()
+
+    def queue_event(self, event):
+        self.event_queue.put(event)
+
+    def run(self):
+        asyncio.run(self._worker())
+
+    async def _worker(self):
+        while not self.stop_event.is_set():
+            try:
+                event = await asyncio.to_thread(self.event_queue.get, timeout=1)
+            except queue.Empty:
+                continue
+            self.latencies.append(time.perf_counter() - event["queued"])
+            self.event_queue.task_done()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class BridgeSender(Sender):
+    """Sender with the network part replaced by a latency probe."""
+
+    latencies = None
+
+    async def process_event(self, event, client, priority="normal"):
+        self.latencies.append(time.perf_counter() - event["queued"])
+
+
+def make_bridge(latencies):
+    config = Config()
+    config.app_data_dir = Path(tempfile.mkdtemp())
+    sender = BridgeSender(config.app_data_dir / "sent_events_cache.json", config)
+    sender.latencies = latencies
+    return sender
+
+
+def measure(make, events, idle_seconds):
+    latencies = []
+    consumer = make(latencies)
+    consumer.start()
+    time.sleep(0.2)
+    for _ in range(events):
+        consumer.queue_event({"event": "Scan", "queued": time.perf_counter()})
+        time.sleep(PACE_SEC)
+    consumer.event_queue.join()
+    paced = sorted(latencies)
+    # Всплеск: backfill или выгрузка журнала при старте кладут тысячи событий разом
+    started = time.perf_counter()
+    for _ in range(events):
+        consumer.queue_event({"event": "Scan", "queued": started})
+    consumer.event_queue.join()
+    burst = time.perf_counter() - started
+    cpu_start = time.process_time()
+    time.sleep(idle_seconds)
+    idle_cpu = time.process_time() - cpu_start
+    consumer.stop()
+    consumer.join(timeout=2)
+    return {
+        "p50_us": statistics.median(paced) * 1e6,
+        "p99_us": paced[int(len(paced) * 0.99) - 1] * 1e6,
+        "burst_ms": burst * 1000,
+        "idle_cpu_ms": idle_cpu * 1000,
+    }
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    idle_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    legacy = measure(LegacyConsumer, events, idle_seconds)
+    bridge = measure(make_bridge, events, idle_seconds)
+    rows = []
+    for label, r in (("to_thread poll", legacy), ("bridge", bridge)):
+        rows.append((f"{label}: paced", f"p50 {r['p50_us']:.0f} us, p99 {r['p99_us']:.0f} us"))
+        rows.append((f"{label}: burst", f"{r['burst_ms']:.0f} ms"))
+        rows.append((f"{label}: idle CPU", f"{r['idle_cpu_ms']:.1f} ms / {idle_seconds:.0f} s"))
+    report(f"{events} events, paced one every {PACE_SEC * 1000:.0f} ms, then a burst", rows)
+
+
+if __name__ == "__main__":
+    main()
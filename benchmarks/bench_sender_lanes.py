@@ -0,0 +1,88 @@
+"""
+End-to-end Sender throughput with a slow EDDN gateway: the serial pipeline (one event at
+a time, EDDN awaited before the portal POST) vs independent EDDN / portal lanes.
+The serial case is the lane code limited to one event in flight.
+Usage: python -m benchmarks.bench_sender_lanes [events] [eddn_ms] [portal_ms]
+"""
+
+import copy
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import EVENT_SHAPES, report
+from config import CURRENT_SESSION, Config
+from sender import Sender
+from src.services import eddn_sender
+from tests.portal_stub import PortalStub
+
+
+def make_events(count):
+    """Every 4th event is an FSDJump (EDDN + portal), the rest are portal-only Materials."""
+    events = []
+    for i in range(count):
+        name = "FSDJump" if i % 4 == 0 else "Materials"
+        event = copy.deepcopy(EVENT_SHAPES[name])
+        if name == "Materials":
+            event["Raw"][0]["Count"] = i  # без дедупликации
+        else:
+            event["SystemAddress"] = i
+        event.update(_send_to_portal=True, _commander="Bench")
+        events.append(event)
+    return events
+
+
+def run(portal, eddn, events, serial):
+    config = Config()
+    config.API_URL = portal.url
+    config.accounts = {"Bench": "bench-key"}
+    # Без клиентских лимитов темпа: сравнивается только конвейер
+    config.portal_rate_per_sec = config.portal_key_rate_per_sec = config.eddn_rate_per_sec = 0
+    if serial:
+        config.sender_max_inflight = 1
+        config.eddn_concurrency = 1
+        config.portal_concurrency = 1
+    sender = Sender(Path(tempfile.mkdtemp()) / "sent_events_cache.json", config)
+    sender.start()
+    portal.reset()
+    eddn.reset()
+    started = time.perf_counter()
+    for event in events:
+        sender.queue_event(copy.deepcopy(event))
+    sender.event_queue.join()
+    elapsed = time.perf_counter() - started
+    sender.stop()
+    sender.join(timeout=2)
+    return elapsed, len(portal.events), len(eddn.events)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    eddn_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    portal_ms = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    portal = PortalStub(latency_ms=portal_ms).start()
+    eddn = PortalStub(latency_ms=eddn_ms, api_path="/upload/").start()
+    eddn_sender.EDDN_UPLOAD_URL = eddn.url
+    CURRENT_SESSION.update(commander="Bench", gameversion="4.1.0.100", gamebuild="r310000/r0 ")
+    events = make_events(count)
+    try:
+        serial = run(portal, eddn, events, serial=True)
+        lanes = run(portal, eddn, events, serial=False)
+    finally:
+        portal.stop()
+        eddn.stop()
+
+    report(
+        f"{count} events (1/4 FSDJump), EDDN {eddn_ms} ms, portal {portal_ms} ms",
+        [
+            ("serial", f"{serial[0] * 1000:.0f} ms (portal {serial[1]}, EDDN {serial[2]})"),
+            ("lanes", f"{lanes[0] * 1000:.0f} ms (portal {lanes[1]}, EDDN {lanes[2]})"),
+            ("speedup", f"{serial[0] / lanes[0]:.1f}x"),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
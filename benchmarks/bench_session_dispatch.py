@@ -0,0 +1,88 @@
+"""
+Per-line session-update overhead: the previous chain of `if event_type in [...]` checks
+(with _TRAVEL_EVENTS rebuilt per line) vs the compiled SESSION_UPDATERS table.
+Lines are decoded up front; only the session step is timed.
+Usage: python -m benchmarks.bench_session_dispatch [path/to/Journal.*.log]
+"""
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import compare, journal_arg, report
+from src.services.session_state import SESSION_UPDATERS
+from utils import parse_json_line
+
+
+def legacy_session_update(event_data, session):
+    """The pre-table logic from JournalWatcher.process_line, kept for comparison."""
+    event_type = event_data["event"]
+    if event_type in ["Commander", "LoadGame"]:
+        commander_name = event_data.get("Name") or event_data.get("Commander")
+        if commander_name:
+            session["commander"] = commander_name
+    if event_type == "LoadGame":
+        session["gameversion"] = event_data.get("gameversion") or ""
+        session["gamebuild"] = event_data.get("build") or ""
+    if event_type in ("FSDJump", "Location"):
+        if event_data.get("StarSystem") is not None:
+            session["star_system"] = event_data.get("StarSystem") or ""
+        if event_data.get("StarPos") is not None:
+            session["star_pos"] = (
+                event_data.get("StarPos") if isinstance(event_data.get("StarPos"), list) else []
+            )
+    if event_type in ("Fileheader", "LoadGame"):
+        if "Horizons" in event_data:
+            session["is_horizons"] = bool(event_data.get("Horizons"))
+        if "Odyssey" in event_data:
+            session["is_odyssey"] = bool(event_data.get("Odyssey"))
+    _TRAVEL_EVENTS = (
+        "Location",
+        "Liftoff",
+        "Touchdown",
+        "SupercruiseEntry",
+        "SupercruiseExit",
+        "FSDJump",
+        "Embark",
+        "Disembark",
+        "Docked",
+        "Undocked",
+    )
+    if event_type in _TRAVEL_EVENTS:
+        if "Taxi" in event_data:
+            session["is_taxi"] = bool(event_data.get("Taxi"))
+        if "Multicrew" in event_data:
+            session["is_multicrew"] = bool(event_data.get("Multicrew"))
+
+
+def main():
+    path = journal_arg()
+    with open(path, "r", encoding="utf-8") as f:
+        events = [e for e in map(parse_json_line, f) if e and "event" in e]
+
+    legacy_session = {}
+    table_session = {}
+
+    def legacy():
+        for event_data in events:
+            legacy_session_update(event_data, legacy_session)
+
+    def table():
+        apply = table_session.__setitem__
+        for event_data in events:
+            updaters = SESSION_UPDATERS.get(event_data["event"])
+            if updaters:
+                for updater in updaters:
+                    updater(event_data, apply)
+
+    t_legacy, t_table = compare([legacy, table])
+    assert legacy_session == table_session
+    n = len(events)
+    report(
+        f"Session dispatch on {path.name} ({n} events)",
+        [
+            ("if-chain (before)", f"{t_legacy * 1e9 / n:.0f} ns/line"),
+            ("dispatch table (after)", f"{t_table * 1e9 / n:.0f} ns/line"),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
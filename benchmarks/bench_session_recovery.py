@@ -0,0 +1,48 @@
+"""
+Startup session recovery: forward full-file decode (previous behaviour) vs reverse scan.
+Usage: python -m benchmarks.bench_session_recovery
+"""
+
+import tempfile
+from pathlib import Path
+
+# benchmarks._common must be imported first: it sets up APPDATA and sys.path
+from benchmarks._common import compare, report, synthetic_journal
+from config import Config
+from utils import parse_json_line
+from watcher import JournalWatcher
+
+SIZES = {"small": 2_000, "medium": 50_000, "huge": 250_000}
+
+
+def main():
+    config = Config()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, lines in SIZES.items():
+            journal_dir = Path(tmp) / label
+            journal_dir.mkdir()
+            path = synthetic_journal(journal_dir / "Journal.2026-03-14T180000.01.log", lines)
+            watcher = JournalWatcher(journal_dir, None, config)
+            watcher.latest_log_file = path
+
+            def forward():
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        parse_json_line(line)
+
+            t_forward, t_reverse = compare(
+                [forward, watcher._sync_session_from_file], repeat=3 if label == "huge" else 5
+            )
+            size_mb = path.stat().st_size / 1024 / 1024
+            rows.append(
+                (
+                    f"{label} ({lines} lines, {size_mb:.1f} MB)",
+                    f"forward {t_forward * 1000:8.1f} ms   reverse {t_reverse * 1000:7.1f} ms",
+                )
+            )
+    report("Session recovery at startup", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,7 @@ ACCOUNTS_FILE = APPDATA_DIR / "accounts.json"
 DISCOVERY_FILE = APPDATA_DIR / "discovery.json"
 SETTINGS_FILE = APPDATA_DIR / "settings.json"
 LOG_FILE = APPDATA_DIR / "skylink_client.log"  # <-- Новый файл для логов
+JOURNAL_CHECKPOINT_FILE = APPDATA_DIR / "journal_checkpoint.json"  # (file, inode, offset) tailer
 
 # --- Configure Logging ---
 # Настраиваем логгер здесь, ПОСЛЕ создания путей.
@@ -72,12 +73,71 @@ CURRENT_SESSION = {
     "is_taxi": False,
     "is_multicrew": False,
 }
+# Поля сессии, которые EDDN берёт для события (build_eddn_payload): снимок делается при
+# чтении строки, иначе пачка Scan после FSDJump ушла бы с координатами следующей системы
+EDDN_SESSION_FIELDS = (
+    "commander",
+    "gameversion",
+    "gamebuild",
+    "star_system",
+    "star_pos",
+    "is_horizons",
+    "is_odyssey",
+    "is_taxi",
+    "is_multicrew",
+)
 # Global state for GUI (to avoid circular imports)
 UI_STATE = {"status": "WAITING", "color": "gray", "commander": None, "auth_required": False}
 
 # EDDN: event types that must be sent to EDDN even if events.json marks them "ignore" for portal
 EDDN_REQUIRED_EVENTS = frozenset({"Scan", "FSDJump", "SAASignalsFound", "FSSBodySignals"})
 
+# Настройки производительности, которые можно переопределить в settings.json (ключ = атрибут Config)
+TUNABLE_SETTINGS = (
+    "journal_coalesce_ms",
+    "queue_high_watermark",
+    "queue_low_watermark",
+    "portal_batching",
+    "portal_batch_max_events",
+    "portal_batch_max_bytes",
+    "portal_batch_max_wait_ms",
+    "eddn_concurrency",
+    "portal_concurrency",
+    "sender_max_inflight",
+    "offline_queue_max_events",
+    "offline_queue_max_mb",
+    "breaker_failure_threshold",
+    "breaker_max_delay_sec",
+    "portal_rate_per_sec",
+    "portal_burst",
+    "portal_key_rate_per_sec",
+    "portal_key_burst",
+    "eddn_rate_per_sec",
+    "eddn_burst",
+    "dedup_max_entries",
+    "dedup_hash_scheme",
+    "portal_compression",
+    "eddn_compression",
+    "compression_min_bytes",
+    "http2",
+    "http_max_connections",
+    "http_max_keepalive",
+    "http_keepalive_expiry_sec",
+    "http_timeout_sec",
+    "http_warmup",
+    "priority_starvation_limit",
+    "shutdown_drain_sec",
+)
+
+# Служебные ключи правил events.json (не имена полей события)
+RULE_META_KEYS = frozenset(
+    {"action", "deduplicate", "comment", "offline_ttl", "dedup_ttl", "priority"}
+)
+DEFAULT_OFFLINE_TTL_SEC = 7 * 24 * 3600
+# Классы приоритета очереди Sender (events.json: "priority"), от старшего к младшему
+PRIORITY_CLASSES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+
 
 def get_resource_path(relative_path):
     """
@@ -99,14 +159,53 @@ class Config:
         self.accounts_file = ACCOUNTS_FILE
         self.discovery_file = DISCOVERY_FILE
         self.settings_file = SETTINGS_FILE
+        self.journal_checkpoint_file = JOURNAL_CHECKPOINT_FILE
 
         self.disclaimer_accepted = False
         self.language = "en"
         self.last_accepted_version = ""
+        self.journal_coalesce_ms = 30  # окно склейки on_modified-штормов (0 — без задержки)
+        self.queue_high_watermark = 1000  # выше — события Sender уходят в spill на диск
+        self.queue_low_watermark = 250  # ниже — spill читается обратно в память
+        self.portal_batching = False  # пакетная отправка на {API_URL}/batch
+        self.portal_batch_max_events = 50
+        self.portal_batch_max_bytes = 256 * 1024
+        self.portal_batch_max_wait_ms = 250
+        self.eddn_concurrency = 2  # одновременных отправок в EDDN
+        self.portal_concurrency = 2  # одновременных запросов к порталу (по разным командирам)
+        self.sender_max_inflight = 64  # событий в обработке у Sender одновременно
+        self.offline_queue_max_events = 50_000  # офлайн-очередь на диске: лимит событий
+        self.offline_queue_max_mb = 256  # и лимит размера; сверх — вытесняются самые старые
+        self.breaker_failure_threshold = 5  # ошибок подряд до размыкания цепи направления
+        self.breaker_max_delay_sec = 300  # потолок экспоненциальной паузы
+        # Token bucket: запросов в секунду и запас на всплеск (0 — без ограничения)
+        self.portal_rate_per_sec = 10
+        self.portal_burst = 20
+        self.portal_key_rate_per_sec = 5  # на один API-ключ
+        self.portal_key_burst = 10
+        self.eddn_rate_per_sec = 5
+        self.eddn_burst = 10
+        self.dedup_max_entries = 100_000  # кэш дедупликации в памяти; сверх — вытесняются давние
+        self.dedup_hash_scheme = "blake2b"  # "sha256" — прежняя формула хэша
+        # Сжатие тел запросов: "gzip", "zstd" (если установлен zstandard) или "none"
+        self.portal_compression = "none"  # включать, когда портал принимает Content-Encoding
+        self.eddn_compression = "gzip"  # шлюз EDDN принимает gzip
+        self.compression_min_bytes = 1024  # меньшие тела уходят как есть
+        # HTTP-клиент отправителя: пул соединений, keepalive, HTTP/2 (нужен пакет h2)
+        self.http2 = True
+        self.http_max_connections = 20
+        self.http_max_keepalive = 10
+        self.http_keepalive_expiry_sec = 60  # у httpx по умолчанию 5 с
+        self.http_timeout_sec = 10.0
+        self.http_warmup = True  # LoadGame/Commander: заранее открыть соединения
+        self.priority_starvation_limit = 8  # сколько раз подряд младший класс можно обойти
+        self.shutdown_drain_sec = 5.0  # при выходе: срок на досылку, остальное — на диск
+        self.offline_ttl_seconds = DEFAULT_OFFLINE_TTL_SEC  # events.json: settings / offline_ttl
 
         self.event_rules = {}
         self.field_rules = {}
         self.accounts = {}
+        self.accounts_version = 0  # растёт при каждом изменении accounts (индекс ключей Sender)
         self.discovered_fields = {}  # In-memory cache for new fields
         self.default_action = "send"
 
@@ -143,6 +242,8 @@ class Config:
             self.disclaimer_accepted = data.get("disclaimer_accepted", False)
             self.language = data.get("language", "en")
             self.last_accepted_version = data.get("accepted_version", "")
+            for key in TUNABLE_SETTINGS:
+                setattr(self, key, data.get(key, getattr(self, key)))
         except (IOError, json.JSONDecodeError) as e:
             logging.warning("Could not load settings: %s", e)
 
@@ -206,6 +307,7 @@ class Config:
             )
             self._save_json(self.accounts_file, {"accounts": {}})
             self.accounts = {}
+            self.accounts_version += 1
             return
 
         try:
@@ -220,10 +322,12 @@ class Config:
         except (IOError, json.JSONDecodeError) as e:
             logging.error(f"Failed to load accounts.json: {e}")
             self.accounts = {}
+        self.accounts_version += 1
 
     def save_account(self, commander_name, api_key):
         """Updates and saves an account to accounts.json."""
         self.accounts[commander_name] = api_key
+        self.accounts_version += 1
         CURRENT_SESSION["api_key"] = api_key
         self._save_json(self.accounts_file, {"accounts": self.accounts})
         logging.info(f"✅ API Key saved for commander: {commander_name}")
@@ -232,6 +336,7 @@ class Config:
         """Deletes an account from accounts.json."""
         if commander_name in self.accounts:
             del self.accounts[commander_name]
+            self.accounts_version += 1
             self._save_json(self.accounts_file, {"accounts": self.accounts})
             logging.info(f"🗑️ Account deleted for commander: {commander_name}")
 
@@ -266,7 +371,9 @@ class Config:
         """Flattens the hierarchical rule structure into efficient lookup dictionaries."""
         self.event_rules = {}
         self.field_rules = {"filters": {}}
-        self.default_action = config_data.get("settings", {}).get("default_action", "send")
+        settings = config_data.get("settings", {})
+        self.default_action = settings.get("default_action", "send")
+        self.offline_ttl_seconds = settings.get("offline_ttl_seconds", DEFAULT_OFFLINE_TTL_SEC)
 
         for category, events in config_data.get("categories", {}).items():
             for event_name, rule in events.items():
@@ -274,12 +381,38 @@ class Config:
                     "action": rule.get("action", "send"),
                     "deduplicate": rule.get("deduplicate", False),
                 }
+                for ttl_key in ("offline_ttl", "dedup_ttl"):
+                    if ttl_key in rule:
+                        self.event_rules[event_name][ttl_key] = rule[ttl_key]
+                if "priority" in rule:
+                    if rule["priority"] in PRIORITY_CLASSES:
+                        self.event_rules[event_name]["priority"] = rule["priority"]
+                    else:
+                        logging.warning(
+                            f"Unknown priority '{rule['priority']}' for {event_name}, "
+                            f"using '{DEFAULT_PRIORITY}'."
+                        )
                 self.field_rules["filters"][event_name] = {
-                    key: value
-                    for key, value in rule.items()
-                    if key not in ["action", "deduplicate", "comment"]
+                    key: value for key, value in rule.items() if key not in RULE_META_KEYS
                 }
 
+    def offline_ttl_for(self, event_type):
+        """Seconds a failed upload of event_type may wait in the offline queue."""
+        rule = self.event_rules.get(event_type)
+        if rule and "offline_ttl" in rule:
+            return rule["offline_ttl"]
+        return self.offline_ttl_seconds
+
+    def dedup_ttl_for(self, event_type):
+        """Seconds a dedup hash of event_type suppresses resends (None: until content changes)."""
+        rule = self.event_rules.get(event_type)
+        return rule.get("dedup_ttl") if rule else None
+
+    def priority_for(self, event_type):
+        """Priority class of event_type in the sender queue (events.json: "priority")."""
+        rule = self.event_rules.get(event_type)
+        return rule.get("priority", DEFAULT_PRIORITY) if rule else DEFAULT_PRIORITY
+
     def load_discovered_fields(self):
         """Loads the discovery log from discovery.json."""
         if self.discovery_file.exists():
@@ -16,8 +16,8 @@ from tendo import singleton
 
 # Импорты логики
 from config import CURRENT_SESSION, UI_STATE, Config
-from main import start_background_service, stop_background_service
-from sender import FAILED_ACCOUNTS, Sender
+from main import purge_commander_cache, start_background_service, stop_background_service
+from sender import FAILED_ACCOUNTS
 from updater import UpdateManager
 from utils import verify_api_key
 
@@ -287,9 +287,8 @@ class AccountRow(ctk.CTkFrame):
         self.confirm_frame.grid(row=0, column=1, padx=5, sticky="e")
 
     def confirm_delete(self):
-        cache_file = self.app.config.app_data_dir / "deduplication_cache.json"
         self.app.config.delete_account(self.commander_name)
-        Sender.purge_commander_cache(self.commander_name, cache_file)
+        purge_commander_cache(self.commander_name, shared_config=self.app.config)
         self.destroy()
 
     def save_key(self):
@@ -9,6 +9,8 @@ import threading
 
 import httpx
 
+from src.services.circuit_breaker import CircuitBreaker, parse_retry_after
+
 
 class HeartbeatService(threading.Thread):
     """Sends POST to HEARTBEAT_URL every 30 seconds for each account. Logs only on state change."""
@@ -23,6 +25,11 @@ class HeartbeatService(threading.Thread):
         self._stop_event = threading.Event()
         self._account_state = {}  # cmdr_name -> last state (ok / auth_failed / ...)
         self._startup_logged = False  # одно сообщение об успешном старте
+        self.breaker = CircuitBreaker(
+            "heartbeat",
+            failure_threshold=config.breaker_failure_threshold,
+            max_delay=config.breaker_max_delay_sec,
+        )
 
     def stop(self):
         """Signal the thread to exit on next wait()."""
@@ -39,6 +46,9 @@ class HeartbeatService(threading.Thread):
             for cmdr_name, api_key in self.config.accounts.items():
                 if self._stop_event.is_set():
                     break
+                if not self.breaker.allow():
+                    all_ok_this_round = False
+                    break  # сервер недоступен: пропускаем раунд до конца паузы
                 prev = self._account_state.get(cmdr_name)
                 try:
                     x_commander_value = base64.b64encode(cmdr_name.encode("utf-8")).decode("ascii")
@@ -52,6 +62,11 @@ class HeartbeatService(threading.Thread):
                         headers=headers,
                         timeout=5,
                     )
+                    if response.status_code == 429 or response.status_code >= 500:
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        self.breaker.record_failure(f"HTTP {response.status_code}", retry_after)
+                    else:
+                        self.breaker.record_success()
                     if response.status_code == 200:
                         self.failed_accounts.discard(cmdr_name)
                         self._account_state[cmdr_name] = self._STATE_OK
@@ -78,6 +93,7 @@ class HeartbeatService(threading.Thread):
                             )
                             self._account_state[cmdr_name] = "http_failed"
                 except httpx.RequestError as e:
+                    self.breaker.record_failure(type(e).__name__)
                     all_ok_this_round = False
                     if prev != "network_failed":
                         logging.warning("Heartbeat network error for %s: %s", cmdr_name, e)
@@ -1,9 +1,14 @@
+import argparse
 import logging
+import multiprocessing
 import time
+from datetime import datetime
 
 from config import UI_STATE, Config
 from heartbeat import HeartbeatService
 from sender import FAILED_ACCOUNTS, Sender
+from src.services.app_lock import AppDataLock
+from src.services.backfill import run_backfill, select_journal_files
 from watcher import JournalWatcher
 
 # Configure logging
@@ -16,6 +21,7 @@ config = None
 sender = None
 watcher = None
 heartbeat = None
+app_lock = None  # файлы Sender в app data — только у одного процесса
 
 
 def update_ui_state(status, message):
@@ -44,7 +50,7 @@ def update_ui_state(status, message):
 # --- ИЗМЕНЕНИЕ: Добавляем аргумент shared_config ---
 def start_background_service(shared_config=None):
     """Initializes and starts the background services."""
-    global sender, watcher, config, heartbeat
+    global sender, watcher, config, heartbeat, app_lock
 
     logging.info("🚀 Starting SkyLink background service...")
 
@@ -55,6 +61,15 @@ def start_background_service(shared_config=None):
     else:
         config = Config()
 
+    app_lock = AppDataLock(config.app_data_dir)
+    if not app_lock.acquire():
+        logging.error(
+            f"❌ Another SkyLink sender is using {config.app_data_dir}. Service not started."
+        )
+        update_ui_state("Error", "Error: SkyLink is already running")
+        app_lock = None
+        return
+
     cache_file = config.app_data_dir / "deduplication_cache.json"
 
     # Теперь Sender использует ТОТ ЖЕ config, что и GUI
@@ -84,7 +99,7 @@ def start_background_service(shared_config=None):
 
 def stop_background_service():
     """Stops the background services gracefully."""
-    global watcher, sender, heartbeat
+    global watcher, sender, heartbeat, app_lock
 
     logging.info("🛑 Stopping SkyLink background service...")
 
@@ -92,14 +107,103 @@ def stop_background_service():
         heartbeat.stop()
         heartbeat.join(timeout=1.0)
     if watcher:
-        watcher.stop()
+        watcher.stop()  # сначала приток событий, потом досылка
     if sender:
         sender.stop()
-    if sender:
-        sender.join(timeout=1.0)
+        # Sender сам укладывается в срок досылки; запас — на сохранение остатка на диск
+        sender.join(timeout=config.shutdown_drain_sec + 2.0)
+        if sender.is_alive():
+            logging.warning("⚠ Sender did not finish draining in time.")
+        else:
+            stats = sender.get_shutdown_stats()
+            logging.info(
+                f"📦 Shutdown: {stats['drained']} event(s) drained, "
+                f"{stats['persisted_offline'] + stats['persisted_queue']} persisted."
+            )
+    if app_lock:
+        app_lock.release()
+        app_lock = None
 
     logging.info("✅ Background services stopped (or forced).")
 
 
+def purge_commander_cache(commander_name, shared_config=None):
+    """Drops a commander's dedup entries, through the running sender when there is one."""
+    if sender:
+        sender.purge_commander(commander_name)
+        return
+    purge_config = shared_config or Config()
+    Sender.purge_commander_cache(
+        commander_name, purge_config.app_data_dir / "deduplication_cache.json"
+    )
+
+
+def backfill_journals(since=None, until=None, pattern=None, workers=None, shared_config=None):
+    """
+    Replays historical journals and returns the backfill stats. Goes through the running
+    sender when there is one; otherwise through a dedicated Sender, under the app data lock,
+    and refuses while another process's sender holds it.
+    """
+    backfill_config = config if sender else (shared_config or Config())
+    if not backfill_config.journal_path:
+        logging.error("Could not find the Elite Dangerous journal directory. Nothing to backfill.")
+        return None
+
+    files = select_journal_files(backfill_config.journal_path, since, until, pattern)
+    logging.info(f"⏮ Backfill: {len(files)} journal file(s) selected.")
+    if sender:
+        return run_backfill(backfill_config, sender, files, workers=workers)
+
+    lock = AppDataLock(backfill_config.app_data_dir)
+    if not lock.acquire():
+        logging.error(
+            f"❌ Another SkyLink sender is using {backfill_config.app_data_dir}. "
+            "Stop it or run the backfill from it."
+        )
+        return None
+    try:
+        backfill_sender = Sender(
+            cache_path=backfill_config.app_data_dir / "deduplication_cache.json",
+            config=backfill_config,
+        )
+        backfill_sender.start()
+        try:
+            return run_backfill(backfill_config, backfill_sender, files, workers=workers)
+        finally:
+            backfill_sender.stop()
+            backfill_sender.join(timeout=backfill_config.shutdown_drain_sec + 2.0)
+            if backfill_sender.is_alive():
+                logging.warning("⚠ Backfill sender did not finish draining in time.")
+    finally:
+        lock.release()
+
+
+def _parse_date(value):
+    """--since/--until are compared with the zone-less times in journal file names."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        raise argparse.ArgumentTypeError(
+            f"{value!r}: give the time as in journal file names, without a UTC offset"
+        )
+    return parsed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SkyLink background service")
+    parser.add_argument(
+        "--backfill", action="store_true", help="replay past journals instead of tailing"
+    )
+    parser.add_argument("--since", type=_parse_date, help="backfill from (YYYY-MM-DD[THH:MM])")
+    parser.add_argument("--until", type=_parse_date, help="backfill up to, exclusive")
+    parser.add_argument("--glob", dest="pattern", help="backfill files matching this name glob")
+    parser.add_argument("--workers", type=int, help="parser processes (default: CPU count - 1)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    start_background_service()
+    multiprocessing.freeze_support()  # ProcessPoolExecutor в собранном EXE
+    args = parse_args()
+    if args.backfill:
+        backfill_journals(args.since, args.until, args.pattern, args.workers)
+    else:
+        start_background_service()
@@ -1,7 +1,6 @@
 import asyncio
-import base64
-import hashlib
-import json
+import copy
+import functools
 import logging
 import os
 import queue
@@ -10,15 +9,44 @@ import time
 
 import httpx
 
-from config import CURRENT_SESSION, EDDN_REQUIRED_EVENTS
+from config import CURRENT_SESSION, EDDN_REQUIRED_EVENTS, EDDN_SESSION_FIELDS, PRIORITY_CLASSES
+from src.services import body_compressor, json_codec
+from src.services.body_compressor import BodyCompressor
+from src.services.circuit_breaker import CircuitBreaker, breaker_stats, parse_retry_after
+from src.services.content_hash import SCHEME_FAST, SCHEMES, content_digest, other_scheme
+from src.services.dedup_index import DedupIndex
+from src.services.dedup_store import DedupStore
+from src.services.envelope import Envelope, portal_headers
+from src.services.http_transport import ConnectionStats, build_client, warm_up
+from src.services.key_resolver import KeyResolver
+from src.services.offline_store import OfflineStore
+from src.services.ordered_lanes import OrderedLanes
+from src.services.portal_batcher import PortalBatch, PortalBatcher
+from src.services.priority_lanes import PriorityLanes
+from src.services.rate_limiter import RateLimiter
+from src.services.spill_queue import SpillQueue
 from utils import filter_event_fields
 
 # Глобальный регистр ошибок авторизации (хранится в оперативной памяти)
 FAILED_ACCOUNTS = set()
 
-# Офлайн-очередь: таймаут жизни пакета и пауза между переотправками (используем time.time())
-OFFLINE_QUEUE_TIMEOUT_SEC = 120  # 2 минуты — затем пакет удаляется
+# Офлайн-очередь (на диске, TTL по типу события из events.json): пауза между раундами повтора
 OFFLINE_RETRY_PAUSE_SEC = 10  # пауза между попытками отправки
+OFFLINE_DRAIN_CHUNK = 100  # событий за одно чтение из базы при переотправке
+# Переотправка — самый младший класс: между порциями ждёт, пока очередь живых событий
+# пуста, но не дольше этого (защита от голодания)
+OFFLINE_YIELD_MAX_SEC = 2.0
+OFFLINE_YIELD_POLL_SEC = 0.05
+RATE_LIMIT_DEFAULT_SEC = 60  # 429 без Retry-After
+
+# Начало сессии: заранее открываем соединения к порталу и EDDN (DNS + TCP + TLS)
+SESSION_START_EVENTS = ("LoadGame", "Commander")
+WARMUP_MIN_INTERVAL_SEC = 30  # LoadGame и Commander идут подряд — греем один раз
+
+# Ответы batch-эндпоинта, означающие «портал не поддерживает пакеты» — откат на поштучную отправку
+BATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+_STOPPED = object()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -29,52 +57,115 @@ class Sender(threading.Thread):
         super().__init__(daemon=True)
         self.cache_path = cache_path
         self.config = config
-        self.event_queue = queue.Queue()
-        self.offline_queue = queue.Queue()
-        self.hashes = {}
+        # Ограниченная очередь: при переполнении (сеть висит) события уходят на диск.
+        # По полосе на класс приоритета; "normal" — прежний каталог spill
+        spill_dir = config.app_data_dir / "spill"
+        self.event_queue = PriorityLanes(
+            {
+                name: SpillQueue(
+                    spill_dir if name == "normal" else spill_dir / name,
+                    high_watermark=config.queue_high_watermark,
+                    low_watermark=config.queue_low_watermark,
+                )
+                for name in PRIORITY_CLASSES
+            },
+            starvation_limit=config.priority_starvation_limit,
+        )
+        # Офлайн-очередь на диске: переживает долгие обрывы связи и перезапуск клиента
+        self.offline_queue = OfflineStore(
+            config.app_data_dir / "offline_queue.sqlite3",
+            ttl_for=config.offline_ttl_for,
+            max_events=config.offline_queue_max_events,
+            max_bytes=config.offline_queue_max_mb * 1024 * 1024,
+        )
+        # Пакетная отправка на портал (выключена по умолчанию: нужен batch-эндпоинт)
+        self.batcher = None
+        self.portal_batches_supported = True
+        # Полосы отправки и их лимиты создаются в цикле asyncio воркера
+        self.eddn_slots = None
+        self.portal_slots = None
+        self.portal_lanes = None
+        if config.portal_batching:
+            self.batcher = PortalBatcher(
+                max_events=config.portal_batch_max_events,
+                max_bytes=config.portal_batch_max_bytes,
+                max_wait_ms=config.portal_batch_max_wait_ms,
+            )
+        # Предохранители по направлениям: деградация одного сервиса не тормозит остальные
+        self.portal_breaker = CircuitBreaker(
+            "portal",
+            failure_threshold=config.breaker_failure_threshold,
+            max_delay=config.breaker_max_delay_sec,
+        )
+        self.eddn_breaker = CircuitBreaker(
+            "eddn",
+            failure_threshold=config.breaker_failure_threshold,
+            max_delay=config.breaker_max_delay_sec,
+        )
+        # Собственный темп отправки (token bucket), чтобы не упираться в 429 сервера
+        self.portal_limiter = RateLimiter(
+            config.portal_rate_per_sec,
+            config.portal_burst,
+            key_rate=config.portal_key_rate_per_sec,
+            key_burst=config.portal_key_burst,
+        )
+        self.eddn_limiter = RateLimiter(config.eddn_rate_per_sec, config.eddn_burst)
+        # Сжатие тел запросов (крупные события; спутниковые и мобильные каналы)
+        self.portal_compressor = BodyCompressor(
+            "portal", config.portal_compression, config.compression_min_bytes
+        )
+        self.eddn_compressor = BodyCompressor(
+            "eddn", config.eddn_compression, config.compression_min_bytes
+        )
+        # Ключи командиров: индекс без учёта регистра, accounts.json — только при изменении
+        self.keys = KeyResolver(config)
+        self.dedup = None
         self.load_hashes()
         self.stop_event = threading.Event()
         self.status_callback = None
+        self.connection_stats = ConnectionStats()
+        self._warmed_at = None
+        # Итог остановки (_drain): сколько успели отправить и сколько сохранено на диск
+        self.shutdown_stats = {
+            "inflight": 0,
+            "drained": 0,
+            "cancelled": 0,
+            "persisted_offline": 0,
+            "persisted_queue": 0,
+            "elapsed_sec": 0.0,
+        }
+        self._warmup_task = None
+        # Мост поток -> asyncio: производитель будит воркер через call_soon_threadsafe
+        self._loop = None
+        self._event_ready = None
+        self._worker_idle = False
 
     def load_hashes(self):
-        """Loads hashes from the cache file or creates it if it doesn't exist."""
+        """Loads hashes from the cache snapshot and its append-only log."""
         # При установке/переустановке установщик оставляет маркер — обнуляем кэш для полной переотправки пакетов
         marker = self.cache_path.parent / ".clear_dedup_cache"
         if marker.exists():
             try:
-                if self.cache_path.exists():
-                    self.cache_path.unlink()
+                DedupStore.remove_files(self.cache_path)
                 marker.unlink()
                 logging.info("Deduplication cache cleared after install/reinstall.")
             except OSError as e:
                 logging.warning("Could not clear dedup cache marker: %s", e)
-        if self.cache_path.exists():
-            try:
-                with open(self.cache_path, "r") as f:
-                    # Handle empty file case
-                    content = f.read()
-                    if not content:
-                        self.hashes = {}
-                    else:
-                        self.hashes = json.loads(content)
-                logging.info(f"Deduplication cache loaded from: {os.path.abspath(self.cache_path)}")
-            except (json.JSONDecodeError, IOError) as e:
-                logging.error(f"Failed to load deduplication cache: {e}")
-                self.hashes = {}
-        else:
-            logging.info("Cache file not found. Creating a new one.")
-            self.hashes = {}
-            self.save_hashes()
-
-    def save_hashes(self):
-        """Saves hashes to the cache file."""
-        abs_path = os.path.abspath(self.cache_path)
-        logging.info(f"💾 Saving cache to: {abs_path}")
-        try:
-            with open(self.cache_path, "w") as f:
-                json.dump(self.hashes, f, indent=2)
-        except IOError as e:
-            logging.error(f"Failed to save deduplication cache: {e}")
+        scheme = self.config.dedup_hash_scheme
+        if scheme not in SCHEMES:
+            logging.warning("Unknown dedup_hash_scheme '%s', using %s.", scheme, SCHEME_FAST)
+            scheme = SCHEME_FAST
+        self.dedup = DedupIndex(
+            self.cache_path,
+            ttl_for=self.config.dedup_ttl_for,
+            max_entries=self.config.dedup_max_entries,
+            scheme=scheme,
+        )
+        logging.info(f"Deduplication cache loaded from: {os.path.abspath(self.cache_path)}")
+
+    def get_dedup_stats(self):
+        """Dedup cache size, log length and compaction counters."""
+        return self.dedup.stats()
 
     def set_status_callback(self, callback):
         """Sets a callback function to be called on status changes."""
@@ -86,146 +177,446 @@ class Sender(threading.Thread):
             self.status_callback(status, message)
         logging.info(f"Status: {status} - {message}")
 
-    @staticmethod
-    def _find_key_insensitive(target_name, accounts_dict):
-        """Finds API key by commander name (case-insensitive). Returns key or None."""
-        if target_name is None:
-            return None
-        if target_name in accounts_dict:
-            return accounts_dict[target_name]
-        target_lower = target_name.lower()
-        for name, key in accounts_dict.items():
-            if name.lower() == target_lower:
-                return key
-        return None
-
     def _resolve_api_key(self, commander_name):
-        """Resolves API key for the given commander (session, then accounts, then disk). Returns key or None."""
+        """Resolves API key for the given commander (session, then the account index). Returns key or None."""
+        if CURRENT_SESSION.get("commander") != commander_name:
+            # Ключ сессии годится только для командира сессии: события, прочитанные до
+            # смены командира, и backfill шлются за других
+            return self.keys.get(commander_name)
         api_key = CURRENT_SESSION.get("api_key")
         if api_key:
             return api_key
-        api_key = self._find_key_insensitive(commander_name, self.config.accounts)
-        if api_key:
-            return api_key
-        self.config.load_accounts()
-        api_key = self._find_key_insensitive(commander_name, self.config.accounts)
+        api_key = self.keys.get(commander_name)
         if api_key:
             CURRENT_SESSION["api_key"] = api_key
-            logging.info(f"🔑 Key loaded from disk for: {commander_name}")
+            logging.info(f"🔑 Key found in accounts for: {commander_name}")
         return api_key
 
+    def get_key_stats(self):
+        """Account index size, negative cache and accounts.json reload counters."""
+        return self.keys.stats()
+
     @staticmethod
     def purge_commander_cache(commander_name, cache_path):
         """Removes all cache entries for a given commander."""
-        if not cache_path.exists():
-            return
-
+        # Без загрузки кэша: одна запись в лог, её применит следующая загрузка
+        store = DedupStore(cache_path)
         try:
-            with open(cache_path, "r") as f:
-                content = f.read()
-                if not content:
-                    hashes = {}
-                else:
-                    hashes = json.loads(content)
-        except (IOError, json.JSONDecodeError):
-            return
+            store.discard_prefix(f"{commander_name}|")
+            logging.info(f"Cache purged for commander: {commander_name}")
+        finally:
+            store.close()
 
-        keys_to_delete = [key for key in hashes if key.startswith(f"{commander_name}|")]
+    def purge_commander(self, commander_name):
+        """Removes a commander's cache entries from the running sender (O(its entries))."""
+        loop = self._loop
+        if loop is not None:
+            try:
+                # Индекс принадлежит циклу воркера: меняем его там же
+                loop.call_soon_threadsafe(self._purge_commander, commander_name)
+                return
+            except RuntimeError:
+                pass  # цикл уже закрыт
+        self._purge_commander(commander_name)
 
-        if not keys_to_delete:
+    def _purge_commander(self, commander_name):
+        removed = self.dedup.purge_commander(commander_name)
+        logging.info(f"Cache purged for commander: {commander_name} ({removed} entries)")
+
+    def queue_event(self, event):
+        """
+        Adds an event to the processing queue. Thread-safe; wakes the worker if it is idle.
+        Live events get the commander of the session they were read in (backfill sets its
+        own), and EDDN events a snapshot of the session fields EDDN needs: by the time the
+        event is sent, the watcher may have switched CURRENT_SESSION (commander, system).
+        """
+        if "_commander" not in event:
+            event["_commander"] = CURRENT_SESSION.get("commander")
+        if event.get("event") in EDDN_REQUIRED_EVENTS and not event.get("_skip_eddn"):
+            event["_game_state"] = {
+                field: copy.copy(CURRENT_SESSION.get(field)) for field in EDDN_SESSION_FIELDS
+            }
+        if event.get("_skip_eddn"):
+            priority = PRIORITY_CLASSES[-1]  # backfill — история, живые события важнее
+        else:
+            priority = self.config.priority_for(event.get("event"))
+        self.event_queue.put(event, priority)
+        if self._worker_idle:
+            self._wake_worker()
+
+    def _wake_worker(self):
+        loop = self._loop
+        if loop is None:
             return
+        self._worker_idle = False
+        try:
+            loop.call_soon_threadsafe(self._event_ready.set)
+        except RuntimeError:
+            pass  # цикл уже закрыт
 
-        for key in keys_to_delete:
-            del hashes[key]
+    def get_queue_stats(self):
+        """Per priority lane: depth, spill counters, queue-wait and total latency."""
+        return self.event_queue.stats()
 
-        try:
-            with open(cache_path, "w") as f:
-                json.dump(hashes, f, indent=2)
-            logging.info(f"Cache purged for commander: {commander_name}")
-        except IOError:
-            logging.error(f"Failed to save purged cache for commander: {commander_name}")
+    @staticmethod
+    def get_endpoint_stats():
+        """Circuit state and counters per endpoint (portal, eddn, heartbeat)."""
+        return breaker_stats()
 
-    def queue_event(self, event):
-        """Adds an event to the processing queue."""
-        self.event_queue.put(event)
+    def get_rate_limit_stats(self):
+        """Configured rates, available tokens and throttling counters per destination."""
+        return {"portal": self.portal_limiter.stats(), "eddn": self.eddn_limiter.stats()}
+
+    def get_compression_stats(self):
+        """Raw vs on-the-wire bytes of request bodies per destination."""
+        return {"portal": self.portal_compressor.stats(), "eddn": self.eddn_compressor.stats()}
+
+    def get_connection_stats(self):
+        """Requests, TCP/TLS handshakes, connection reuse ratio and HTTP versions seen."""
+        return self.connection_stats.stats()
+
+    def get_batch_stats(self):
+        """Portal batching counters (None when batching is off)."""
+        return self.batcher.stats() if self.batcher else None
+
+    def get_lane_stats(self):
+        """Portal lane counters (None before the worker has started)."""
+        return self.portal_lanes.stats() if self.portal_lanes else None
 
     def run(self):
         """Processes the event queue and sends data to the API via a dedicated asyncio event loop."""
         asyncio.run(self._worker())
 
     async def _worker(self):
-        """Async worker: single httpx.AsyncClient, read from queue.Queue via to_thread, process_event / retry_offline_queue."""
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            while not self.stop_event.is_set():
-                try:
-                    event = await asyncio.to_thread(self.event_queue.get, timeout=1)
-                except queue.Empty:
-                    await self.retry_offline_queue(client)
-                    continue
-                if event:
-                    await self.process_event(event, client)
+        """Async worker: single httpx.AsyncClient; events arrive through the thread-safe bridge, offline retry runs as its own task."""
+        self._loop = asyncio.get_running_loop()
+        self._event_ready = asyncio.Event()
+        async with build_client(self.config, self.connection_stats) as client:
+            # Независимые полосы: EDDN (пул задач) и портал (последовательно на командира)
+            self.eddn_slots = asyncio.Semaphore(max(1, self.config.eddn_concurrency))
+            self.portal_slots = asyncio.Semaphore(max(1, self.config.portal_concurrency))
+            self.portal_lanes = OrderedLanes(
+                functools.partial(self._portal_lane_send, client),
+                tick=functools.partial(self._portal_lane_tick, client),
+                tick_timeout=self._portal_lane_timeout,
+                name="portal lane",
+            )
+            retry_task = asyncio.create_task(self._offline_retry_loop(client))
+            inflight = asyncio.Semaphore(max(1, self.config.sender_max_inflight))
+            tasks = set()
+            while True:
+                if not await self._acquire_slot(inflight):
+                    break
+                entry = await self._next_event()
+                if entry is _STOPPED:
+                    inflight.release()
+                    break
+                task = asyncio.create_task(self._process_queued(entry, client, inflight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            retry_task.cancel()
+            try:
+                await self._drain(list(tasks))
+                await asyncio.gather(retry_task, return_exceptions=True)
+            finally:
+                # Остаток уже в очереди: закрытие сбрасывает WAL в файл базы
+                self.offline_queue.close()
+        self.dedup.close()
+        self._loop = None
+
+    async def _drain(self, tasks):
+        """
+        Shutdown: events in flight get config.shutdown_drain_sec to finish, sent concurrently
+        by their lanes. Portal uploads still unsent after that go to the offline queue,
+        events not yet taken from event_queue are written to its spill files; both are
+        delivered on the next start.
+        """
+        started = time.monotonic()
+        deadline = max(0.0, self.config.shutdown_drain_sec)
+        stats = self.shutdown_stats
+        stats["inflight"] = len(tasks)
+        lanes_closed = asyncio.create_task(self.portal_lanes.close(timeout=deadline))
+        if tasks:
+            await asyncio.wait(tasks, timeout=deadline)
+        for _, (filtered_event, commander, dedup_entry, _, done) in await lanes_closed:
+            self._persist_portal(self._portal_envelope(filtered_event, commander), dedup_entry)
+            if not done.done():
+                done.set_result(None)
+        if self.batcher is not None:
+            for batch in self.batcher.drain():
+                for envelope, (dedup_entry, done) in batch.items:
+                    self._persist_portal(envelope, dedup_entry)
+                    if not done.done():
+                        done.set_result(None)
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()  # остались только отправки в EDDN: он принимает лишь живые данные
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        stats["drained"] = len(tasks) - len(pending)
+        stats["cancelled"] = len(pending)
+        stats["persisted_queue"] = self.event_queue.persist()
+        stats["elapsed_sec"] = round(time.monotonic() - started, 3)
+        logging.info(
+            "🛑 Sender drained: %s of %s in-flight event(s) finished, %s upload(s) saved to "
+            "the offline queue, %s queued event(s) saved for the next start (%.1f s).",
+            stats["drained"],
+            stats["inflight"],
+            stats["persisted_offline"],
+            stats["persisted_queue"],
+            stats["elapsed_sec"],
+        )
+
+    def _persist_portal(self, envelope, dedup_entry):
+        """Shutdown deadline passed before the upload: keep it in the offline queue."""
+        self._finish_portal_event(envelope, dedup_entry, False, True)
+        self.shutdown_stats["persisted_offline"] += 1
+
+    def get_shutdown_stats(self):
+        """What the last shutdown drained and persisted (zeros until stop())."""
+        return dict(self.shutdown_stats)
+
+    async def _acquire_slot(self, inflight):
+        """Waits for an in-flight slot; False when stop() comes first (the drain takes over)."""
+        if not inflight.locked():
+            await inflight.acquire()
+            return True
+        acquire = asyncio.ensure_future(inflight.acquire())
+        while not self.stop_event.is_set():
+            self._event_ready.clear()
+            stopped = asyncio.ensure_future(self._event_ready.wait())
+            await asyncio.wait((acquire, stopped), return_when=asyncio.FIRST_COMPLETED)
+            stopped.cancel()
+            if acquire.done():
+                return True
+        acquire.cancel()
+        return False
+
+    async def _next_event(self):
+        """
+        Next (ticket, event) from event_queue, highest priority first, awaiting the bridge
+        while it is empty (no polling).
+        """
+        while not self.stop_event.is_set():
+            self._event_ready.clear()
+            self._worker_idle = True  # до проверки очереди: put после неё точно разбудит
+            try:
+                entry = self.event_queue.get_nowait()
+            except queue.Empty:
+                await self._event_ready.wait()
+                continue
+            self._worker_idle = False
+            return entry
+        return _STOPPED
+
+    async def _offline_retry_loop(self, client):
+        """Offline queue retry, independent of event traffic."""
+        while True:
+            await asyncio.sleep(OFFLINE_RETRY_PAUSE_SEC)
+            try:
+                await self.retry_offline_queue(client)
+            except Exception:
+                logging.exception("Unexpected error in retry_offline_queue")
+
+    async def _process_queued(self, entry, client, inflight):
+        ticket, event = entry
+        try:
+            if event:
+                await self.process_event(event, client, ticket[0])
+        except Exception:
+            logging.exception("Unexpected error in process_event")
+        finally:
+            self.event_queue.task_done(ticket)
+            inflight.release()
 
     def stop(self):
-        """Stops the sender thread."""
+        """
+        Stops the sender thread: no new events are taken from the queue, in-flight ones are
+        drained until config.shutdown_drain_sec and the rest is persisted (see _drain).
+        Join the thread for at least that long.
+        """
         self.stop_event.set()
-
-    async def process_event(self, event, client):
-        """Processes a single event: routes to EDDN and/or Portal based on config. Preserves all logic."""
+        self._wake_worker()
+
+    async def process_event(self, event, client, priority="normal"):
+        """
+        Processes a single event: routes to EDDN and/or Portal based on config. Preserves all logic.
+        EDDN and portal run in their own lanes; returns once both are done with the event.
+        In the commander's portal lane, the event goes ahead of waiting lower-priority ones.
+        """
         send_to_portal = event.pop("_send_to_portal", False)
+        skip_eddn = event.pop("_skip_eddn", False)  # backfill: EDDN принимает только live-данные
+        commander_override = event.pop("_commander", None)
+        game_state = event.pop("_game_state", None)  # None: событие из spill прежней версии
         event_type = event.get("event")
         if not event_type:
             return
 
+        if event_type in SESSION_START_EVENTS and not skip_eddn:
+            self._schedule_warm_up(client)
+
         # --- GLOBAL FILTER: Игнорируем SquadronCarrier ---
         if event.get("CarrierType") == "SquadronCarrier":
             return
         # -------------------------------------------------
 
-        # --- EDDN dispatch (independent of Portal). Pass game_state=CURRENT_SESSION. ---
-        eddn_ok = False
-        if event_type in EDDN_REQUIRED_EVENTS:
+        # --- EDDN dispatch (independent of Portal). Session snapshot from queue_event. ---
+        eddn_result = None
+        if event_type in EDDN_REQUIRED_EVENTS and not skip_eddn:
+            eddn_result = asyncio.create_task(self._send_eddn(client, event, game_state))
+
+        # --- Portal dispatch (only when authorized by events.json) ---
+        portal_done = None
+        if send_to_portal:
+            prepared = self._prepare_portal_event(event, event_type, commander_override)
+            if prepared is not None:
+                filtered_event, commander_name, dedup_entry = prepared
+                # eddnsent дозаполняет полоса портала, когда будет готов результат EDDN.
+                # Командир определён сейчас: к отправке CURRENT_SESSION может смениться
+                portal_done = asyncio.get_running_loop().create_future()
+                self.portal_lanes.submit(
+                    commander_name,
+                    (filtered_event, commander_name, dedup_entry, eddn_result, portal_done),
+                    PRIORITY_CLASSES.index(priority),
+                )
+
+        if eddn_result is not None:
+            await eddn_result
+        if portal_done is not None:
+            await portal_done
+
+    def _schedule_warm_up(self, client):
+        """Pre-opens portal and EDDN connections in the background (at most every 30 s)."""
+        if not self.config.http_warmup:
+            return
+        now = time.monotonic()
+        if self._warmed_at is not None and now - self._warmed_at < WARMUP_MIN_INTERVAL_SEC:
+            return
+        self._warmed_at = now
+        from src.services import eddn_sender
+
+        urls = [url for url in (self.config.API_URL, eddn_sender.EDDN_UPLOAD_URL) if url]
+        self._warmup_task = asyncio.create_task(warm_up(client, urls, self.connection_stats))
+
+    async def _send_eddn(self, client, event, game_state=None):
+        """
+        EDDN lane: at most config.eddn_concurrency uploads at a time. Returns eddn_ok.
+        game_state: the session snapshot taken in queue_event (CURRENT_SESSION if None).
+        """
+        async with self.eddn_slots:
+            await self.eddn_limiter.acquire()
             try:
                 from src.services.eddn_sender import send_to_eddn
 
-                eddn_ok = await send_to_eddn(
-                    client, event, game_state=CURRENT_SESSION
+                return await send_to_eddn(
+                    client,
+                    event,
+                    game_state=game_state or CURRENT_SESSION,
+                    breaker=self.eddn_breaker,
+                    compressor=self.eddn_compressor,
                 )
             except Exception as e:
                 logging.warning("EDDN send failed: %s", e)
-                eddn_ok = False
+                return False
 
-        # --- Portal dispatch (only when authorized by events.json) ---
-        if send_to_portal:
-            self.config.update_field_schema(event_type, event)
-            field_rules = self.config.field_rules.get("filters", {}).get(event_type, {})
-            filtered_event = filter_event_fields(event, field_rules)
-            commander_name = CURRENT_SESSION.get("commander", "Unknown")
-            api_key = self._resolve_api_key(commander_name)
-            rule = self.config.event_rules.get(event_type)
-            cache_key = None
-            # Deduplication: preserve existing formula (commander_name + json.dumps sort_keys, hashlib.sha256)
-            if rule and rule.get("deduplicate"):
-                cache_key = f"{commander_name}|{event_type}"
-                if api_key:
-                    content_to_hash = filtered_event.copy()
-                    content_to_hash.pop("timestamp", None)
-                    content_to_hash.pop("event", None)
-                    content_str = f"{commander_name}|{json.dumps(content_to_hash, sort_keys=True)}"
-                    event_hash = hashlib.sha256(content_str.encode("utf-8")).hexdigest()
-                    if self.hashes.get(cache_key) == event_hash:
-                        logging.info(f"Skipping duplicate event for {commander_name}: {event_type}")
-                        return
-                    self.hashes[cache_key] = event_hash
-            if event_type in EDDN_REQUIRED_EVENTS:
-                filtered_event["eddnsent"] = eddn_ok
-            success, queue_on_failure = await self._send_to_api(client, filtered_event)
-            if not success and cache_key is not None and cache_key in self.hashes:
-                self.hashes.pop(cache_key)
-                self.save_hashes()
-            elif success and cache_key is not None and cache_key in self.hashes:
-                self.save_hashes()
-            if not success and queue_on_failure:
-                self.offline_queue.put((filtered_event, time.time()))
+    async def _portal_lane_send(self, client, lane_key, item):
+        """Portal lane (one per commander, in queue order): waits for eddnsent, then sends."""
+        filtered_event, commander, dedup_entry, eddn_result, done = item
+        batched = False
+        envelope = None
+        try:
+            if eddn_result is not None:
+                filtered_event["eddnsent"] = await eddn_result
+            # Событие готово (eddnsent проставлен): кодируем один раз на все попытки
+            envelope = self._portal_envelope(filtered_event, commander)
+            if self.batcher is not None and self.portal_batches_supported:
+                ready = self.batcher.add(commander, envelope, (dedup_entry, done))
+                batched = True
+                for batch in ready:
+                    await self._send_batch(client, batch)
+                return
+            success, queue_on_failure = await self._send_to_api(client, envelope)
+            self._finish_portal_event(envelope, dedup_entry, success, queue_on_failure)
+        except asyncio.CancelledError:
+            # Срок остановки истёк: событие дождётся следующего запуска в офлайн-очереди
+            # (если запрос уже дошёл до портала, он получит его повторно)
+            if not batched:
+                if envelope is None:
+                    envelope = self._portal_envelope(filtered_event, commander)
+                self._persist_portal(envelope, dedup_entry)
+            raise
+        finally:
+            if not batched and not done.done():
+                done.set_result(None)
+
+    def _portal_lane_timeout(self, commander):
+        if self.batcher is None:
+            return None
+        return self.batcher.time_until_due(None, (commander,))
+
+    async def _portal_lane_tick(self, client, commander, final):
+        """Sends this commander's batches that are past max_wait_ms (all of them when final)."""
+        if self.batcher is None:
+            return
+        commanders = (commander,)
+        batches = self.batcher.drain(commanders) if final else self.batcher.due(None, commanders)
+        for batch in batches:
+            await self._send_batch(client, batch)
+
+    def _prepare_portal_event(self, event, event_type, commander_override):
+        """
+        Field filter + dedup. Returns (filtered_event, commander_name, dedup_entry), or None
+        for a duplicate. commander_name is the one the event is sent for, fixed at this point.
+        """
+        self.config.update_field_schema(event_type, event)
+        field_rules = self.config.field_rules.get("filters", {}).get(event_type, {})
+        filtered_event = filter_event_fields(event, field_rules)
+        commander_name = commander_override or CURRENT_SESSION.get("commander") or "Unknown"
+        api_key = self._resolve_api_key(commander_name)
+        rule = self.config.event_rules.get(event_type)
+        dedup_entry = None
+        # Deduplication: 16-byte content digest per commander + event type (content_hash);
+        # entries from the legacy sha256 formula are still recognised
+        if rule and rule.get("deduplicate") and api_key:
+            cache_key = self.dedup.key(commander_name, event_type)
+            scheme = self.dedup.scheme
+            event_hash = content_digest(filtered_event, commander_name, scheme)
+            if self.dedup.matches(
+                cache_key,
+                event_hash,
+                lambda: content_digest(filtered_event, commander_name, other_scheme(scheme)),
+            ):
+                logging.info(f"Skipping duplicate event for {commander_name}: {event_type}")
+                return None
+            # Ключ и хэш именно этого события: подтверждается или откатывается только он
+            dedup_entry = (cache_key, event_hash)
+            self.dedup.set(*dedup_entry)
+        if event_type in EDDN_REQUIRED_EVENTS:
+            filtered_event["eddnsent"] = False  # итог EDDN подставит полоса портала
+        return filtered_event, commander_name, dedup_entry
+
+    def _portal_envelope(self, event, commander):
+        """Encodes a portal event once, with the headers of the commander it is sent for."""
+        return Envelope.encode(
+            event, commander, self._portal_headers(commander), self.config.API_URL
+        )
+
+    def _finish_portal_event(self, envelope, dedup_entry, success, queue_on_failure):
+        """Dedup commit/rollback (one log record) and offline queueing for one sent event."""
+        if dedup_entry is not None:
+            if success:
+                self.dedup.commit(*dedup_entry)
+            else:
+                self.dedup.rollback(*dedup_entry)
+        if not success and queue_on_failure:
+            retry = envelope.retried()
+            self.offline_queue.put(
+                retry.body,
+                retry.event_type,
+                retry.commander,
+                queued=retry.queued,
+                attempts=retry.attempt,
+            )
 
     def _log_event_details(self, event):
         """Logs detailed information for specific events."""
@@ -243,109 +634,264 @@ class Sender(threading.Thread):
         else:
             logging.info(f"Successfully sent event: {event_type}")
 
-    async def _send_to_api(self, client, event):
-        """Sends a single event to the API. Returns (success, queue_on_failure). Preserves _log_event_details, update_status, FAILED_ACCOUNTS, Shutdown->Waiting."""
-        cmdr_name = CURRENT_SESSION.get("commander") or "Unknown"
-        api_key = CURRENT_SESSION.get("api_key")
-
-        if not api_key:
-            api_key = self._find_key_insensitive(cmdr_name, self.config.accounts)
-        if not api_key:
-            self.config.load_accounts()
-            api_key = self._find_key_insensitive(cmdr_name, self.config.accounts)
-            if api_key:
-                CURRENT_SESSION["api_key"] = api_key
-                logging.info(f"🔑 Key loaded from disk for: {cmdr_name}")
+    def _portal_headers(self, cmdr_name):
+        """Request headers for cmdr_name, or None when nothing can be sent (no key / no URL)."""
+        api_key = self._resolve_api_key(cmdr_name)
 
         if not api_key:
             logging.warning(f"Cannot send event: No active API Key for commander {cmdr_name}")
-            return (False, False)
+            return None
 
         if not self.config.API_URL:
             logging.error("API URL is not configured. Cannot send event.")
-            return (False, False)
+            return None
 
-        x_commander_value = base64.b64encode(cmdr_name.encode("utf-8")).decode("ascii")
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": self.config.USER_AGENT,
-            "x-api-key": api_key,
-            "x-commander": x_commander_value,
-        }
+        return portal_headers(cmdr_name, api_key, self.config.USER_AGENT)
 
-        try:
-            response = await client.post(
-                self.config.API_URL, headers=headers, json=event
-            )
+    def _handle_portal_status(self, envelope, status_code, detail=""):
+        """Per-event outcome of a portal response. Returns (success, queue_on_failure)."""
+        cmdr_name = envelope.commander
+        # --- 1. УСПЕШНАЯ ОТПРАВКА (200 OK) ---
+        if status_code == 200:
+            event_type = envelope.event_type
+            if envelope.event is not None:
+                self._log_event_details(envelope.event)
+            else:
+                logging.info(f"Successfully sent event: {event_type} (retry {envelope.attempt})")
+            if event_type == "Shutdown":
+                logging.info("🛑 Game Shutdown detected. Switching to standby.")
+                self.update_status("Waiting", "Game closed. Waiting for Commander...")
+            else:
+                self.update_status("Running", f"Event {event_type} sent")
+            FAILED_ACCOUNTS.discard(cmdr_name)
+            return (True, False)
 
-            # --- 1. УСПЕШНАЯ ОТПРАВКА (200 OK) ---
-            if response.status_code == 200:
-                self._log_event_details(event)
-                event_type = event.get("event")
-                if event_type == "Shutdown":
-                    logging.info("🛑 Game Shutdown detected. Switching to standby.")
-                    self.update_status("Waiting", "Game closed. Waiting for Commander...")
-                else:
-                    event_type = event.get("event", "Event")
-                    self.update_status("Running", f"Event {event_type} sent")
-                FAILED_ACCOUNTS.discard(cmdr_name)
-                return (True, False)
-
-            # --- 2. RATE LIMIT (429) — sleep Retry-After, then queue for later ---
-            if response.status_code == 429:
-                retry_after = 60
-                raw = response.headers.get("Retry-After")
-                if raw is not None:
-                    try:
-                        retry_after = int(raw)
-                    except ValueError:
-                        pass
-                logging.warning("⏳ Rate limited (429). Sleeping %s s (Retry-After).", retry_after)
-                await asyncio.sleep(retry_after)
-                return (False, True)
-
-            # --- 3. ОШИБКА АВТОРИЗАЦИИ (Красный) — в очередь не ставим ---
-            if response.status_code in [401, 403]:
-                logging.error(f"⛔ Auth failed for {cmdr_name} (Status: {response.status_code})")
-                FAILED_ACCOUNTS.add(cmdr_name)
-                self.update_status("Error", f"Auth Error {response.status_code} for {cmdr_name}")
-                return (False, False)
-
-            # --- 4. ОШИБКА СЕРВЕРА — ставим в офлайн-очередь ---
-            logging.error(f"Failed to send event: {response.status_code} - {response.text}")
-            self.update_status("Error", "Failed to send event, queuing.")
+        # --- 2. RATE LIMIT (429) — queue for later (Retry-After holds the portal breaker open) ---
+        if status_code == 429:
             return (False, True)
 
+        # --- 3. ОШИБКА АВТОРИЗАЦИИ (Красный) — в очередь не ставим ---
+        if status_code in [401, 403]:
+            logging.error(f"⛔ Auth failed for {cmdr_name} (Status: {status_code})")
+            FAILED_ACCOUNTS.add(cmdr_name)
+            self.update_status("Error", f"Auth Error {status_code} for {cmdr_name}")
+            return (False, False)
+
+        # --- 4. ОШИБКА СЕРВЕРА — ставим в офлайн-очередь ---
+        logging.error(f"Failed to send event: {status_code} - {detail}")
+        self.update_status("Error", "Failed to send event, queuing.")
+        return (False, True)
+
+    def _record_portal_response(self, response):
+        """Feeds the portal breaker: 429 and 5xx are endpoint failures, anything else is health."""
+        status = response.status_code
+        if status == 429:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is None:
+                retry_after = RATE_LIMIT_DEFAULT_SEC
+            logging.warning(
+                "⏳ Rate limited (429). Portal paused for %s s (Retry-After).", retry_after
+            )
+            self.portal_breaker.record_failure("HTTP 429", retry_after)
+        elif status >= 500:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.portal_breaker.record_failure(f"HTTP {status}", retry_after)
+        else:
+            self.portal_breaker.record_success()
+
+    async def _admit_portal_request(self, api_key):
+        """
+        Breaker first, then the rate limit: while the breaker is open no token is taken from
+        live traffic. Runs before a portal slot is taken, so a throttled key does not hold a
+        slot other commanders' uploads are waiting for.
+        """
+        if self.portal_breaker.refuses():
+            return False  # без пробы: её выдаст allow() после токена
+        await self.portal_limiter.acquire(api_key)
+        return self.portal_breaker.allow()
+
+    async def _send_to_api(self, client, envelope):
+        """Sends a single event to the API. Returns (success, queue_on_failure). Preserves _log_event_details, update_status, FAILED_ACCOUNTS, Shutdown->Waiting."""
+        headers = envelope.headers
+        if headers is None:
+            return (False, False)
+        if not await self._admit_portal_request(headers["x-api-key"]):
+            return (False, True)  # портал недоступен: сразу в офлайн-очередь, без ожидания
+
+        try:
+            async with self.portal_slots:
+                response = await body_compressor.post(
+                    client, envelope.destination, envelope.body, headers, self.portal_compressor
+                )
+            self._record_portal_response(response)
+            return self._handle_portal_status(envelope, response.status_code, response.text)
+
         except (httpx.HTTPError, httpx.TimeoutException) as e:
+            self.portal_breaker.record_failure(type(e).__name__)
             logging.error("Network error while sending event: %s", e)
             self.update_status("Error", "Network error, queuing event.")
             return (False, True)
         except Exception:
+            self.portal_breaker.record_failure("unexpected error")
             logging.exception("Unexpected error in _send_to_api")
             return (False, True)
 
-    async def retry_offline_queue(self, client):
-        """Tries to send events from the offline queue. Uses time.time() and OFFLINE_QUEUE_TIMEOUT_SEC."""
-        if self.offline_queue.empty():
-            return
-        logging.info("Retrying %s events from the offline queue.", self.offline_queue.qsize())
-        while not self.offline_queue.empty():
-            item = self.offline_queue.get()
-            if isinstance(item, tuple):
-                event, first_queued = item
-            else:
-                event, first_queued = item, time.time()
-            if time.time() - first_queued > OFFLINE_QUEUE_TIMEOUT_SEC:
-                logging.warning(
-                    "Dropping event %s after %ss timeout.",
-                    event.get("event", "?"),
-                    OFFLINE_QUEUE_TIMEOUT_SEC,
+    @property
+    def portal_batch_url(self):
+        return f"{self.config.API_URL.rstrip('/')}/batch"
+
+    @staticmethod
+    def _batch_statuses(response, count):
+        """
+        Per-event statuses of a 200 batch response: {"results": [{"status": 200}, ...]} or a
+        bare list of statuses. Anything else means the whole batch shares response.status_code.
+        """
+        if response.status_code != 200:
+            return [response.status_code] * count
+        try:
+            body = json_codec.loads(response.content)
+        except ValueError:
+            body = None
+        results = body.get("results") if isinstance(body, dict) else body
+        if not isinstance(results, list) or len(results) != count:
+            return [response.status_code] * count
+        statuses = []
+        for item in results:
+            status = item.get("status") if isinstance(item, dict) else item
+            statuses.append(status if isinstance(status, int) else 500)
+        return statuses
+
+    async def _send_batch_to_api(self, client, batch):
+        """Sends a PortalBatch as one JSON array. Returns (success, queue_on_failure) per event."""
+        envelopes = [envelope for envelope, _ in batch.items]
+        if not self.portal_batches_supported:
+            return [await self._send_to_api(client, envelope) for envelope in envelopes]
+        headers = envelopes[0].headers  # пакет одного командира — заголовки общие
+        if headers is None:
+            return [(False, False)] * len(envelopes)
+        if not await self._admit_portal_request(headers["x-api-key"]):  # пакет — один запрос
+            return [(False, True)] * len(envelopes)
+
+        try:
+            async with self.portal_slots:
+                response = await body_compressor.post(
+                    client, self.portal_batch_url, batch.body(), headers, self.portal_compressor
                 )
-                continue
-            success, queue_on_failure = await self._send_to_api(client, event)
+        except (httpx.HTTPError, httpx.TimeoutException) as e:
+            self.portal_breaker.record_failure(type(e).__name__)
+            logging.error("Network error while sending batch of %s events: %s", len(envelopes), e)
+            self.update_status("Error", "Network error, queuing event.")
+            return [(False, True)] * len(envelopes)
+        except Exception:
+            self.portal_breaker.record_failure("unexpected error")
+            logging.exception("Unexpected error in _send_batch_to_api")
+            return [(False, True)] * len(envelopes)
+
+        self._record_portal_response(response)
+
+        if response.status_code in BATCH_UNSUPPORTED_STATUSES:
+            # Портал без batch-эндпоинта: отключаем пакетный режим, шлём по одному
+            logging.warning(
+                "Portal does not accept batches (%s). Falling back to single uploads.",
+                response.status_code,
+            )
+            self.portal_batches_supported = False
+            return [await self._send_to_api(client, envelope) for envelope in envelopes]
+        statuses = self._batch_statuses(response, len(envelopes))
+        return [
+            self._handle_portal_status(envelope, status, f"batch item {i}/{len(envelopes)}")
+            for i, (envelope, status) in enumerate(zip(envelopes, statuses), 1)
+        ]
+
+    async def _send_batch(self, client, batch):
+        """Sends one batch and applies per-event dedup commit/rollback and offline queueing."""
+        try:
+            results = await self._send_batch_to_api(client, batch)
+            for (envelope, (dedup_entry, _)), (success, queue_on_failure) in zip(
+                batch.items, results
+            ):
+                self._finish_portal_event(envelope, dedup_entry, success, queue_on_failure)
+        except asyncio.CancelledError:
+            for envelope, (dedup_entry, _) in batch.items:
+                self._persist_portal(envelope, dedup_entry)
+            raise
+        finally:
+            for _, (_, done) in batch.items:
+                if not done.done():
+                    done.set_result(None)
+
+    async def retry_offline_queue(self, client):
+        """
+        Replays the offline queue: expired events are dropped, then each commander's events
+        are sent oldest first. A commander stops at its first retryable failure, so the rest
+        keep their order for the next round.
+        """
+        store = self.offline_queue
+        store.purge_expired()
+        if store.empty() or self.portal_breaker.retry_in() > 0:
+            return  # пока цепь открыта, не стучимся: первая попытка после паузы — проба
+        logging.info("Retrying %s events from the offline queue.", len(store))
+        for commander in store.commanders():
+            while True:
+                rows = store.peek(commander, OFFLINE_DRAIN_CHUNK)
+                if not rows:
+                    break
+                done, all_sent = await self._replay_offline(client, commander, rows)
+                store.ack(done)
+                if not all_sent:
+                    break
+                await self._yield_to_live()
+        if store.empty():
+            self.update_status("Running", "Offline queue cleared.")
+
+    async def _yield_to_live(self):
+        """Lets queued live events go first, for at most OFFLINE_YIELD_MAX_SEC."""
+        deadline = time.monotonic() + OFFLINE_YIELD_MAX_SEC
+        while not self.event_queue.empty() and time.monotonic() < deadline:
+            await asyncio.sleep(OFFLINE_YIELD_POLL_SEC)
+
+    async def _replay_offline(self, client, commander, rows):
+        """
+        Sends stored rows as they are: the stored body becomes the envelope, nothing is
+        decoded or encoded again. Rows that fail retryably get their attempt counted.
+        Returns (ids to remove, True if nothing has to be retried).
+        """
+        cmdr_name = commander or CURRENT_SESSION.get("commander") or "Unknown"
+        headers = self._portal_headers(cmdr_name)
+        envelopes = [
+            (
+                row_id,
+                Envelope(
+                    body, event_type, cmdr_name, headers, self.config.API_URL, attempts, queued
+                ),
+            )
+            for row_id, event_type, body, queued, attempts in rows
+        ]
+        done = []
+
+        if self.batcher is not None and self.portal_batches_supported:
+            # Быстрая выгрузка: сохранённые тела уходят одним пакетом без перекодирования
+            size = self.batcher.max_events
+            for start in range(0, len(envelopes), size):
+                chunk = envelopes[start : start + size]
+                batch = PortalBatch(commander)
+                batch.items = [(envelope, None) for _, envelope in chunk]
+                results = await self._send_batch_to_api(client, batch)
+                retry = []
+                for (row_id, _), (success, queue_on_failure) in zip(chunk, results):
+                    if success or not queue_on_failure:
+                        done.append(row_id)
+                    else:
+                        retry.append(row_id)
+                if retry:
+                    self.offline_queue.retried(retry)
+                    return done, False
+            return done, True
+
+        for row_id, envelope in envelopes:
+            success, queue_on_failure = await self._send_to_api(client, envelope)
             if not success and queue_on_failure:
-                self.offline_queue.put((event, first_queued))
-            if self.offline_queue.qsize() > 0:
-                await asyncio.sleep(OFFLINE_RETRY_PAUSE_SEC)
-            else:
-                self.update_status("Running", "Offline queue cleared.")
+                self.offline_queue.retried([row_id])
+                return done, False
+            done.append(row_id)
+        return done, True
@@ -0,0 +1,77 @@
+"""
+Exclusive lock on the app data directory, held by whoever runs the Sender that owns its
+files (dedup log and its compaction, spill segments, offline_queue.sqlite3). A second
+writer on the same files could corrupt them, so the background service and a standalone
+backfill take this lock first. It is an OS file lock: the OS releases it when the process
+exits, so a crash leaves nothing stale behind.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+LOCK_FILE_NAME = "sender.lock"
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class AppDataLock:
+    def __init__(self, app_data_dir):
+        self.path = Path(app_data_dir) / LOCK_FILE_NAME
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Takes the lock without waiting. False when another sender holds it."""
+        if self._fd is not None:
+            return True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logging.error("Could not open %s: %s", self.path, e)
+            return False
+        if not _try_lock(fd):
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            _unlock(self._fd)
+        except OSError:
+            pass
+        os.close(self._fd)
+        self._fd = None
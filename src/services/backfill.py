@@ -0,0 +1,178 @@
+"""
+Historical journal backfill / replay.
+Parses past Journal.*.log files in a process pool and pushes portal-bound events through
+the running Sender, so events.json rules and the dedup cache apply as for live events.
+Events carry the commander active at that point of the journal; EDDN is skipped because
+EDDN only accepts live data.
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from src.services.journal_index import JournalIndex
+from utils import extract_event_name, parse_json_line
+
+BACKFILL_MAX_PENDING = 200  # не держим в очереди Sender больше N событий из backfill
+STOP_CHECK_SEC = 0.05  # как часто ожидание очереди проверяет остановку Sender
+PROGRESS_INTERVAL_SEC = 2.0
+_SESSION_START_EVENTS = ("Commander", "LoadGame")
+
+
+def select_journal_files(
+    journal_dir,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    pattern: Optional[str] = None,
+) -> list[Path]:
+    """Journal files in chronological order, filtered by [since, until) and/or a file glob."""
+    index = JournalIndex(journal_dir)
+    index.build()
+    return index.select(since, until, pattern)
+
+
+def _parse_journal_file(path_str: str, send_events: frozenset):
+    """
+    Worker (runs in a child process): returns (events, bytes, lines, last_commander).
+    Only events with action "send" are decoded; everything else is skipped by name.
+    """
+    with open(path_str, "rb") as f:
+        data = f.read()
+    events = []
+    commander = None
+    lines = 0
+    for raw in data.split(b"\n"):
+        if not raw.strip():
+            continue
+        lines += 1
+        line = raw.decode("utf-8", errors="replace")
+        name = extract_event_name(line)
+        if name not in send_events and name not in _SESSION_START_EVENTS:
+            continue
+        event_data = parse_json_line(line)
+        if not event_data or "event" not in event_data:
+            continue
+        event_type = event_data["event"]
+        if event_type in _SESSION_START_EVENTS:
+            commander = event_data.get("Name") or event_data.get("Commander") or commander
+        if event_type in send_events:
+            event_data["_send_to_portal"] = True
+            event_data["_skip_eddn"] = True
+            event_data["_commander"] = commander
+            events.append(event_data)
+    return events, len(data), lines, commander
+
+
+def _log_progress(stats: dict) -> None:
+    logging.info(
+        "⏮ Backfill: %s/%s files, %s events, %.0f events/s, %.2f MB/s",
+        stats["files_done"],
+        stats["files_total"],
+        stats["events"],
+        stats["events_per_sec"],
+        stats["bytes_per_sec"] / 1024 / 1024,
+    )
+
+
+def run_backfill(
+    config,
+    sender,
+    files: list[Path],
+    workers: Optional[int] = None,
+    max_pending: int = BACKFILL_MAX_PENDING,
+    progress: Optional[Callable[[dict], None]] = _log_progress,
+    wait: bool = True,
+) -> dict:
+    """
+    Replays files (chronological order) through sender. Parsing runs in up to `workers`
+    processes; at most `max_pending` backfill events wait in the sender queue at a time.
+    With wait=True returns after the sender has processed every queued event.
+    Stops early (stats["stopped"] = True) when the sender is stopped meanwhile; events
+    already queued are then kept by the sender's shutdown drain.
+    """
+    send_events = frozenset(
+        event_type
+        for event_type, rule in config.event_rules.items()
+        if rule.get("action", config.default_action) == "send"
+    )
+    workers = workers or max(1, min(len(files), (os.cpu_count() or 2) - 1))
+    stats = {
+        "files_total": len(files),
+        "files_done": 0,
+        "lines": 0,
+        "events": 0,
+        "bytes": 0,
+        "elapsed": 0.0,
+        "events_per_sec": 0.0,
+        "bytes_per_sec": 0.0,
+        "stopped": False,
+    }
+    if not files:
+        return stats
+
+    started = time.monotonic()
+    last_report = started
+    commander = None
+
+    def refresh():
+        stats["elapsed"] = time.monotonic() - started
+        elapsed = max(stats["elapsed"], 1e-9)
+        stats["events_per_sec"] = stats["events"] / elapsed
+        stats["bytes_per_sec"] = stats["bytes"] / elapsed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Скользящее окно задач: парсинг не убегает далеко вперёд отправки (память)
+        pending = deque()
+        remaining = iter(files)
+        for path in remaining:
+            pending.append(pool.submit(_parse_journal_file, str(path), send_events))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            events, size, lines, last_commander = pending.popleft().result()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                pending.append(pool.submit(_parse_journal_file, str(next_path), send_events))
+
+            for event in events:
+                if event["_commander"] is None:
+                    event["_commander"] = commander  # продолжение журнала (.02.log и т.д.)
+                while sender.event_queue.qsize() >= max_pending:
+                    if sender.stop_event.wait(STOP_CHECK_SEC):
+                        break
+                if sender.stop_event.is_set():
+                    stats["stopped"] = True
+                    break
+                sender.queue_event(event)
+                stats["events"] += 1
+            if stats["stopped"]:
+                for future in pending:
+                    future.cancel()  # нечитанные файлы не разбираем
+                break
+            commander = last_commander or commander
+            stats["files_done"] += 1
+            stats["lines"] += lines
+            stats["bytes"] += size
+
+            now = time.monotonic()
+            if progress and now - last_report >= PROGRESS_INTERVAL_SEC:
+                refresh()
+                progress(stats)
+                last_report = now
+
+    if wait:
+        while not sender.event_queue.join(timeout=STOP_CHECK_SEC * 10):
+            if sender.stop_event.is_set():
+                stats["stopped"] = True
+                break
+    if stats["stopped"]:
+        logging.warning("⏮ Backfill interrupted: the sender was stopped.")
+    refresh()
+    if progress:
+        progress(stats)
+    return stats
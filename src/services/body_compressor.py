@@ -0,0 +1,119 @@
+"""
+Optional compression of already-encoded request bodies (portal and EDDN uploads).
+Bodies below `min_bytes` go out raw: compressing a small event saves nothing worth the
+CPU and the extra header. gzip uses zlib directly (wbits=31, no timestamp, so the output
+is deterministic). zstd needs the optional `zstandard` package and falls back to gzip
+when it is not installed. A server that answers 415 gets raw bodies from then on, via
+disable(). Counters track bytes before and after, to report what the wire saved.
+"""
+
+import logging
+import zlib
+from typing import Optional
+
+GZIP = "gzip"
+ZSTD = "zstd"
+NONE = "none"
+ALGORITHMS = (GZIP, ZSTD, NONE)
+DEFAULT_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+UNSUPPORTED_STATUS = 415  # Unsupported Media Type: сервер не принимает Content-Encoding
+
+
+def _zstd_compressor():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+
+
+class BodyCompressor:
+    def __init__(self, name: str, algorithm: str = GZIP, min_bytes: int = DEFAULT_MIN_BYTES):
+        self.name = name
+        self.min_bytes = max(0, min_bytes)
+        self._zstd = None
+        if algorithm not in ALGORITHMS:
+            logging.warning("%s: unknown compression '%s', sending raw.", name, algorithm)
+            algorithm = NONE
+        if algorithm == ZSTD:
+            self._zstd = _zstd_compressor()
+            if self._zstd is None:
+                logging.info("%s: zstandard is not installed, using gzip.", name)
+                algorithm = GZIP
+        self.algorithm = algorithm
+
+        # Метрики
+        self.requests_total = 0
+        self.compressed_total = 0
+        self.raw_bytes_total = 0
+        self.wire_bytes_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.algorithm != NONE
+
+    def encode(self, body: bytes) -> tuple[bytes, Optional[str]]:
+        """(bytes to send, Content-Encoding or None)."""
+        self.requests_total += 1
+        self.raw_bytes_total += len(body)
+        encoding = None
+        if self.enabled and len(body) >= self.min_bytes:
+            if self.algorithm == ZSTD:
+                packed = self._zstd.compress(body)
+            else:
+                packed = zlib.compress(body, GZIP_LEVEL, wbits=31)
+            if len(packed) < len(body):
+                body = packed
+                encoding = self.algorithm
+                self.compressed_total += 1
+        self.wire_bytes_total += len(body)
+        return body, encoding
+
+    def resent_raw(self, body: bytes) -> None:
+        """
+        A compressed body was refused and `body` went out again raw: still one request and
+        one raw body; the wire carried both attempts.
+        """
+        self.compressed_total -= 1
+        self.wire_bytes_total += len(body)
+
+    def disable(self, reason: str) -> None:
+        if self.enabled:
+            logging.warning("%s: compressed uploads rejected (%s), sending raw.", self.name, reason)
+        self.algorithm = NONE
+
+    def stats(self) -> dict:
+        saved = self.raw_bytes_total - self.wire_bytes_total
+        return {
+            "algorithm": self.algorithm,
+            "min_bytes": self.min_bytes,
+            "requests_total": self.requests_total,
+            "compressed_total": self.compressed_total,
+            "raw_bytes_total": self.raw_bytes_total,
+            "wire_bytes_total": self.wire_bytes_total,
+            "saved_bytes_total": saved,
+            "saved_ratio": round(saved / self.raw_bytes_total, 3) if self.raw_bytes_total else 0.0,
+        }
+
+
+async def post(client, url: str, body: bytes, headers: dict, compressor=None, **kwargs):
+    """
+    client.post with the body compressed by `compressor` (None: raw). A 415 to a compressed
+    body turns the compressor off and resends the same body raw, once (counted as one
+    request in the compressor's stats).
+    """
+    if compressor is None:
+        return await client.post(url, content=body, headers=headers, **kwargs)
+    content, encoding = compressor.encode(body)
+    if encoding is None:
+        return await client.post(url, content=content, headers=headers, **kwargs)
+    response = await client.post(
+        url, content=content, headers={**headers, "Content-Encoding": encoding}, **kwargs
+    )
+    if response.status_code != UNSUPPORTED_STATUS:
+        return response
+    compressor.disable(f"HTTP {response.status_code}")
+    compressor.resent_raw(body)
+    return await client.post(url, content=body, headers=headers, **kwargs)
@@ -0,0 +1,168 @@
+"""
+Per-endpoint circuit breaker (portal, EDDN, heartbeat).
+closed: requests pass; `failure_threshold` consecutive failures open the circuit.
+open: requests are refused without touching the network until the backoff expires. The
+backoff is exponential with full jitter, or the server's Retry-After when it sent one.
+half-open: one probe request decides between closed and a longer open.
+A refused request costs nothing, so callers queue the work and move on instead of sleeping.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_BASE_DELAY_SEC = 1.0
+DEFAULT_MAX_DELAY_SEC = 300.0
+PROBE_TIMEOUT_SEC = 30.0  # зависшая проба не должна держать half-open вечно
+
+_REGISTRY: dict[str, "CircuitBreaker"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        base_delay: float = DEFAULT_BASE_DELAY_SEC,
+        max_delay: float = DEFAULT_MAX_DELAY_SEC,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[float, float], float] = random.uniform,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._attempt = 0  # номер открытия подряд: растит окно backoff
+        self._open_until = 0.0
+        self._probe_started: Optional[float] = None
+
+        # Метрики
+        self.opened_total = 0
+        self.rejected_total = 0
+        self.failures_total = 0
+        self.successes_total = 0
+        self.last_error = ""
+
+        with _REGISTRY_LOCK:
+            _REGISTRY[name] = self
+
+    def allow(self) -> bool:
+        """True if a request may go out now. In half-open only one probe is let through."""
+        with self._lock:
+            now = self._clock()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now >= self._open_until:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == HALF_OPEN:
+                probe = self._probe_started
+                if probe is None or now - probe >= PROBE_TIMEOUT_SEC:
+                    self._probe_started = now
+                    return True
+            self.rejected_total += 1
+            return False
+
+    def refuses(self) -> bool:
+        """
+        True (and counted as rejected) while allow() would refuse for sure. Does not start a
+        probe: lets callers skip costly preparation (a rate-limit token) before allow().
+        """
+        if self.retry_in() <= 0:
+            return False
+        with self._lock:
+            self.rejected_total += 1
+        return True
+
+    def retry_in(self) -> float:
+        """Seconds until the next request would be allowed (0 when closed). Does not probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            if self.state == HALF_OPEN:
+                return 0.0 if self._probe_started is None else PROBE_TIMEOUT_SEC
+            return max(0.0, self._open_until - self._clock())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.successes_total += 1
+            self._failures = 0
+            if self.state != CLOSED:
+                logging.info("🔌 %s: circuit closed, endpoint is back.", self.name)
+            self.state = CLOSED
+            self._attempt = 0
+            self._probe_started = None
+
+    def record_failure(self, error: str = "", retry_after: Optional[float] = None) -> None:
+        """A failed request. retry_after (429/503) opens the circuit for at least that long."""
+        with self._lock:
+            self.failures_total += 1
+            self._failures += 1
+            self.last_error = error
+            if retry_after is None:
+                if self.state == OPEN:
+                    return  # запросы, ушедшие до открытия, не удлиняют backoff
+                if self.state == CLOSED and self._failures < self.failure_threshold:
+                    return
+            self._open(retry_after)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "retry_in": round(max(0.0, self._open_until - self._clock()), 1)
+                if self.state == OPEN
+                else 0.0,
+                "opened_total": self.opened_total,
+                "rejected_total": self.rejected_total,
+                "failures_total": self.failures_total,
+                "successes_total": self.successes_total,
+                "last_error": self.last_error,
+            }
+
+    def _open(self, retry_after: Optional[float]) -> None:
+        self._attempt += 1
+        window = min(self.max_delay, self.base_delay * 2 ** (self._attempt - 1))
+        delay = self._rng(0, window)  # full jitter
+        if retry_after is not None:
+            # Сервер сам назвал срок; небольшой разброс, чтобы клиенты не вернулись разом
+            delay = min(self.max_delay, retry_after) + self._rng(0, self.base_delay)
+        self._open_until = self._clock() + delay
+        self._probe_started = None
+        if self.state != OPEN:
+            self.opened_total += 1
+            logging.warning(
+                "🔌 %s: circuit open for %.1f s (%s)", self.name, delay, self.last_error or "?"
+            )
+        self.state = OPEN
+
+
+def breaker_stats() -> dict:
+    """State and counters of every endpoint breaker, by name."""
+    with _REGISTRY_LOCK:
+        breakers = list(_REGISTRY.values())
+    return {b.name: b.stats() for b in breakers}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After in seconds (delta form only; HTTP dates are ignored)."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,182 @@
+"""
+Companion-file watcher: Status.json, Cargo.json, NavRoute.json, Market.json and friends.
+The game rewrites these files in place (Status.json several times per second, mostly with
+identical content). Each file gets its own debounce window; a rewrite is only parsed when
+mtime+size changed AND the content hash differs from the last published snapshot.
+Parsed snapshots are published as typed events (their "event" field, e.g. "Status").
+Only files that have a consumer (wanted(file_name), checked per notification, so rule
+edits apply at once) are read at all, and one timer thread serves every debounce window.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from src.services import json_codec
+
+# Окно склейки уведомлений по каждому файлу, мс
+COMPANION_DEBOUNCE_MS = {
+    "Status.json": 100,
+    "Cargo.json": 250,
+    "NavRoute.json": 250,
+    "Backpack.json": 250,
+    "Market.json": 500,
+    "Outfitting.json": 500,
+    "Shipyard.json": 500,
+    "ModulesInfo.json": 500,
+    "ShipLocker.json": 500,
+    "FCMaterials.json": 500,
+}
+
+
+class CompanionFileWatcher:
+    """Debounces, de-duplicates and parses companion files; publish(snapshot) gets new ones."""
+
+    def __init__(
+        self,
+        journal_dir,
+        publish: Callable[[dict], None],
+        debounce_ms: Optional[dict] = None,
+        wanted: Optional[Callable[[str], bool]] = None,
+    ):
+        self.journal_dir = Path(journal_dir)
+        self.publish = publish
+        self.wanted = wanted or (lambda file_name: True)
+        settings = dict(COMPANION_DEBOUNCE_MS)
+        settings.update(debounce_ms or {})
+        self._windows = {name: max(0.0, ms / 1000.0) for name, ms in settings.items()}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._due = {}  # name -> monotonic-время чтения (окно от первого уведомления пачки)
+        self._thread = None
+        self._stopping = False
+        self._signatures = {}  # name -> (mtime_ns, size, digest)
+        self.latest = {}  # name -> последний опубликованный снимок
+        self.stats = {
+            "published": 0,
+            "unchanged": 0,
+            "unreadable": 0,
+            "notifications": 0,
+            "unwanted": 0,
+            "reads": 0,
+        }
+
+    def handles(self, file_name: str) -> bool:
+        return file_name in self._windows
+
+    def start(self) -> None:
+        """Records the current state of wanted files (without publishing), starts the timer."""
+        for name in self._windows:
+            if self.wanted(name):
+                self.refresh(name, publish=False)
+        with self._lock:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="CompanionFiles")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the timer thread after reading any file with a pending notification."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def notify(self, file_name: str) -> None:
+        """Registers a filesystem notification for file_name (observer thread)."""
+        window = self._windows.get(file_name)
+        if window is None:
+            return
+        wanted = self.wanted(file_name)
+        with self._cond:
+            self.stats["notifications"] += 1
+            if not wanted:
+                self.stats["unwanted"] += 1
+                return
+            if file_name not in self._due:
+                self._due[file_name] = time.monotonic() + window
+                self._cond.notify()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def _take_due(self, flush: bool = False) -> list:
+        """Names whose window has passed (all pending ones if flush), removed from _due."""
+        now = time.monotonic()
+        names = [name for name, due in self._due.items() if flush or due <= now]
+        for name in names:
+            del self._due[name]
+        return names
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    names = self._take_due()
+                    if names:
+                        break
+                    timeout = min(self._due.values()) - time.monotonic() if self._due else None
+                    self._cond.wait(timeout)
+                else:
+                    names = self._take_due(flush=True)
+                stopping = self._stopping
+            for name in names:
+                with self._lock:
+                    self.stats["reads"] += 1
+                try:
+                    self.refresh(name)
+                except Exception:
+                    logging.exception("Unexpected error reading companion file %s", name)
+            if stopping:
+                return
+
+    def refresh(self, file_name: str, publish: bool = True) -> Optional[dict]:
+        """Re-reads file_name if it changed. Returns the new snapshot, or None if unchanged."""
+        path = self.journal_dir / file_name
+        try:
+            st = path.stat()
+            with self._lock:
+                previous = self._signatures.get(file_name)
+            if previous and previous[:2] == (st.st_mtime_ns, st.st_size):
+                with self._lock:
+                    self.stats["unchanged"] += 1
+                return None
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            # Игра может держать файл открытым на запись
+            logging.debug("Could not read companion file %s: %s", file_name, e)
+            with self._lock:
+                self.stats["unreadable"] += 1
+            return None
+
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if previous and previous[2] == digest:
+            with self._lock:
+                self._signatures[file_name] = (st.st_mtime_ns, st.st_size, digest)
+                self.stats["unchanged"] += 1
+            return None
+        try:
+            snapshot = json_codec.loads(data)
+        except ValueError:
+            # Файл перезаписывается прямо сейчас — следующее уведомление прочитает целиком
+            with self._lock:
+                self.stats["unreadable"] += 1
+            return None
+        if not isinstance(snapshot, dict):
+            return None
+        snapshot.setdefault("event", path.stem)
+
+        with self._lock:
+            self._signatures[file_name] = (st.st_mtime_ns, st.st_size, digest)
+            self.latest[file_name] = snapshot
+            if publish:
+                self.stats["published"] += 1
+        if publish:
+            self.publish(dict(snapshot))
+        return snapshot
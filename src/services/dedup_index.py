@@ -0,0 +1,244 @@
+"""
+In-memory dedup index: the last content digest sent per (commander, event type).
+Keys are interned (commander, event_type) tuples. Values are raw 16-byte digests: the
+legacy 64-hex SHA-256 entries load as their first 16 bytes and still match. An event type
+may have a TTL (events.json `dedup_ttl`); after it the entry no longer suppresses a
+resend. The index holds at most `max_entries` and evicts the least recently used. A
+per-commander key set makes purging one commander O(its entries).
+
+Digests come from content_hash. Legacy sha256 entries are persisted as plain hex (the old
+format) and blake2b ones as "blake2b:<hex>". An entry written under the other scheme is
+compared through that scheme once and, on a match, rewritten under the current one, so
+switching schemes does not resend anything.
+
+A digest is set tentatively before the upload: it is counted as pending for its key and
+does not touch the stored entry. commit(key, digest) makes it the entry and persists it
+(DedupStore log); rollback(key, digest) only drops that one pending digest. Several events
+of one key can be in flight at once (lanes, batches), and each settles only its own
+digest. Pending digests do not suppress anything: an identical event sent while the first
+is still in flight goes out too, as it would be lost if the first one failed. They are
+never persisted, so a crash mid-upload cannot turn an unsent event into a "duplicate".
+"""
+
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from src.services.content_hash import SCHEME_FAST, SCHEME_LEGACY, other_scheme
+from src.services.dedup_store import DedupStore
+
+DIGEST_SIZE = 16
+DEFAULT_MAX_ENTRIES = 100_000
+
+Key = tuple[str, str]
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        path,
+        ttl_for: Optional[Callable[[str], Optional[float]]] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        scheme: str = SCHEME_FAST,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.scheme = scheme
+        self.ttl_for = ttl_for or (lambda event_type: None)
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._entries: OrderedDict[Key, bytes] = OrderedDict()  # LRU: свежие в конце
+        self._expires: dict[Key, float] = {}  # только для типов с TTL
+        self._by_commander: dict[str, set[Key]] = {}
+        self._pending: dict[Key, dict[bytes, int]] = {}  # выставлено и ещё не подтверждено
+        self._other_scheme: set[Key] = set()  # записи, посчитанные другой схемой хэша
+
+        # Метрики
+        self.hits_total = 0
+        self.rehashed_total = 0
+        self.expired_total = 0
+        self.evicted_total = 0
+
+        self.store = DedupStore(path, source=self)
+        now = clock()
+        for name, value in self.store.load().items():
+            self._load_entry(name, value, now)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(commander: str, event_type: str) -> Key:
+        return (sys.intern(commander), sys.intern(event_type))
+
+    def get(self, key: Key) -> Optional[bytes]:
+        digest = self._entries.get(key)
+        if digest is None:
+            return None
+        expires = self._expires.get(key)
+        if expires is not None and expires <= self._clock():
+            self._remove(key)
+            self.expired_total += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits_total += 1
+        return digest
+
+    def matches(self, key: Key, digest: bytes, other_digest: Callable[[], bytes]) -> bool:
+        """
+        True if the stored digest is `digest`. other_digest computes the same content under
+        the other scheme and is only called for entries written under that scheme.
+        """
+        stored = self.get(key)
+        if stored is None:
+            return False
+        if stored == digest:
+            return True
+        if key not in self._other_scheme or other_digest() != stored:
+            return False
+        # То же содержимое в старой схеме: переписываем запись, не отправляя событие снова
+        self._insert(key, digest, self._expires.get(key))
+        self._store_entry(key)
+        self.rehashed_total += 1
+        return True
+
+    def set(self, key: Key, digest: bytes) -> None:
+        """Tentative: pending for this event until commit() or rollback() with the same digest."""
+        pending = self._pending.setdefault(key, {})
+        digest = digest[:DIGEST_SIZE]
+        pending[digest] = pending.get(digest, 0) + 1
+
+    def commit(self, key: Key, digest: bytes) -> None:
+        """The event with this digest was sent: it becomes the entry for key."""
+        digest = digest[:DIGEST_SIZE]
+        self._settle(key, digest)
+        self._insert(key, digest)
+        self._store_entry(key)
+
+    def rollback(self, key: Key, digest: bytes) -> None:
+        """The event with this digest was not sent: the stored entry stays as it was."""
+        self._settle(key, digest[:DIGEST_SIZE])
+
+    def pending(self) -> int:
+        return sum(sum(counts.values()) for counts in self._pending.values())
+
+    def purge_commander(self, commander: str) -> int:
+        keys = self._by_commander.get(commander, ())
+        removed = len(keys)
+        for key in list(keys):
+            self._remove(key)
+        for key in [key for key in self._pending if key[0] == commander]:
+            del self._pending[key]
+        self.store.discard_prefix(f"{commander}|")
+        return removed
+
+    def snapshot(self) -> dict:
+        """Unexpired entries in the persisted format (for compaction); pending ones are not."""
+        now = self._clock()
+        snapshot = {}
+        for key, digest in list(self._entries.items()):
+            expires = self._expires.get(key)
+            if expires is not None and expires <= now:
+                continue
+            snapshot[self._name(key)] = self._persisted(key, digest, expires)
+        return snapshot
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "commanders": len(self._by_commander),
+            "max_entries": self.max_entries,
+            "with_ttl": len(self._expires),
+            "pending": self.pending(),
+            "scheme": self.scheme,
+            "other_scheme": len(self._other_scheme),
+            "hits_total": self.hits_total,
+            "rehashed_total": self.rehashed_total,
+            "expired_total": self.expired_total,
+            "evicted_total": self.evicted_total,
+            **self.store.stats(),
+        }
+
+    def close(self) -> None:
+        self.store.close()
+
+    def _load_entry(self, name: str, value, now: float) -> None:
+        commander, sep, event_type = name.rpartition("|")
+        if not sep:
+            return
+        expires = None
+        if isinstance(value, list):
+            value, expires = value
+        try:
+            scheme, _, hex_digest = value.rpartition(":")
+            digest = bytes.fromhex(hex_digest)[:DIGEST_SIZE]
+        except (AttributeError, ValueError):
+            logging.warning("Dedup cache: skipping malformed entry %s", name)
+            return
+        key = self.key(commander, event_type)
+        if expires is None:
+            ttl = self.ttl_for(event_type)
+            # Старые записи без срока: отсчитываем TTL от загрузки
+            expires = now + ttl if ttl else None
+        elif expires <= now:
+            return
+        self._insert(key, digest, expires)
+        if (scheme or SCHEME_LEGACY) != self.scheme:
+            self._other_scheme.add(key)
+
+    def _insert(self, key: Key, digest: bytes, expires: Optional[float] = None) -> None:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = digest
+        self._other_scheme.discard(key)
+        if expires is None:
+            ttl = self.ttl_for(key[1])
+            expires = self._clock() + ttl if ttl else None
+        if expires is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = expires
+        self._by_commander.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evicted_total += 1
+
+    def _settle(self, key: Key, digest: bytes) -> None:
+        pending = self._pending.get(key)
+        if not pending or digest not in pending:
+            return  # командира успели очистить (purge_commander)
+        pending[digest] -= 1
+        if not pending[digest]:
+            del pending[digest]
+            if not pending:
+                del self._pending[key]
+
+    def _store_entry(self, key: Key) -> None:
+        self.store.put(
+            self._name(key), self._persisted(key, self._entries[key], self._expires.get(key))
+        )
+
+    def _remove(self, key: Key) -> None:
+        del self._entries[key]
+        self._expires.pop(key, None)
+        self._other_scheme.discard(key)
+        keys = self._by_commander.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_commander[key[0]]
+
+    @staticmethod
+    def _name(key: Key) -> str:
+        return f"{key[0]}|{key[1]}"
+
+    def _persisted(self, key: Key, digest: bytes, expires: Optional[float]):
+        scheme = self.scheme
+        if key in self._other_scheme:
+            scheme = other_scheme(scheme)
+        value = digest.hex() if scheme == SCHEME_LEGACY else f"{scheme}:{digest.hex()}"
+        if expires is None:
+            return value
+        return [value, round(expires, 1)]
@@ -0,0 +1,238 @@
+"""
+Dedup cache storage: a JSON snapshot plus an append-only log of changes.
+Each committed or rolled-back hash is one short line appended to the log, so the cost per
+event does not depend on the cache size. When the log gets long compared with the cache,
+it is compacted in a background thread. The current log is renamed to `.old` and a fresh
+one is started. The snapshot is rewritten through a temp file and os.replace, and then
+`.old` is deleted. A crash at any point leaves snapshot + `.old` + log, and replaying them
+in that order gives the same state (records are idempotent). A torn last line is dropped
+at load. The log is flushed but not fsynced: losing the last records to a power cut only
+means an event is sent once more.
+The snapshot keeps the old deduplication_cache.json format, so existing caches load as is.
+The store only persists: the in-memory state belongs to its owner (DedupIndex), which is
+passed as `source` and provides len() and snapshot() for compaction.
+
+Log records, one JSON value per line:
+  ["key", value]      set
+  ["key", null]       delete
+  {"prefix": "A|"}    delete every key starting with the prefix (commander purge)
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+COMPACT_MIN_RECORDS = 1000  # короткий лог не сжимаем
+COMPACT_RATIO = 4  # записей в логе на одну живую запись кэша
+COMPACT_MAX_BYTES = 8 * 1024 * 1024
+
+
+class DedupStore:
+    def __init__(
+        self,
+        path,
+        source=None,
+        compact_min_records: int = COMPACT_MIN_RECORDS,
+        compact_ratio: float = COMPACT_RATIO,
+        compact_max_bytes: int = COMPACT_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.log_path = self.path.with_suffix(".jsonl")
+        self.old_log_path = self.path.with_suffix(".jsonl.old")
+        self.source = source  # None: только дописываем, без сжатия
+        self.compact_min_records = compact_min_records
+        self.compact_ratio = compact_ratio
+        self.compact_max_bytes = compact_max_bytes
+        self._lock = threading.Lock()
+        self._log = None
+        self._compactor: Optional[threading.Thread] = None
+        self.log_records = 0
+        self.log_bytes = 0
+
+        # Метрики
+        self.appended_total = 0
+        self.compactions_total = 0
+
+    @staticmethod
+    def remove_files(path) -> None:
+        """Deletes the snapshot and both logs (full cache reset)."""
+        path = Path(path)
+        for file in (path, path.with_suffix(".jsonl"), path.with_suffix(".jsonl.old")):
+            if file.exists():
+                file.unlink()
+
+    def load(self) -> dict[str, Any]:
+        """Snapshot with both logs replayed on top. A torn tail of the log is cut off."""
+        entries = {}
+        if self.path.exists():
+            try:
+                content = self.path.read_text(encoding="utf-8")
+                entries = json.loads(content) if content else {}
+            except (json.JSONDecodeError, OSError) as e:
+                logging.error(f"Failed to load deduplication cache: {e}")
+                entries = {}
+        self._replay(entries, self.old_log_path, truncate=False)
+        self._replay(entries, self.log_path, truncate=True)
+        return entries
+
+    def put(self, key: str, value: Any) -> None:
+        self._append([key, value])
+
+    def discard(self, key: str) -> None:
+        self._append([key, None])
+
+    def discard_prefix(self, prefix: str) -> None:
+        """One record, whatever the number of matching keys."""
+        self._append({"prefix": prefix})
+
+    def compact(self, wait: bool = False) -> None:
+        """Rotates the log and rewrites the snapshot in a background thread."""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                compactor = self._compactor
+            else:
+                compactor = self._start_compaction()
+        if wait and compactor is not None:
+            compactor.join()
+
+    def stats(self) -> dict:
+        return {
+            "log_records": self.log_records,
+            "log_bytes": self.log_bytes,
+            "appended_total": self.appended_total,
+            "compactions_total": self.compactions_total,
+        }
+
+    def close(self) -> None:
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def _replay(self, entries: dict, path: Path, truncate: bool) -> None:
+        if not path.exists():
+            return
+        good = 0
+        records = 0
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # недописанная строка: процесс упал посреди записи
+                    good += len(line)
+                    try:
+                        record = json.loads(line)
+                        if isinstance(record, dict):
+                            prefix = record["prefix"]
+                            for key in [k for k in entries if k.startswith(prefix)]:
+                                del entries[key]
+                        else:
+                            key, value = record
+                            if value is None:
+                                entries.pop(key, None)
+                            else:
+                                entries[key] = value
+                    except (ValueError, TypeError, KeyError):
+                        continue  # битая строка посередине — пропускаем только её
+                    records += 1
+            size = path.stat().st_size
+            if size != good:
+                logging.warning("Dedup log %s: dropped a torn tail (%s bytes).", path, size - good)
+                if truncate:
+                    os.truncate(path, good)
+        except OSError as e:
+            logging.error(f"Failed to replay deduplication log {path}: {e}")
+            return
+        if truncate:
+            self.log_records = records
+            self.log_bytes = good
+
+    def _append(self, record) -> None:
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                if self._log is None:
+                    self._log = self._open_log()
+                self._log.write(line)
+                self._log.flush()
+            except OSError as e:
+                logging.error(f"Failed to append to deduplication log: {e}")
+                return
+            self.appended_total += 1
+            self.log_records += 1
+            self.log_bytes += len(line)
+            if self._needs_compaction() and (
+                self._compactor is None or not self._compactor.is_alive()
+            ):
+                self._start_compaction()
+
+    # --- called under self._lock ---
+
+    def _open_log(self):
+        log = open(self.log_path, "ab+")
+        if log.tell():
+            log.seek(-1, os.SEEK_END)
+            if log.read(1) != b"\n":
+                log.write(b"\n")  # лог не загружали (purge без Sender): не дописываем к обрывку
+        return log
+
+    def _needs_compaction(self) -> bool:
+        if self.source is None:
+            return False
+        if self.log_bytes >= self.compact_max_bytes:
+            return True
+        return (
+            self.log_records >= self.compact_min_records
+            and self.log_records >= self.compact_ratio * max(1, len(self.source))
+        )
+
+    def _start_compaction(self) -> Optional[threading.Thread]:
+        if self.source is None:
+            return None
+        if self.old_log_path.exists():
+            # Прошлое сжатие не дошло до конца (сбой): сначала доводим его, без новой ротации
+            rotate = False
+        else:
+            rotate = self.log_path.exists()
+        try:
+            if rotate:
+                if self._log is not None:
+                    self._log.close()
+                    self._log = None
+                os.replace(self.log_path, self.old_log_path)
+        except OSError as e:
+            logging.warning("Dedup log compaction skipped: %s", e)
+            return None
+        if rotate:
+            self.log_records = 0
+            self.log_bytes = 0
+        snapshot = self.source.snapshot()
+        self._compactor = threading.Thread(
+            target=self._write_snapshot, args=(snapshot,), name="dedup-compactor", daemon=True
+        )
+        self._compactor.start()
+        return self._compactor
+
+    # --- compactor thread ---
+
+    def _write_snapshot(self, snapshot: dict) -> None:
+        tmp_path = self.path.with_suffix(".json.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            if self.old_log_path.exists():
+                self.old_log_path.unlink()
+        except OSError as e:
+            logging.error(f"Failed to compact deduplication cache: {e}")
+            return
+        self.compactions_total += 1
+        logging.info("💾 Dedup cache compacted: %s entries.", len(snapshot))
@@ -6,12 +6,14 @@ Strictly filters fields to match EDDN journal/1 schema.
 import json
 import logging
 import re
-from copy import deepcopy
 from typing import Any, Optional
 
 import httpx
 
 from config import SOFTWARE_VERSION
+from src.services import body_compressor, json_codec
+from src.services.body_compressor import BodyCompressor
+from src.services.circuit_breaker import CircuitBreaker, parse_retry_after
 
 EDDN_SCHEMA_REF = "https://eddn.edcd.io/schemas/journal/1"
 EDDN_SCHEMA_FSSBODYSIGNALS = "https://eddn.edcd.io/schemas/fssbodysignals/1"
@@ -217,7 +219,8 @@ def build_eddn_payload(event_data: dict, game_state: Optional[dict] = None) -> O
     gameversion = game_state.get("gameversion") or "4.3.0.1"
     gamebuild = game_state.get("gamebuild") or "r322188/r0 "
 
-    msg = _strip_localised_keys(deepcopy(event_data))
+    # _strip_localised_keys rebuilds every dict/list, so the event is never mutated (no deepcopy)
+    msg = _strip_localised_keys(event_data)
     msg = _normalize_flags(msg)
 
     # --- ИНЪЕКЦИЯ TECHNICAL TRUTH (DLC / Taxi / Multicrew из сессии) ---
@@ -274,12 +277,21 @@ async def send_to_eddn(
     event_data: dict,
     game_state: Optional[dict] = None,
     timeout: float = EDDN_TIMEOUT_SEC,
+    breaker: Optional[CircuitBreaker] = None,
+    compressor: Optional[BodyCompressor] = None,
 ) -> bool:
-    """Send event to EDDN using the shared httpx.AsyncClient. Pass game_state=CURRENT_SESSION."""
+    """
+    Send event to EDDN using the shared httpx.AsyncClient.
+    game_state: the session the event was read in (commander, system, version, DLC).
+    With a breaker, uploads are skipped while the gateway's circuit is open.
+    With a compressor, large bodies go out gzip-encoded (the gateway accepts gzip).
+    """
     payload = build_eddn_payload(event_data, game_state)
 
     if payload is None:
         return False  # Пакет не прошел валидацию (нет координат)
+    if breaker is not None and not breaker.allow():
+        return False
 
     logging.info(f"🚀 EDDN: Sending {event_data.get('event')}...")
 
@@ -288,11 +300,20 @@ async def send_to_eddn(
     #print("--- [DEBUG] OUTGOING EDDN PAYLOAD END ---\n")
 
     try:
-        response = await client.post(
+        response = await body_compressor.post(
+            client,
             EDDN_UPLOAD_URL,
-            json=payload,
+            json_codec.dumps(payload),
+            {"Content-Type": "application/json"},
+            compressor,
             timeout=timeout,
         )
+        if breaker is not None:
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                breaker.record_failure(f"HTTP {response.status_code}", retry_after)
+            else:
+                breaker.record_success()  # 4xx — претензия к пакету, шлюз жив
         if response.status_code == 200:
             logging.info("✅ EDDN: Upload Success")
             return True
@@ -300,8 +321,12 @@ async def send_to_eddn(
         logging.warning(f"❌ EDDN: HTTP {response.status_code} - {response.text}")
         return False
     except httpx.HTTPError as e:
+        if breaker is not None:
+            breaker.record_failure(type(e).__name__)
         logging.warning("⚠️ EDDN: Error %s", e)
         return False
     except Exception as e:
+        if breaker is not None:
+            breaker.record_failure("unexpected error")
         logging.exception("Unexpected error in EDDN send")
         return False
@@ -0,0 +1,109 @@
+"""
+Outbound portal upload, serialized once. An Envelope holds the encoded body, the request
+headers, the destination, the attempt count and the time the event was first queued.
+Retries, batches (their body is the envelopes' bodies joined) and the offline queue (which
+stores the body and the first-queued time) all reuse it without encoding again.
+Envelopes are immutable: a retry is a new envelope from retried(). Headers are shared
+read-only mappings, built once per (commander, API key).
+"""
+
+import base64
+import functools
+import time
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from src.services import json_codec
+
+
+@functools.lru_cache(maxsize=256)
+def portal_headers(commander: str, api_key: str, user_agent: str) -> Mapping[str, str]:
+    """Request headers for one commander and key (cached: no base64 or dict per request)."""
+    return MappingProxyType(
+        {
+            "Content-Type": "application/json",
+            "User-Agent": user_agent,
+            "x-api-key": api_key,
+            "x-commander": base64.b64encode(commander.encode("utf-8")).decode("ascii"),
+        }
+    )
+
+
+class Envelope:
+    __slots__ = (
+        "body",
+        "event_type",
+        "commander",
+        "headers",
+        "destination",
+        "attempt",
+        "queued",
+        "event",
+    )
+
+    def __init__(
+        self,
+        body: bytes,
+        event_type: str,
+        commander: str,
+        headers: Optional[Mapping[str, str]],
+        destination: str,
+        attempt: int = 0,
+        queued: Optional[float] = None,
+        event: Optional[dict] = None,
+    ):
+        setattr_ = object.__setattr__
+        setattr_(self, "body", body)
+        setattr_(self, "event_type", event_type)
+        setattr_(self, "commander", commander)  # имя командира, за которого отправляем
+        setattr_(self, "headers", headers)  # None: отправить нельзя (нет ключа или URL)
+        setattr_(self, "destination", destination)
+        setattr_(self, "attempt", attempt)  # сколько раз уже пытались отправить
+        setattr_(self, "queued", time.time() if queued is None else queued)
+        # Исходное событие — только для логов; у событий из офлайн-очереди его нет
+        setattr_(self, "event", event)
+
+    @classmethod
+    def encode(
+        cls,
+        event: dict,
+        commander: str,
+        headers: Optional[Mapping[str, str]],
+        destination: str,
+    ) -> "Envelope":
+        return cls(
+            json_codec.dumps(event),
+            event.get("event", "?"),
+            commander,
+            headers,
+            destination,
+            event=event,
+        )
+
+    def retried(self) -> "Envelope":
+        """The same upload with one more attempt counted."""
+        return Envelope(
+            self.body,
+            self.event_type,
+            self.commander,
+            self.headers,
+            self.destination,
+            self.attempt + 1,
+            self.queued,
+            self.event,
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Envelope is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Envelope is immutable")
+
+    def __len__(self) -> int:
+        return len(self.body)
+
+    def __repr__(self) -> str:
+        return (
+            f"Envelope({self.event_type} for {self.commander}, {len(self.body)} bytes, "
+            f"attempt {self.attempt})"
+        )
@@ -0,0 +1,128 @@
+"""
+HTTP client for the sender: pool limits, keepalive, HTTP/2 and connection metrics.
+HTTP/2 needs the optional `h2` package (httpx[http2]). Without it, or when a server does
+not offer h2 in ALPN, requests use HTTP/1.1. Idle connections are kept for
+`http_keepalive_expiry_sec`, not httpx's 5 s, so an event after a short lull reuses the
+connection. After longer idle periods (supercruise, menus), warm_up() opens connections to
+the portal and EDDN as soon as a session starts (LoadGame / Commander), so the first real
+upload does not pay DNS + TCP + TLS.
+Handshakes are counted through httpcore's `trace` request extension, set by a request hook.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ConnectionStats:
+    def __init__(self):
+        self.requests_total = 0
+        self.tcp_connects_total = 0
+        self.tls_handshakes_total = 0
+        self.connect_failures_total = 0
+        self.handshake_sec_total = 0.0
+        self.warmups_total = 0
+        self.http_versions: Counter = Counter()
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests_total += 1
+        request.extensions["trace"] = self._tracer()
+
+    async def on_response(self, response: httpx.Response) -> None:
+        self.http_versions[response.http_version] += 1
+
+    def _tracer(self):
+        started = {}
+
+        async def trace(name: str, info: dict) -> None:
+            # name: "connection.connect_tcp.started" / ".complete" / ".failed", ...
+            if not name.startswith("connection."):
+                return
+            _, step, phase = name.split(".", 2)
+            if step not in ("connect_tcp", "start_tls"):
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+                return
+            if phase == "failed":
+                self.connect_failures_total += 1
+                return
+            if step == "connect_tcp":
+                self.tcp_connects_total += 1
+            else:
+                self.tls_handshakes_total += 1
+            if step in started:
+                self.handshake_sec_total += time.perf_counter() - started.pop(step)
+
+        return trace
+
+    def stats(self) -> dict:
+        requests = self.requests_total
+        return {
+            "requests_total": requests,
+            "tcp_connects_total": self.tcp_connects_total,
+            "tls_handshakes_total": self.tls_handshakes_total,
+            "connect_failures_total": self.connect_failures_total,
+            "handshake_sec_total": round(self.handshake_sec_total, 3),
+            # доля запросов, ушедших по уже открытому соединению
+            "reuse_ratio": round(1 - self.tcp_connects_total / requests, 3) if requests else None,
+            "warmups_total": self.warmups_total,
+            "http_versions": dict(self.http_versions),
+        }
+
+
+def build_client(config, stats: Optional[ConnectionStats] = None) -> httpx.AsyncClient:
+    """AsyncClient with the transport settings from config (see Config: http_*)."""
+    http2 = config.http2 and http2_available()
+    if config.http2 and not http2:
+        logging.info("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1.")
+    limits = httpx.Limits(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive,
+        keepalive_expiry=config.http_keepalive_expiry_sec,
+    )
+    event_hooks = None
+    if stats is not None:
+        event_hooks = {"request": [stats.on_request], "response": [stats.on_response]}
+    return httpx.AsyncClient(
+        timeout=config.http_timeout_sec, limits=limits, http2=http2, event_hooks=event_hooks
+    )
+
+
+def _origin(url: str) -> Optional[str]:
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+async def warm_up(client: httpx.AsyncClient, urls, stats: Optional[ConnectionStats] = None):
+    """
+    HEAD to the origin of each URL, concurrently. The answer does not matter (404/405 are
+    fine): what stays behind is a pooled connection with DNS, TCP and TLS already done.
+    """
+    origins = {origin for origin in map(_origin, urls) if origin}
+
+    async def head(origin):
+        try:
+            await client.head(origin, timeout=5.0)
+        except httpx.HTTPError as e:
+            logging.debug("Warm-up of %s failed: %s", origin, e)
+
+    if origins:
+        if stats is not None:
+            stats.warmups_total += 1
+        await asyncio.gather(*(head(origin) for origin in origins))
@@ -0,0 +1,111 @@
+"""
+In-memory index of Journal.*.log files.
+Built once with a single directory listing (no per-file stat), ordered by the timestamp
+and part number embedded in the file name, then kept current from watchdog events.
+Names that are not real journals (JournalAlpha, temp files) are never indexed.
+"""
+
+import bisect
+import fnmatch
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from utils import parse_journal_filename
+
+
+class JournalIndex:
+    """Sorted (started, part, name) entries for one journal directory. Thread-safe."""
+
+    def __init__(self, journal_dir):
+        self.journal_dir = Path(journal_dir)
+        self._entries: list[tuple[datetime, int, str]] = []
+        self._names: set[str] = set()
+        self._lock = threading.Lock()
+
+    def build(self) -> int:
+        """(Re)builds the index from one directory listing. Returns the number of journals."""
+        entries = []
+        try:
+            with os.scandir(self.journal_dir) as it:
+                for entry in it:
+                    parsed = parse_journal_filename(entry.name)
+                    if parsed is not None:
+                        entries.append((parsed[0], parsed[1], entry.name))
+        except OSError:
+            entries = []
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._names = {name for _, _, name in entries}
+        return len(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def latest(self) -> Optional[Path]:
+        with self._lock:
+            if not self._entries:
+                return None
+            return self.journal_dir / self._entries[-1][2]
+
+    def add(self, file_name: str) -> bool:
+        """
+        Indexes a newly created file. Returns True if it is a journal that is now the
+        newest one (i.e. a rollover), False for non-journals, duplicates and older files.
+        """
+        parsed = parse_journal_filename(file_name)
+        if parsed is None:
+            return False
+        entry = (parsed[0], parsed[1], file_name)
+        with self._lock:
+            if file_name in self._names:
+                return False
+            bisect.insort(self._entries, entry)
+            self._names.add(file_name)
+            return self._entries[-1] == entry
+
+    def remove(self, file_name: str) -> None:
+        parsed = parse_journal_filename(file_name)
+        if parsed is None:
+            return
+        entry = (parsed[0], parsed[1], file_name)
+        with self._lock:
+            if file_name not in self._names:
+                return
+            self._names.discard(file_name)
+            idx = bisect.bisect_left(self._entries, entry)
+            if idx < len(self._entries) and self._entries[idx] == entry:
+                del self._entries[idx]
+
+    def previous(self, file_name: str, limit: Optional[int] = None) -> list[Path]:
+        """Journals older than file_name, newest first."""
+        parsed = parse_journal_filename(file_name)
+        if parsed is None:
+            return []
+        with self._lock:
+            idx = bisect.bisect_left(self._entries, (parsed[0], parsed[1], file_name))
+            older = self._entries[:idx]
+        older = older[::-1] if limit is None else older[: -limit - 1 : -1]
+        return [self.journal_dir / name for _, _, name in older]
+
+    def select(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        pattern: Optional[str] = None,
+    ) -> list[Path]:
+        """Journals in chronological order within [since, until) and matching a name glob."""
+        with self._lock:
+            entries = list(self._entries)
+        if since:
+            entries = entries[bisect.bisect_left(entries, (since,)) :]
+        if until:
+            entries = entries[: bisect.bisect_left(entries, (until,))]
+        return [
+            self.journal_dir / name
+            for _, _, name in entries
+            if not pattern or fnmatch.fnmatch(name, pattern)
+        ]
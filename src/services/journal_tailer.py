@@ -0,0 +1,171 @@
+"""
+Persistent incremental journal tailer.
+Keeps the journal handle open between modify events, reads in byte chunks and holds
+an incomplete trailing line until the game finishes writing it. The committed offset
+(end of the last complete line) is checkpointed to the app data dir so a restart
+resumes exactly where the previous run stopped.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+READ_CHUNK_SIZE = 64 * 1024
+CHECKPOINT_INTERVAL_SEC = 1.0  # не чаще раза в секунду пишем checkpoint на диск
+
+
+class JournalCheckpoint:
+    """(file, inode, offset) checkpoint stored as a small JSON file, written atomically."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._last_saved: Optional[tuple] = None
+        self._last_save_time = 0.0
+
+    def load(self) -> Optional[dict]:
+        """Returns {'file', 'inode', 'offset'} or None if missing/corrupt."""
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read()
+            if not content:
+                return None
+            data = json.loads(content)
+        except (IOError, json.JSONDecodeError) as e:
+            logging.warning("Could not load journal checkpoint: %s", e)
+            return None
+        if not isinstance(data, dict) or not data.get("file"):
+            return None
+        try:
+            data["offset"] = int(data.get("offset", 0))
+        except (TypeError, ValueError):
+            return None
+        return data
+
+    def save(self, file_name: str, inode: int, offset: int, force: bool = False) -> None:
+        """Persists the checkpoint. Throttled to CHECKPOINT_INTERVAL_SEC unless force=True."""
+        state = (file_name, inode, offset)
+        if state == self._last_saved:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_save_time < CHECKPOINT_INTERVAL_SEC:
+            return
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"file": file_name, "inode": inode, "offset": offset}, f)
+            os.replace(tmp_path, self.path)
+            self._last_saved = state
+            self._last_save_time = now
+        except OSError as e:
+            logging.warning("Could not save journal checkpoint: %s", e)
+
+
+class JournalTailer:
+    """Long-lived reader for a single journal file. Not thread-safe; callers serialize access."""
+
+    def __init__(self, chunk_size: int = READ_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.path: Optional[Path] = None
+        self.inode = 0
+        self._fh: Optional[BinaryIO] = None
+        self._buffer = b""
+        self._read_pos = 0  # позиция в файле после последнего read()
+
+    @property
+    def offset(self) -> int:
+        """Offset right after the last complete line (safe resume point)."""
+        return self._read_pos - len(self._buffer)
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._buffer)
+
+    def open(self, path: Path, offset: int = 0) -> None:
+        """Opens (or switches to) path and positions the reader at offset."""
+        self.close()
+        self.path = Path(path)
+        self._fh = open(self.path, "rb")
+        st = os.fstat(self._fh.fileno())
+        self.inode = st.st_ino
+        if offset < 0 or offset > st.st_size:
+            offset = 0
+        self._fh.seek(offset)
+        self._read_pos = offset
+        self._buffer = b""
+
+    def close(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+        self._fh = None
+        self._buffer = b""
+
+    def read_lines(self) -> list[str]:
+        """Reads everything appended since the last call. Returns complete lines only."""
+        if self._fh is None:
+            return []
+        try:
+            size = os.fstat(self._fh.fileno()).st_size
+            if size < self._read_pos:
+                # Файл усечён/перезаписан — начинаем с начала
+                logging.warning("Journal %s was truncated, re-reading from start.", self.path)
+                self._fh.seek(0)
+                self._read_pos = 0
+                self._buffer = b""
+            chunks = []
+            while True:
+                chunk = self._fh.read(self.chunk_size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                self._read_pos += len(chunk)
+        except OSError as e:
+            logging.warning("Could not read journal %s: %s", self.path, e)
+            return []
+        if not chunks:
+            return []
+
+        data = self._buffer + b"".join(chunks)
+        last_nl = data.rfind(b"\n")
+        if last_nl < 0:
+            self._buffer = data
+            return []
+        self._buffer = data[last_nl + 1 :]
+        lines = []
+        for raw in data[:last_nl].split(b"\n"):
+            raw = raw.rstrip(b"\r")
+            if raw:
+                lines.append(raw.decode("utf-8", errors="replace"))
+        return lines
+
+
+def iter_blocks_reversed(path: Path, block_size: int = READ_CHUNK_SIZE):
+    """
+    Yields the file from EOF backwards as byte chunks made of whole lines
+    (chunks come newest-first; lines inside a chunk keep file order).
+    """
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        carry = b""
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + carry
+            if pos == 0:
+                yield data
+                return
+            cut = data.find(b"\n")
+            if cut < 0:
+                carry = data  # строка длиннее блока — читаем дальше назад
+                continue
+            carry = data[: cut + 1]
+            if cut + 1 < len(data):
+                yield data[cut + 1 :]
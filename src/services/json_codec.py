@@ -0,0 +1,169 @@
+"""
+Single JSON codec used by the journal parser, dedup hashing and HTTP bodies.
+Uses orjson or msgspec when installed and falls back to the stdlib `json` module.
+Force a backend with SKYLINK_JSON_BACKEND=orjson|msgspec|json.
+
+- loads(): str or bytes -> object; raises ValueError on invalid input (all backends).
+- dumps(): object -> compact UTF-8 bytes, same shape httpx produces for `json=`.
+- dumps_canonical(): sort_keys output byte-identical to the legacy
+  `json.dumps(obj, sort_keys=True)`, so existing dedup cache entries stay valid
+  whatever backend is active.
+- dumps_sorted(): compact UTF-8 bytes with sorted keys from the active backend. It is
+  stable for a given backend, not across backends (float and escaping details differ).
+"""
+
+import json
+import logging
+import os
+from typing import Any, Optional, Union
+
+BACKEND_ENV_VAR = "SKYLINK_JSON_BACKEND"
+BACKEND_PREFERENCE = ("orjson", "msgspec", "json")
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False, sort_keys=sort_keys
+    ).encode("utf-8")
+
+
+# json.dumps(obj, sort_keys=True) builds a new encoder per call; the output is the same
+_CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True)
+
+
+class StdlibBackend:
+    name = "json"
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return _stdlib_dumps(obj)
+
+    def dumps_sorted(self, obj: Any) -> bytes:
+        return _stdlib_dumps(obj, sort_keys=True)
+
+
+class OrjsonBackend:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        # orjson.JSONDecodeError is a json.JSONDecodeError (ValueError) subclass
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self._orjson.dumps(obj)
+        except TypeError:
+            # Non-str keys, >64-bit ints etc. — let stdlib handle the odd case
+            return _stdlib_dumps(obj)
+
+    def dumps_sorted(self, obj: Any) -> bytes:
+        try:
+            return self._orjson.dumps(obj, option=self._orjson.OPT_SORT_KEYS)
+        except TypeError:
+            return _stdlib_dumps(obj, sort_keys=True)
+
+
+class MsgspecBackend:
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+        try:
+            self._sorted_encoder = msgspec.json.Encoder(order="sorted")
+        except TypeError:
+            self._sorted_encoder = None  # msgspec < 0.18: без сортировки ключей
+        self._decode_error = msgspec.DecodeError
+        self._encode_error = msgspec.EncodeError
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except self._decode_error as e:
+            raise ValueError(str(e)) from e
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self._encoder.encode(obj)
+        except (self._encode_error, TypeError, OverflowError):
+            return _stdlib_dumps(obj)
+
+    def dumps_sorted(self, obj: Any) -> bytes:
+        if self._sorted_encoder is None:
+            return _stdlib_dumps(obj, sort_keys=True)
+        try:
+            return self._sorted_encoder.encode(obj)
+        except (self._encode_error, TypeError, OverflowError):
+            return _stdlib_dumps(obj, sort_keys=True)
+
+
+_BACKEND_CLASSES = {
+    "orjson": OrjsonBackend,
+    "msgspec": MsgspecBackend,
+    "json": StdlibBackend,
+}
+
+
+def available_backends() -> list[str]:
+    """Names of the backends importable in this environment, in preference order."""
+    names = []
+    for name in BACKEND_PREFERENCE:
+        try:
+            _BACKEND_CLASSES[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name: Optional[str] = None):
+    """Returns a backend instance: the named one, or the fastest available."""
+    candidates = (name,) if name else BACKEND_PREFERENCE
+    for candidate in candidates:
+        cls = _BACKEND_CLASSES.get(candidate)
+        if cls is None:
+            logging.warning("Unknown JSON backend '%s', using stdlib json.", candidate)
+            continue
+        try:
+            return cls()
+        except ImportError:
+            if name:
+                logging.warning("JSON backend '%s' is not installed, using stdlib json.", name)
+    return StdlibBackend()
+
+
+_backend = get_backend(os.getenv(BACKEND_ENV_VAR) or None)
+
+
+def backend_name() -> str:
+    return _backend.name
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return _backend.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    return _backend.dumps(obj)
+
+
+def dumps_canonical(obj: Any) -> str:
+    """
+    Canonical text for content hashing. Always stdlib with sort_keys and default
+    separators: orjson/msgspec differ in spacing and non-ASCII escaping, and changing
+    the bytes would invalidate every stored dedup hash.
+    """
+    return _CANONICAL_ENCODER.encode(obj)
+
+
+def dumps_sorted(obj: Any) -> bytes:
+    return _backend.dumps_sorted(obj)
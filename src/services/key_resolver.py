@@ -0,0 +1,112 @@
+"""
+API-key lookup by commander name for the sender. Names are matched exactly, then through a
+casefolded index, so a lookup is O(1) however many commanders accounts.json holds.
+Names without a key are remembered (negative cache) until the accounts change: a
+commander with no key costs one dict lookup per event, not a read of accounts.json.
+The index follows two kinds of change:
+- in-process edits (save_account / delete_account / load_accounts), through
+  Config.accounts_version, or a new dict assigned to Config.accounts;
+- edits to accounts.json by another process or by hand, through its mtime and size,
+  checked at most once per `check_interval` seconds.
+"""
+
+import logging
+import time
+from typing import Callable, Optional
+
+DEFAULT_CHECK_INTERVAL_SEC = 2.0
+
+
+def _file_signature(path):
+    """(mtime_ns, size) of accounts.json, or None when it does not exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class KeyResolver:
+    def __init__(
+        self,
+        config,
+        check_interval: float = DEFAULT_CHECK_INTERVAL_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.config = config
+        self.check_interval = check_interval
+        self._clock = clock
+        self._index = {}  # casefold(имя) -> ключ
+        self._missing = set()  # casefold(имя) без ключа — до следующего изменения аккаунтов
+        self._version = None
+        self._accounts = None  # словарь, по которому построен индекс
+        self._signature = _file_signature(config.accounts_file)
+        self._next_check = clock() + check_interval
+
+        # Метрики
+        self.lookups_total = 0
+        self.misses_total = 0
+        self.negative_hits_total = 0
+        self.reloads_total = 0
+        self.rebuilds_total = 0
+
+    def _rebuild(self) -> None:
+        self._index = {}
+        self._accounts = self.config.accounts
+        for name, key in list(self._accounts.items()):
+            if key:
+                self._index.setdefault(name.casefold(), key)  # при коллизии — первое по файлу
+        self._missing.clear()
+        self._version = self.config.accounts_version
+        # Свои правки (save_account) уже в памяти: перечитывать файл после них не нужно
+        self._signature = _file_signature(self.config.accounts_file)
+        self.rebuilds_total += 1
+
+    def _check_file(self) -> None:
+        """Reloads accounts.json when it changed on disk (at most once per interval)."""
+        now = self._clock()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = _file_signature(self.config.accounts_file)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        logging.info("🔑 accounts.json changed on disk, reloading keys.")
+        self.config.load_accounts()
+        self.reloads_total += 1
+
+    def get(self, commander_name: Optional[str]) -> Optional[str]:
+        """The API key of commander_name (case-insensitive), or None."""
+        if commander_name is None:
+            return None
+        self.lookups_total += 1
+        self._check_file()
+        if (
+            self._version != self.config.accounts_version
+            or self._accounts is not self.config.accounts
+        ):
+            self._rebuild()
+        api_key = self.config.accounts.get(commander_name)
+        if api_key:
+            return api_key
+        folded = commander_name.casefold()
+        if folded in self._missing:
+            self.negative_hits_total += 1
+            return None
+        api_key = self._index.get(folded)
+        if api_key is None:
+            self.misses_total += 1
+            self._missing.add(folded)
+        return api_key
+
+    def stats(self) -> dict:
+        return {
+            "accounts": len(self._index),
+            "negative_entries": len(self._missing),
+            "lookups_total": self.lookups_total,
+            "misses_total": self.misses_total,
+            "negative_hits_total": self.negative_hits_total,
+            "reloads_total": self.reloads_total,
+            "rebuilds_total": self.rebuilds_total,
+        }
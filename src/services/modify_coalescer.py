@@ -0,0 +1,86 @@
+"""
+Coalescing layer for watchdog modify storms.
+A burst of on_modified notifications (FSS honk, carrier jump) is merged into a single
+callback fired `window_sec` after the first notification of the burst. The read runs on
+a dedicated daemon thread, so the watchdog observer thread only sets a flag.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable
+
+DEFAULT_COALESCE_WINDOW_MS = 30
+
+
+class ModifyCoalescer(threading.Thread):
+    """Merges notify() calls that arrive within one window into one callback(merged_count)."""
+
+    def __init__(
+        self,
+        callback: Callable[[int], None],
+        window_ms: float = DEFAULT_COALESCE_WINDOW_MS,
+        name: str = "JournalCoalescer",
+    ):
+        super().__init__(daemon=True, name=name)
+        self.callback = callback
+        self.window_sec = max(0.0, window_ms / 1000.0)
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stop_event = threading.Event()
+        self._count = 0
+        # Счётчики для метрик
+        self.notifications = 0
+        self.reads = 0
+        self.merged = 0  # уведомления, которые не потребовали отдельного чтения
+
+    def notify(self) -> None:
+        """Registers one modify notification. Cheap; safe to call from the observer thread."""
+        with self._lock:
+            self._count += 1
+            self.notifications += 1
+        self._pending.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window_ms": round(self.window_sec * 1000, 1),
+                "notifications": self.notifications,
+                "reads": self.reads,
+                "merged": self.merged,
+            }
+
+    def _drain(self) -> None:
+        with self._lock:
+            count = self._count
+            self._count = 0
+            self._pending.clear()
+        if not count:
+            return
+        with self._lock:
+            self.reads += 1
+            self.merged += count - 1
+        if count > 1:
+            logging.debug("Coalesced %s modify notifications into one read.", count)
+        try:
+            self.callback(count)
+        except Exception:
+            logging.exception("Unexpected error in coalesced journal read")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._pending.wait()
+            if self._stop_event.is_set():
+                break
+            if self.window_sec:
+                # Окно отсчитывается от первого уведомления пачки
+                time.sleep(self.window_sec)
+            self._drain()
+        self._drain()
+
+    def stop(self) -> None:
+        """Stops the thread after flushing any pending notifications."""
+        self._stop_event.set()
+        self._pending.set()
+        if self.is_alive():
+            self.join(timeout=1.0)
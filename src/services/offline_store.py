@@ -0,0 +1,208 @@
+"""
+Durable offline queue for portal uploads that failed (network down, 5xx, 429).
+Events are kept in a SQLite database in WAL mode, so they survive both long outages and a
+client restart. Every event gets an expiry from a per-event-type TTL. The queue is capped
+by event count and bytes, and the oldest events are evicted first. Replay reads one
+commander at a time in insertion order. Bodies are stored already encoded, so a bulk drain
+posts them as they are, without encoding them again.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+DEFAULT_TTL_SEC = 7 * 24 * 3600
+DEFAULT_MAX_EVENTS = 50_000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICT_SLACK = 0.01  # при переполнении удаляем на 1% больше, чтобы не вытеснять по одному
+EVICT_LOG_INTERVAL_SEC = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    commander TEXT,
+    event_type TEXT NOT NULL,
+    queued REAL NOT NULL,
+    expires REAL NOT NULL,
+    body BLOB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_commander ON events (commander, id);
+CREATE INDEX IF NOT EXISTS events_expires ON events (expires);
+"""
+
+
+class OfflineStore:
+    def __init__(
+        self,
+        path,
+        ttl_for: Optional[Callable[[str], float]] = None,
+        max_events: int = DEFAULT_MAX_EVENTS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.path = Path(path)
+        self.ttl_for = ttl_for or (lambda event_type: DEFAULT_TTL_SEC)
+        self.max_events = max(1, max_events)
+        self.max_bytes = max(1, max_bytes)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # WAL: fsync на checkpoint, не на запись
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(events)")}
+        if "attempts" not in columns:  # база предыдущей версии
+            self._db.execute("ALTER TABLE events ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._count, self._bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM events"
+        ).fetchone()
+
+        # Метрики
+        self.stored_total = 0
+        self.delivered_total = 0
+        self.expired_total = 0
+        self.evicted_total = 0
+        self._evict_logged = 0.0
+
+        if self._count:
+            logging.info("📦 %s offline event(s) from the previous run queued.", self._count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def empty(self) -> bool:
+        return self._count == 0
+
+    def put(
+        self,
+        body: bytes,
+        event_type: str,
+        commander: Optional[str],
+        queued: Optional[float] = None,
+        attempts: int = 0,
+    ) -> None:
+        """
+        Appends one encoded event (hot path: a single INSERT). queued is when the event was
+        first queued, so its TTL counts from there and not from the latest failure.
+        """
+        now = time.time()
+        queued = now if queued is None else queued
+        expires = queued + self.ttl_for(event_type)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO events (commander, event_type, queued, expires, body, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (commander, event_type, queued, expires, body, attempts),
+            )
+            self._count += 1
+            self._bytes += len(body)
+            self.stored_total += 1
+            if self._count > self.max_events or self._bytes > self.max_bytes:
+                self._evict()
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            removed, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM events WHERE expires <= ?",
+                (now,),
+            ).fetchone()
+            if removed:
+                self._db.execute("DELETE FROM events WHERE expires <= ?", (now,))
+                self._count -= removed
+                self._bytes -= size
+                self.expired_total += removed
+        if removed:
+            logging.warning("Dropped %s offline event(s) past their TTL.", removed)
+        return removed
+
+    def commanders(self) -> list[Optional[str]]:
+        """Commanders with queued events, the one with the oldest event first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT commander FROM events GROUP BY commander ORDER BY MIN(id)"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def peek(
+        self, commander: Optional[str], limit: int
+    ) -> list[tuple[int, str, bytes, float, int]]:
+        """Oldest `limit` events of one commander: (id, event_type, body, queued, attempts)."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, event_type, body, queued, attempts FROM events "
+                "WHERE commander IS ? ORDER BY id LIMIT ?",
+                (commander, limit),
+            ).fetchall()
+
+    def retried(self, ids: list[int]) -> None:
+        """Counts one more failed attempt for events that stay queued."""
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                self._db.execute(
+                    f"UPDATE events SET attempts = attempts + 1 WHERE id IN ({marks})", chunk
+                )
+
+    def ack(self, ids: list[int]) -> None:
+        """Removes delivered (or permanently rejected) events."""
+        if not ids:
+            return
+        with self._lock:
+            self._delete(ids)
+            self.delivered_total += len(ids)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._count,
+                "bytes": self._bytes,
+                "stored_total": self.stored_total,
+                "delivered_total": self.delivered_total,
+                "expired_total": self.expired_total,
+                "evicted_total": self.evicted_total,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # --- called under self._lock ---
+
+    def _delete(self, ids: list[int]) -> None:
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            where = f"WHERE id IN ({marks})"
+            count, size = self._db.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM events {where}", chunk
+            ).fetchone()
+            self._db.execute(f"DELETE FROM events {where}", chunk)
+            self._count -= count
+            self._bytes -= size
+
+    def _evict(self) -> None:
+        """Oldest-first eviction down to the caps (minus a little slack)."""
+        target_count = int(self.max_events * (1 - EVICT_SLACK))
+        target_bytes = int(self.max_bytes * (1 - EVICT_SLACK))
+        ids = []
+        count, size = self._count, self._bytes
+        for row_id, length in self._db.execute("SELECT id, LENGTH(body) FROM events ORDER BY id"):
+            if count <= target_count and size <= target_bytes:
+                break
+            ids.append(row_id)
+            count -= 1
+            size -= length
+        self._delete(ids)
+        self.evicted_total += len(ids)
+        now = time.monotonic()
+        if now - self._evict_logged >= EVICT_LOG_INTERVAL_SEC:
+            self._evict_logged = now
+            logging.warning(
+                "Offline queue full: evicting oldest events (%s so far).", self.evicted_total
+            )
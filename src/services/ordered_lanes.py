@@ -0,0 +1,113 @@
+"""
+Per-key serial asyncio lanes.
+Items submitted under one key (a commander) are handled in submission order by that key's
+own task, while different keys progress independently. An item submitted with a lower
+`priority` number goes ahead of the key's waiting items of higher numbers (the backlog of
+a key is bounded by the sender's in-flight limit, so nothing waits for long).
+An optional `tick` runs after every item and whenever the lane has been idle for
+`tick_timeout(key)` seconds (time-based flushes); on close it runs once more with final=True.
+close(timeout) cancels lanes still busy after the timeout and hands back their unstarted
+items, so the caller can persist them.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+_CLOSE = object()
+
+
+class OrderedLanes:
+    def __init__(
+        self,
+        handler: Callable[[Hashable, Any], Awaitable[None]],
+        tick: Optional[Callable[[Hashable, bool], Awaitable[None]]] = None,
+        tick_timeout: Optional[Callable[[Hashable], Optional[float]]] = None,
+        name: str = "lane",
+    ):
+        self._handler = handler
+        self._tick = tick
+        self._tick_timeout = tick_timeout
+        self.name = name
+        self._lanes: dict[Hashable, tuple[asyncio.PriorityQueue, asyncio.Task]] = {}
+        self._seq = 0  # порядок подачи внутри одного приоритета
+
+        # Метрики
+        self.submitted = 0
+        self.max_backlog = 0
+
+    def submit(self, key: Hashable, item: Any, priority: int = 0) -> None:
+        lane = self._lanes.get(key)
+        if lane is None:
+            q = asyncio.PriorityQueue()
+            lane = self._lanes[key] = (q, asyncio.create_task(self._run(key, q)))
+        self._seq += 1
+        lane[0].put_nowait((priority, self._seq, item))
+        self.submitted += 1
+        self.max_backlog = max(self.max_backlog, lane[0].qsize())
+
+    async def close(self, timeout: Optional[float] = None) -> list:
+        """
+        Lets every lane finish its backlog, runs the final tick and waits for the tasks.
+        Lanes not done within `timeout` are cancelled (no final tick); returns their items
+        that had not started, as (key, item).
+        """
+        lanes = list(self._lanes.items())
+        self._lanes.clear()
+        for _, (q, _) in lanes:
+            self._seq += 1
+            q.put_nowait((float("inf"), self._seq, _CLOSE))  # после всего, что уже в полосе
+        if not lanes:
+            return []
+        _, pending = await asyncio.wait([task for _, (_, task) in lanes], timeout=timeout)
+        left = []
+        for key, (q, task) in lanes:
+            if task not in pending:
+                continue
+            while not q.empty():
+                _, _, item = q.get_nowait()
+                if item is not _CLOSE:
+                    left.append((key, item))
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        return left
+
+    def backlog(self) -> dict:
+        return {key: q.qsize() for key, (q, _) in self._lanes.items()}
+
+    def stats(self) -> dict:
+        return {
+            "lanes": len(self._lanes),
+            "submitted": self.submitted,
+            "backlog": sum(q.qsize() for q, _ in self._lanes.values()),
+            "max_backlog": self.max_backlog,
+        }
+
+    async def _run(self, key: Hashable, q: asyncio.PriorityQueue) -> None:
+        while True:
+            if not q.empty():
+                _, _, item = q.get_nowait()
+            else:
+                timeout = self._tick_timeout(key) if self._tick_timeout else None
+                try:
+                    _, _, item = await asyncio.wait_for(q.get(), timeout)
+                except asyncio.TimeoutError:
+                    await self._run_tick(key, False)
+                    continue
+            if item is _CLOSE:
+                await self._run_tick(key, True)
+                return
+            try:
+                await self._handler(key, item)
+            except Exception:
+                logging.exception("Unexpected error in %s %r", self.name, key)
+            await self._run_tick(key, False)
+
+    async def _run_tick(self, key: Hashable, final: bool) -> None:
+        if self._tick is None:
+            return
+        try:
+            await self._tick(key, final)
+        except Exception:
+            logging.exception("Unexpected error in %s %r tick", self.name, key)
@@ -0,0 +1,121 @@
+"""
+Size- and time-bounded batching of portal uploads.
+Envelopes (events encoded once) are grouped per commander (each request carries one
+x-api-key) and a group is flushed when it reaches `max_events` or `max_bytes`, or when its
+oldest event has waited `max_wait_ms`. The batcher only collects; sending and per-event
+outcome handling stay in the Sender.
+"""
+
+import time
+from typing import Any, Optional
+
+from src.services.envelope import Envelope
+
+DEFAULT_MAX_EVENTS = 50
+DEFAULT_MAX_BYTES = 256 * 1024
+DEFAULT_MAX_WAIT_MS = 250
+
+
+class PortalBatch:
+    """Events for one commander that go out in a single request."""
+
+    def __init__(self, commander: Optional[str]):
+        self.commander = commander
+        self.opened = time.monotonic()
+        self.items: list[tuple[Envelope, Any]] = []  # (envelope, context)
+        self.size = 2  # "[" + "]"
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def body(self) -> bytes:
+        """JSON array assembled from the already encoded events (no second serialization)."""
+        return b"[" + b",".join(envelope.body for envelope, _ in self.items) + b"]"
+
+
+class PortalBatcher:
+    def __init__(
+        self,
+        max_events: int = DEFAULT_MAX_EVENTS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_wait_ms: int = DEFAULT_MAX_WAIT_MS,
+    ):
+        self.max_events = max(1, max_events)
+        self.max_bytes = max(1, max_bytes)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._open: dict[Optional[str], PortalBatch] = {}
+
+        # Метрики
+        self.batches_flushed = 0
+        self.events_batched = 0
+        self.events_flushed = 0
+        self.flush_reasons = {"events": 0, "bytes": 0, "wait": 0, "drain": 0}
+
+    def add(
+        self, commander: Optional[str], envelope: Envelope, context: Any = None
+    ) -> list[PortalBatch]:
+        """
+        Adds one envelope. Returns the batches that must be sent now: the current one
+        if it hit max_events/max_bytes, or the previous one if this event would overflow it.
+        """
+        ready = []
+        batch = self._open.get(commander)
+        extra = len(envelope.body) + (1 if batch and batch.items else 0)
+        if batch is not None and batch.items and batch.size + extra > self.max_bytes:
+            ready.append(self._close(commander, "bytes"))
+            batch = None
+        if batch is None:
+            batch = self._open[commander] = PortalBatch(commander)
+            extra = len(envelope.body)
+        batch.items.append((envelope, context))
+        batch.size += extra
+        self.events_batched += 1
+        if len(batch) >= self.max_events:
+            ready.append(self._close(commander, "events"))
+        elif batch.size >= self.max_bytes:
+            ready.append(self._close(commander, "bytes"))
+        return ready
+
+    def due(self, now: Optional[float] = None, commanders=None) -> list[PortalBatch]:
+        """Batches whose oldest event has waited max_wait_ms (optionally only for commanders)."""
+        now = time.monotonic() if now is None else now
+        expired = [
+            key
+            for key, b in self._open.items()
+            if now - b.opened >= self.max_wait and (commanders is None or key in commanders)
+        ]
+        return [self._close(key, "wait") for key in expired]
+
+    def drain(self, commanders=None) -> list[PortalBatch]:
+        """Every open batch, regardless of size or age (shutdown, end of backfill)."""
+        keys = [key for key in self._open if commanders is None or key in commanders]
+        return [self._close(key, "drain") for key in keys]
+
+    def time_until_due(self, default: Optional[float], commanders=None) -> Optional[float]:
+        """Seconds until the next batch expires (default when nothing is open)."""
+        opened = [
+            b.opened for key, b in self._open.items() if commanders is None or key in commanders
+        ]
+        if not opened:
+            return default
+        remaining = max(0.0, min(opened) + self.max_wait - time.monotonic())
+        return remaining if default is None else min(default, remaining)
+
+    def pending(self) -> int:
+        return sum(len(b) for b in self._open.values())
+
+    def stats(self) -> dict:
+        return {
+            "batches_flushed": self.batches_flushed,
+            "events_batched": self.events_batched,
+            "events_pending": self.pending(),
+            "avg_batch_size": self.events_flushed / max(1, self.batches_flushed),
+            "flush_reasons": dict(self.flush_reasons),
+        }
+
+    def _close(self, commander: Optional[str], reason: str) -> PortalBatch:
+        batch = self._open.pop(commander)
+        self.batches_flushed += 1
+        self.events_flushed += len(batch)
+        self.flush_reasons[reason] += 1
+        return batch
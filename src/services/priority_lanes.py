@@ -0,0 +1,165 @@
+"""
+Priority classes for the watcher -> sender queue.
+Each class ("high", "normal", "low", set per event type in events.json) is its own
+SpillQueue lane. get_nowait() serves the highest non-empty lane, so session and status
+events (LoadGame, Commander, Shutdown) do not wait behind bursts of scans. Starvation
+protection: a lane that has been passed over `starvation_limit` times in a row while
+holding events is served next.
+Per lane, two latencies are kept over the recent events: the wait in the queue (put ->
+get) and the total (put -> task_done, i.e. sent or given up).
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+DEFAULT_STARVATION_LIMIT = 8
+LATENCY_WINDOW = 512
+
+
+class LatencyStats:
+    """Latency samples of the last `window` events, plus count / max since start."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.max_sec = 0.0
+
+    def record(self, seconds: float) -> None:
+        seconds = max(0.0, seconds)
+        self._samples.append(seconds)
+        self.count += 1
+        self.max_sec = max(self.max_sec, seconds)
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count, "p50_ms": None, "p95_ms": None, "max_ms": None}
+
+        def ms(seconds):
+            return round(seconds * 1000, 1)
+
+        return {
+            "count": self.count,
+            "p50_ms": ms(samples[len(samples) // 2]),
+            "p95_ms": ms(samples[min(len(samples) - 1, int(len(samples) * 0.95))]),
+            "max_ms": ms(self.max_sec),
+        }
+
+
+class PriorityLanes:
+    """
+    lanes: {class name: SpillQueue}, highest priority first.
+    get_nowait() returns (ticket, item); the ticket goes back to task_done(ticket) when the
+    item is finished, for the total latency. qsize/empty/join cover all lanes.
+    """
+
+    def __init__(
+        self,
+        lanes: dict,
+        starvation_limit: int = DEFAULT_STARVATION_LIMIT,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.order = list(lanes)
+        self._lanes = lanes
+        self.starvation_limit = max(1, starvation_limit)
+        self._clock = clock  # время стены: отметка переживает spill на диск и перезапуск
+        self._cond = threading.Condition()
+        self._skipped = dict.fromkeys(self.order, 0)
+        self._unfinished = 0  # выданных get_nowait и ещё не завершённых
+
+        # Метрики
+        self.served = dict.fromkeys(self.order, 0)
+        self.starvation_serves_total = 0
+        self.wait_latency = {name: LatencyStats() for name in self.order}
+        self.total_latency = {name: LatencyStats() for name in self.order}
+
+    def put(self, item: Any, lane: str) -> None:
+        """Never blocks (see SpillQueue.put). An unknown lane name means the middle one."""
+        if lane not in self._lanes:
+            lane = self.order[len(self.order) // 2]
+        self._lanes[lane].put((self._clock(), item))
+
+    def get_nowait(self) -> tuple[tuple[str, Optional[float]], Any]:
+        with self._cond:
+            while True:
+                name = self._pick()
+                try:
+                    entry = self._lanes[name].get_nowait()
+                except queue.Empty:
+                    self._cond.notify_all()  # повреждённый spill: join мог ждать именно его
+                    continue
+                self._lanes[name].task_done()
+                self._unfinished += 1
+                break
+        if isinstance(entry, dict):
+            queued, item = None, entry  # spill прежней версии: событие без отметки времени
+        else:
+            queued, item = entry
+        self.served[name] += 1
+        if queued is not None:
+            self.wait_latency[name].record(self._clock() - queued)
+        return (name, queued), item
+
+    def _pick(self) -> str:
+        """Highest non-empty lane, unless a lower one has been passed over too often."""
+        waiting = [name for name in self.order if self._lanes[name].qsize()]
+        if not waiting:
+            raise queue.Empty
+        choice = waiting[0]
+        for name in waiting[1:]:
+            if self._skipped[name] >= self.starvation_limit:
+                choice = name
+                self.starvation_serves_total += 1
+                break
+        for name in waiting:
+            self._skipped[name] = 0 if name == choice else self._skipped[name] + 1
+        return choice
+
+    def task_done(self, ticket: tuple[str, Optional[float]]) -> None:
+        name, queued = ticket
+        if queued is not None:
+            self.total_latency[name].record(self._clock() - queued)
+        with self._cond:
+            if self._unfinished <= 0:
+                raise ValueError("task_done() called too many times")
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._cond.notify_all()
+
+    def qsize(self) -> int:
+        return sum(lane.qsize() for lane in self._lanes.values())
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def persist(self) -> int:
+        """Writes every lane's in-memory events to its spill directory (shutdown)."""
+        return sum(self._lanes[name].persist() for name in self.order)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every lane is empty and every item handed out is finished.
+        Returns False if that did not happen within timeout seconds.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._unfinished and self.empty(), timeout=timeout
+            )
+
+    def stats(self) -> dict:
+        return {
+            "starvation_limit": self.starvation_limit,
+            "starvation_serves_total": self.starvation_serves_total,
+            "lanes": {
+                name: {
+                    **self._lanes[name].stats(),
+                    "served_total": self.served[name],
+                    "wait": self.wait_latency[name].stats(),
+                    "total": self.total_latency[name].stats(),
+                }
+                for name in self.order
+            },
+        }
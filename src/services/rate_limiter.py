@@ -0,0 +1,106 @@
+"""
+Client-side token buckets, so the sender paces itself instead of learning its speed from
+429 responses. There is one bucket per destination (portal, EDDN), and the portal also
+has one bucket per API key. A request takes one token from each bucket it passes. A
+batch is one request. When a bucket is empty the caller awaits the refill, so events
+wait in the lane or batcher rather than being sent and rejected.
+"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` stored. rate <= 0 means unlimited."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+        # Метрики
+        self.acquired_total = 0
+        self.throttled_total = 0
+        self.waited_sec_total = 0.0
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        if self.unlimited:
+            self.acquired_total += 1
+            return True
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            self.acquired_total += 1
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` are available (0 if they are now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Waits for and takes `tokens`. Returns the seconds spent waiting."""
+        waited = 0.0
+        while not self.try_acquire(tokens):
+            delay = self.wait_time(tokens)
+            waited += delay
+            await asyncio.sleep(delay)
+        if waited:
+            self.throttled_total += 1
+            self.waited_sec_total += waited
+        return waited
+
+    def stats(self) -> dict:
+        if not self.unlimited:
+            self._refill()
+        return {
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "tokens": None if self.unlimited else round(self._tokens, 2),
+            "acquired_total": self.acquired_total,
+            "throttled_total": self.throttled_total,
+            "waited_sec_total": round(self.waited_sec_total, 3),
+        }
+
+
+class RateLimiter:
+    """Destination buckets plus lazily created per-key buckets for one destination."""
+
+    def __init__(self, rate: float, burst: float, key_rate: float = 0, key_burst: float = 1):
+        self.bucket = TokenBucket(rate, burst)
+        self.key_rate = key_rate
+        self.key_burst = key_burst
+        self._keys: dict[str, TokenBucket] = {}
+
+    async def acquire(self, key: Optional[str] = None) -> float:
+        """One request: the per-key bucket first (so one key cannot drain the shared one)."""
+        waited = 0.0
+        if key is not None and self.key_rate > 0:
+            bucket = self._keys.get(key)
+            if bucket is None:
+                bucket = self._keys[key] = TokenBucket(self.key_rate, self.key_burst)
+            waited += await bucket.acquire()
+        waited += await self.bucket.acquire()
+        return waited
+
+    def stats(self) -> dict:
+        return {
+            **self.bucket.stats(),
+            # API-ключи в метриках не показываем целиком
+            "keys": {f"…{key[-4:]}": b.stats() for key, b in self._keys.items()},
+        }
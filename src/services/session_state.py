@@ -0,0 +1,106 @@
+"""
+Table-driven CURRENT_SESSION state machine shared by the live path (process_line) and
+the startup recovery scan. Each event type maps to a tuple of small updater functions
+compiled once at import, so routing a line costs one dict lookup.
+
+An updater receives the decoded event and an `apply(field, value)` callback. The live
+path assigns straight into CURRENT_SESSION; the reverse recovery scan passes
+dict.setdefault so the first (= newest) value it meets wins.
+"""
+
+from typing import Callable
+
+Apply = Callable[[str, object], object]
+
+# Technical Truth: travel events that carry Taxi / Multicrew flags
+TRAVEL_EVENTS = frozenset(
+    {
+        "Location",
+        "Liftoff",
+        "Touchdown",
+        "SupercruiseEntry",
+        "SupercruiseExit",
+        "FSDJump",
+        "Embark",
+        "Disembark",
+        "Docked",
+        "Undocked",
+    }
+)
+
+
+def update_commander(event_data: dict, apply: Apply) -> None:
+    commander_name = event_data.get("Name") or event_data.get("Commander")
+    if commander_name:
+        apply("commander", commander_name)
+
+
+def update_game_version(event_data: dict, apply: Apply) -> None:
+    apply("gameversion", event_data.get("gameversion") or "")
+    apply("gamebuild", event_data.get("build") or "")
+
+
+def update_dlc_flags(event_data: dict, apply: Apply) -> None:
+    """Technical Truth: DLC flags from Fileheader / LoadGame."""
+    if "Horizons" in event_data:
+        apply("is_horizons", bool(event_data["Horizons"]))
+    if "Odyssey" in event_data:
+        apply("is_odyssey", bool(event_data["Odyssey"]))
+
+
+def update_travel_flags(event_data: dict, apply: Apply) -> None:
+    """Technical Truth: Taxi / Multicrew from travel events."""
+    if "Taxi" in event_data:
+        apply("is_taxi", bool(event_data["Taxi"]))
+    if "Multicrew" in event_data:
+        apply("is_multicrew", bool(event_data["Multicrew"]))
+
+
+def update_star_position(event_data: dict, apply: Apply) -> None:
+    star_system = event_data.get("StarSystem")
+    if star_system is not None:
+        apply("star_system", star_system or "")
+    star_pos = event_data.get("StarPos")
+    if star_pos is not None:
+        apply("star_pos", star_pos if isinstance(star_pos, list) else [])
+
+
+# (updater, CURRENT_SESSION fields it sets, events it handles)
+_SESSION_RULES = (
+    (update_commander, ("commander",), ("Commander", "LoadGame")),
+    (update_game_version, ("gameversion", "gamebuild"), ("LoadGame",)),
+    (update_dlc_flags, ("is_horizons", "is_odyssey"), ("Fileheader", "LoadGame")),
+    (update_star_position, ("star_system", "star_pos"), ("FSDJump", "Location")),
+    (update_travel_flags, ("is_taxi", "is_multicrew"), tuple(sorted(TRAVEL_EVENTS))),
+)
+
+
+def _compile_rules(rules):
+    updaters = {}
+    field_sources = {}
+    for updater, fields, events in rules:
+        for event_type in events:
+            updaters.setdefault(event_type, []).append(updater)
+        for field in fields:
+            field_sources.setdefault(field, set()).update(events)
+    return (
+        {event_type: tuple(funcs) for event_type, funcs in updaters.items()},
+        {field: frozenset(events) for field, events in field_sources.items()},
+    )
+
+
+# event type -> updaters; CURRENT_SESSION field -> events that can set it
+SESSION_UPDATERS, SESSION_FIELD_SOURCES = _compile_rules(_SESSION_RULES)
+
+# Events that update CURRENT_SESSION: never prefiltered, even when events.json ignores them
+SESSION_EVENTS = frozenset(SESSION_UPDATERS)
+
+
+def apply_session_event(event_type: str, event_data: dict, apply: Apply) -> bool:
+    """Runs the updaters for event_type. Returns False if the event does not touch the session."""
+    updaters = SESSION_UPDATERS.get(event_type)
+    if not updaters:
+        return False
+    for updater in updaters:
+        updater(event_data, apply)
+    return True
@@ -0,0 +1,292 @@
+"""
+Bounded watcher -> sender queue with spill-to-disk.
+Up to `high_watermark` events live in memory. Above it (e.g. while the portal answers 429
+and the worker sleeps) new events are appended to NDJSON segment files in the app data
+dir, in order. When the in-memory depth falls to `low_watermark`, spilled events are read
+back oldest-first. Segments left over from a previous run are picked up on start, and
+persist() (shutdown) writes what is still in memory ahead of them, so nothing queued is lost.
+Drop-in for the queue.Queue subset the Sender uses: put/get/qsize/empty/task_done/join.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Optional
+
+from src.services import json_codec
+
+DEFAULT_HIGH_WATERMARK = 1000
+DEFAULT_LOW_WATERMARK = 250
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+SEGMENT_GLOB = "segment-*.ndjson"
+
+
+class SpillQueue:
+    def __init__(
+        self,
+        spill_dir,
+        high_watermark: int = DEFAULT_HIGH_WATERMARK,
+        low_watermark: int = DEFAULT_LOW_WATERMARK,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+    ):
+        self.spill_dir = Path(spill_dir)
+        self.high_watermark = max(1, high_watermark)
+        self.low_watermark = min(max(0, low_watermark), self.high_watermark - 1)
+        self.segment_max_bytes = segment_max_bytes
+
+        self._cond = threading.Condition()
+        self._memory = deque()
+        self._unfinished = 0
+        self._spilled = 0  # событий на диске, ещё не прочитанных обратно
+        self._segments = deque()  # закрытые и текущий сегменты, старые первыми
+        self._segment_seq = 0
+        self._writer = None
+        self._writer_path: Optional[Path] = None
+        self._writer_bytes = 0
+        self._reader = None
+
+        # Метрики
+        self.spilled_total = 0
+        self.restored_total = 0
+        self.spill_episodes = 0
+        self.max_depth = 0
+
+        self._load_existing_segments()
+
+    # --- queue.Queue-compatible API ---
+
+    def put(self, item: Any) -> None:
+        """Never blocks the producer: above the high watermark the item goes to disk."""
+        with self._cond:
+            if self._spilled or len(self._memory) >= self.high_watermark:
+                if not self._spill(item):
+                    self._memory.append(item)  # диск недоступен — лучше память, чем потеря
+            else:
+                self._memory.append(item)
+            self._unfinished += 1
+            self.max_depth = max(self.max_depth, len(self._memory) + self._spilled)
+            self._cond.notify()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._memory and not self._spilled:
+                if not block:
+                    raise queue.Empty
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+            if self._spilled and len(self._memory) <= self.low_watermark:
+                self._restore()
+            if not self._memory:
+                raise queue.Empty  # сегменты оказались повреждены
+            return self._memory.popleft()
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._memory) + self._spilled
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def task_done(self) -> None:
+        with self._cond:
+            if self._unfinished <= 0:
+                raise ValueError("task_done() called too many times")
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._cond.notify_all()
+
+    def join(self) -> None:
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth": len(self._memory),
+                "spilled_pending": self._spilled,
+                "spilled_total": self.spilled_total,
+                "restored_total": self.restored_total,
+                "spill_episodes": self.spill_episodes,
+                "max_depth": self.max_depth,
+                "high_watermark": self.high_watermark,
+                "low_watermark": self.low_watermark,
+            }
+
+    def persist(self) -> int:
+        """
+        Writes the in-memory items to disk ahead of the spilled ones, so the next start
+        delivers them first, in order (shutdown). Returns how many were written.
+        """
+        with self._cond:
+            if not self._memory:
+                self._close_writer()
+                return 0
+            lines = []
+            for item in self._memory:
+                try:
+                    lines.append(json_codec.dumps(item) + b"\n")
+                except (TypeError, ValueError) as e:
+                    logging.error("Could not serialize event for persist: %s", e)
+            try:
+                if self._segments:
+                    # Первый сегмент переписывается: память + его ещё не прочитанный хвост
+                    head = self._segments[0]
+                    if self._reader is not None:
+                        rest = self._reader.read()
+                        self._reader.close()
+                        self._reader = None
+                    else:
+                        if head == self._writer_path:
+                            self._close_writer()
+                        rest = head.read_bytes()
+                else:
+                    self.spill_dir.mkdir(parents=True, exist_ok=True)
+                    head = self._next_segment_path()
+                    rest = b""
+                tmp = head.with_suffix(".tmp")
+                with open(tmp, "wb") as f:
+                    f.writelines(lines)
+                    f.write(rest)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, head)
+            except OSError as e:
+                logging.error("Could not persist queued events: %s", e)
+                return 0
+            self._close_writer()
+            if not self._segments:
+                self._segments.append(head)
+            self._unfinished -= len(self._memory) - len(lines)
+            self._memory.clear()
+            self._spilled += len(lines)
+            return len(lines)
+
+    # --- Spill / restore (called under self._cond) ---
+
+    def _next_segment_path(self) -> Path:
+        self._segment_seq += 1
+        return self.spill_dir / f"segment-{self._segment_seq:08d}.ndjson"
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except OSError:
+                pass
+        self._writer = None
+        self._writer_path = None
+        self._writer_bytes = 0
+
+    def _spill(self, item: Any) -> bool:
+        try:
+            line = json_codec.dumps(item) + b"\n"
+        except (TypeError, ValueError) as e:
+            logging.error("Could not serialize event for spill: %s", e)
+            return False
+        try:
+            if self._writer is None or self._writer_bytes >= self.segment_max_bytes:
+                self._close_writer()
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                self._writer_path = self._next_segment_path()
+                self._writer = open(self._writer_path, "ab")
+                self._segments.append(self._writer_path)
+            self._writer.write(line)
+            self._writer.flush()
+        except OSError as e:
+            logging.error("Could not spill event to disk: %s", e)
+            return False
+        if not self._spilled:
+            self.spill_episodes += 1
+            logging.warning(
+                "📦 Sender queue above %s events, spilling to %s",
+                self.high_watermark,
+                self.spill_dir,
+            )
+        self._writer_bytes += len(line)
+        self._spilled += 1
+        self.spilled_total += 1
+        return True
+
+    def _restore(self) -> None:
+        """Reads spilled events back (oldest first) until memory reaches the high watermark."""
+        while self._spilled and len(self._memory) < self.high_watermark:
+            if self._reader is None:
+                if not self._segments:
+                    self._drop_lost(self._spilled)
+                    break
+                path = self._segments[0]
+                if path == self._writer_path:
+                    self._close_writer()  # дальше пишем в новый сегмент, этот читаем
+                try:
+                    self._reader = open(path, "rb")
+                except OSError as e:
+                    logging.error("Could not open spill segment %s: %s", path, e)
+                    self._segments.popleft()
+                    continue
+            raw = self._reader.readline()
+            if not raw.strip():
+                if raw:
+                    continue
+                self._reader.close()
+                self._reader = None
+                try:
+                    self._segments.popleft().unlink()
+                except OSError:
+                    pass
+                continue
+            self._spilled -= 1
+            try:
+                self._memory.append(json_codec.loads(raw))
+                self.restored_total += 1
+            except ValueError:
+                logging.warning("Skipping corrupt spilled event.")
+                self._drop_lost(0)
+        if not self._spilled:
+            # Всё прочитано: закрываем и удаляем оставшиеся (уже вычитанные) сегменты
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            self._close_writer()
+            while self._segments:
+                self._segments.popleft().unlink(missing_ok=True)
+            logging.info("📦 Spilled events restored, sender queue back in memory.")
+
+    def _drop_lost(self, count: int) -> None:
+        """Accounts for spilled events that can no longer be read (count, or one corrupt line)."""
+        lost = count or 1
+        self._spilled = max(0, self._spilled - count)
+        self._unfinished = max(0, self._unfinished - lost)
+        if self._unfinished == 0:
+            self._cond.notify_all()
+
+    def _load_existing_segments(self) -> None:
+        """Counts events left on disk by a previous run so they are delivered first."""
+        if not self.spill_dir.exists():
+            return
+        for path in sorted(self.spill_dir.glob(SEGMENT_GLOB)):
+            try:
+                seq = int(path.stem.split("-")[1])
+                with open(path, "rb") as f:
+                    count = sum(1 for line in f if line.strip())
+            except (OSError, ValueError, IndexError):
+                continue
+            self._segment_seq = max(self._segment_seq, seq)
+            if not count:
+                path.unlink(missing_ok=True)
+                continue
+            self._segments.append(path)
+            self._spilled += count
+            self._unfinished += count
+        if self._spilled:
+            logging.info("📦 %s spilled event(s) from the previous run queued.", self._spilled)
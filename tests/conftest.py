@@ -0,0 +1,66 @@
+"""
+Tests run outside the packaged app: APPDATA points at a throwaway directory before config
+is imported (it creates %APPDATA%/SkyLink at import time), and the repo root is importable.
+Shared fixtures: a local portal stand-in and Senders configured against it.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="skylink-tests-")
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import sender as sender_module  # noqa: E402
+from config import CURRENT_SESSION, Config  # noqa: E402
+from tests.portal_stub import PortalStub  # noqa: E402
+
+COMMANDER = "Tester"
+
+
+@pytest.fixture
+def portal_stub():
+    stub = PortalStub().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def make_sender(tmp_path, portal_stub, monkeypatch):
+    """
+    make_sender(**config) -> a Sender posting to portal_stub, with dedup on for FSDJump
+    and Scan and no client-side rate limits. Started unless start=False; stopped at teardown.
+    """
+    monkeypatch.setattr(sender_module, "OFFLINE_RETRY_PAUSE_SEC", 3600)  # повторы — вручную
+    monkeypatch.setitem(CURRENT_SESSION, "commander", None)
+    monkeypatch.setitem(CURRENT_SESSION, "api_key", None)
+    senders = []
+
+    def make(accounts=None, start=True, **overrides):
+        config = Config()
+        config.app_data_dir = tmp_path
+        config.API_URL = portal_stub.url
+        config.accounts = accounts or {COMMANDER: "test-key"}
+        config.event_rules = {
+            "FSDJump": {"action": "send", "deduplicate": True},
+            "Scan": {"action": "send", "deduplicate": True},
+        }
+        config.portal_rate_per_sec = config.portal_key_rate_per_sec = 0
+        for name, value in overrides.items():
+            setattr(config, name, value)
+        sender = sender_module.Sender(tmp_path / "deduplication_cache.json", config)
+        if start:
+            sender.start()
+        senders.append(sender)
+        return sender
+
+    yield make
+    for sender in senders:
+        if sender.is_alive():
+            sender.stop()
+            sender.join(timeout=5)
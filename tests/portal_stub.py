@@ -0,0 +1,131 @@
+"""
+Local stand-in for the SkyLink portal: accepts single uploads on <path> and batches
+(JSON array) on <path>/batch, answering {"results": [{"status": ...}, ...]} per event.
+Used by the tests (through the portal_stub fixture in conftest.py), the benchmarks, and
+for manual runs against a running client:
+    python -m tests.portal_stub [port]
+then set SKYLINK_API_URL=http://127.0.0.1:<port>/api/telemetry/skylink.
+"""
+
+import gzip
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PATH = "/api/telemetry/skylink"
+
+
+class PortalStub:
+    """
+    latency_ms: delay per request (emulates the round trip to the real portal).
+    reject: {event type: status} answered for those events, inside or outside a batch.
+    accept_batches=False answers 404 on /batch, like a portal without the endpoint.
+    api_path: another path (e.g. "/upload/") turns the stub into an EDDN gateway stand-in.
+    force_status / retry_after (settable at runtime): answer every request with that status
+    and Retry-After header, e.g. 429 or 503 to emulate a degraded service.
+    accept_gzip=False answers 415 to gzip-encoded bodies (a server without decompression).
+    """
+
+    def __init__(
+        self,
+        port=0,
+        latency_ms=0,
+        reject=None,
+        accept_batches=True,
+        api_path=API_PATH,
+        accept_gzip=True,
+    ):
+        self.api_path = api_path
+        self.latency = latency_ms / 1000.0
+        self.reject = dict(reject or {})
+        self.accept_batches = accept_batches
+        self.accept_gzip = accept_gzip
+        self.force_status = None
+        self.retry_after = None
+        self.requests = []  # (path, headers, event count)
+        self.events = []
+        self.rejected = 0  # ответов force_status
+        self.wire_bytes = 0  # тела запросов как пришли (после сжатия клиентом)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, как у настоящих серверов
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.wire_bytes += len(body)
+                encoding = self.headers.get("Content-Encoding")
+                if encoding == "gzip" and stub.accept_gzip:
+                    body = gzip.decompress(body)
+                if stub.force_status is not None:
+                    status, payload = stub.force_status, b"{}"
+                    stub.rejected += 1
+                elif encoding and (encoding != "gzip" or not stub.accept_gzip):
+                    status, payload = 415, b"{}"
+                else:
+                    status, payload = stub._handle(self.path, dict(self.headers), body)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                self.send_response(status)
+                if stub.force_status is not None and stub.retry_after is not None:
+                    self.send_header("Retry-After", str(stub.retry_after))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}{api_path}"
+
+    def _handle(self, path, headers, body):
+        try:
+            decoded = json.loads(body)
+        except ValueError:
+            return 400, b'{"error": "bad json"}'
+        if path == f"{self.api_path.rstrip('/')}/batch":
+            if not self.accept_batches or not isinstance(decoded, list):
+                return 404, b"{}"
+            statuses = [self.reject.get(e.get("event"), 200) for e in decoded]
+            with self._lock:
+                self.requests.append((path, headers, len(decoded)))
+                self.events.extend(e for e, s in zip(decoded, statuses) if s == 200)
+            results = {"results": [{"status": s} for s in statuses]}
+            return 200, json.dumps(results).encode()
+        if path == self.api_path and isinstance(decoded, dict):
+            status = self.reject.get(decoded.get("event"), 200)
+            with self._lock:
+                self.requests.append((path, headers, 1))
+                if status == 200:
+                    self.events.append(decoded)
+            return status, b"{}"
+        return 404, b"{}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.events.clear()
+            self.rejected = 0
+            self.wire_bytes = 0
+
+
+if __name__ == "__main__":
+    stub = PortalStub(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Portal stub listening on {stub.url} (batches on {stub.url}/batch)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
@@ -0,0 +1,36 @@
+"""body_compressor.post against a server that refuses compressed bodies (415)."""
+
+import asyncio
+
+import httpx
+
+from src.services import body_compressor
+from src.services.body_compressor import BodyCompressor
+
+BODY = b'{"event": "Scan", "Parents": []}' * 100
+
+
+def test_refused_compressed_body_is_resent_raw_and_counted_once():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("Content-Encoding"))
+        return httpx.Response(415 if "Content-Encoding" in request.headers else 200)
+
+    async def send():
+        compressor = BodyCompressor("portal", min_bytes=0)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            response = await body_compressor.post(
+                client, "http://portal.invalid/", BODY, {}, compressor
+            )
+        return response, compressor.stats()
+
+    response, stats = asyncio.run(send())
+
+    assert response.status_code == 200
+    assert seen == ["gzip", None]
+    assert stats["algorithm"] == "none"
+    assert (stats["requests_total"], stats["compressed_total"]) == (1, 0)
+    assert stats["raw_bytes_total"] == len(BODY)
+    assert stats["wire_bytes_total"] > len(BODY)  # по сети прошли обе попытки
+    assert stats["saved_ratio"] < 0
@@ -0,0 +1,44 @@
+"""
+Live events are sent for the commander whose session they were read in, even when the
+watcher has switched CURRENT_SESSION before the sender gets to them.
+"""
+
+import base64
+import copy
+
+from benchmarks._common import EVENT_SHAPES
+from config import CURRENT_SESSION
+
+
+def live_scan(body_id):
+    data = copy.deepcopy(EVENT_SHAPES["Scan"])
+    data["BodyID"] = body_id
+    data.update(_send_to_portal=True, _skip_eddn=True)
+    return data
+
+
+def sent_for(portal_stub):
+    """{BodyID: (commander, API key)} of the single uploads the stub accepted."""
+    result = {}
+    for (_, headers, _), event in zip(portal_stub.requests, portal_stub.events):
+        commander = base64.b64decode(headers["x-commander"]).decode()
+        result[event["BodyID"]] = (commander, headers["x-api-key"])
+    return result
+
+
+def test_events_queued_before_a_switch_keep_their_commander(portal_stub, make_sender, monkeypatch):
+    sender = make_sender(accounts={"Alpha": "alpha-key", "Beta": "beta-key"}, start=False)
+    monkeypatch.setitem(CURRENT_SESSION, "commander", "Alpha")
+    sender.queue_event(live_scan(1))
+    sender.queue_event(live_scan(2))
+    monkeypatch.setitem(CURRENT_SESSION, "commander", "Beta")  # следующий LoadGame
+    sender.queue_event(live_scan(3))
+
+    sender.start()
+    assert sender.event_queue.join(timeout=10)
+
+    assert sent_for(portal_stub) == {
+        1: ("Alpha", "alpha-key"),
+        2: ("Alpha", "alpha-key"),
+        3: ("Beta", "beta-key"),
+    }
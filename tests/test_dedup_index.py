@@ -0,0 +1,88 @@
+"""
+DedupIndex with several uploads of one (commander, event type) in flight: each upload
+commits or rolls back only its own digest, and nothing pending is persisted.
+"""
+
+import pytest
+
+from src.services.dedup_index import DedupIndex
+
+A = b"a" * 16
+B = b"b" * 16
+KEY = DedupIndex.key("Tester", "Loadout")
+
+
+def never_other_scheme():
+    raise AssertionError("not an entry of the other scheme")
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "deduplication_cache.json"
+
+
+@pytest.fixture
+def index(cache_path):
+    index = DedupIndex(cache_path)
+    yield index
+    index.close()
+
+
+def reopen(index, cache_path):
+    index.close()
+    return DedupIndex(cache_path)
+
+
+def test_identical_event_is_not_dropped_while_the_first_is_in_flight(index):
+    index.set(KEY, A)
+    assert not index.matches(KEY, A, never_other_scheme)
+    index.set(KEY, A)
+
+    index.rollback(KEY, A)  # первая отправка не удалась
+    index.commit(KEY, A)
+
+    assert index.matches(KEY, A, never_other_scheme)
+    assert index.pending() == 0
+
+
+def test_rollback_leaves_other_pending_digest_and_stored_entry(index, cache_path):
+    index.set(KEY, A)
+    index.commit(KEY, A)
+    index.set(KEY, B)
+    index.set(KEY, A)
+
+    index.rollback(KEY, B)
+
+    assert index.matches(KEY, A, never_other_scheme)
+    assert index.pending() == 1
+    reopened = reopen(index, cache_path)
+    assert reopened.get(KEY) == A
+    reopened.close()
+
+
+def test_commit_persists_only_the_committing_event_digest(index, cache_path):
+    index.set(KEY, A)
+    index.set(KEY, B)
+
+    index.commit(KEY, A)  # B ещё в полёте: после сбоя должна остаться запись A
+
+    reopened = reopen(index, cache_path)
+    assert reopened.get(KEY) == A
+    reopened.close()
+
+
+def test_pending_digest_is_not_persisted(index, cache_path):
+    index.set(KEY, A)
+
+    reopened = reopen(index, cache_path)
+    assert reopened.get(KEY) is None
+    assert reopened.snapshot() == {}
+    reopened.close()
+
+
+def test_purge_drops_pending_digests(index):
+    index.set(KEY, A)
+    index.purge_commander("Tester")
+    index.rollback(KEY, A)
+
+    assert index.pending() == 0
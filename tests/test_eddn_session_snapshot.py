@@ -0,0 +1,53 @@
+"""
+EDDN uploads carry the session as it was when the line was read: a Scan queued before the
+next FSDJump keeps its own system's StarSystem and StarPos, however late it is sent.
+"""
+
+import copy
+
+import pytest
+
+from benchmarks._common import EVENT_SHAPES
+from config import CURRENT_SESSION
+from src.services import eddn_sender
+from tests.portal_stub import PortalStub
+
+FIRST = {"star_system": "Synuefe XR-H d11-102", "star_pos": [357.34375, -49.34375, -74.75]}
+NEXT = {"star_system": "Col 285 Sector AA-A a1", "star_pos": [1.0, 2.0, 3.0]}
+
+
+@pytest.fixture
+def eddn_stub(monkeypatch):
+    stub = PortalStub(api_path="/upload/").start()
+    monkeypatch.setattr(eddn_sender, "EDDN_UPLOAD_URL", stub.url)
+    yield stub
+    stub.stop()
+
+
+def live_scan(body_id):
+    data = copy.deepcopy(EVENT_SHAPES["Scan"])
+    data["BodyID"] = body_id
+    del data["StarSystem"]  # как в журнале: систему и координаты EDDN берёт из сессии
+    return data
+
+
+def test_scan_queued_before_a_jump_keeps_its_system(eddn_stub, make_sender, monkeypatch):
+    sender = make_sender(start=False, eddn_rate_per_sec=0)
+    for field, value in {"commander": "Tester", "gameversion": "4.1", **FIRST}.items():
+        monkeypatch.setitem(CURRENT_SESSION, field, value)
+    sender.queue_event(live_scan(1))
+    for field, value in NEXT.items():
+        monkeypatch.setitem(CURRENT_SESSION, field, value)  # следующий FSDJump прочитан
+    sender.queue_event(live_scan(2))
+
+    sender.start()
+    assert sender.event_queue.join(timeout=10)
+
+    systems = {
+        upload["message"]["BodyID"]: (upload["message"]["StarSystem"], upload["message"]["StarPos"])
+        for upload in eddn_stub.events
+    }
+    assert systems == {
+        1: (FIRST["star_system"], FIRST["star_pos"]),
+        2: (NEXT["star_system"], NEXT["star_pos"]),
+    }
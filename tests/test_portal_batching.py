@@ -0,0 +1,133 @@
+"""
+Portal batching against the portal stub: PortalBatcher flush rules, and events queued on
+a running Sender — per-event results of a batch, partial failure, dedup rollback and the
+fallback to single uploads.
+"""
+
+import copy
+
+from benchmarks._common import EVENT_SHAPES
+from src.services.envelope import Envelope
+from src.services.portal_batcher import PortalBatcher
+from tests.conftest import COMMANDER
+
+
+def event(event_type, body_id=1):
+    data = copy.deepcopy(EVENT_SHAPES[event_type])
+    data["BodyID"] = body_id
+    data.update(_send_to_portal=True, _skip_eddn=True, _commander=COMMANDER)
+    return data
+
+
+def envelope(body=b"{}", commander=COMMANDER):
+    return Envelope(body, "Scan", commander, None, "http://portal.invalid")
+
+
+def send_all(sender, events):
+    for data in events:
+        sender.queue_event(data)
+    assert sender.event_queue.join(timeout=10)
+
+
+# --- PortalBatcher ---
+
+
+def test_batcher_flushes_at_max_events():
+    batcher = PortalBatcher(max_events=3, max_wait_ms=10_000)
+    assert batcher.add(COMMANDER, envelope()) == []
+    assert batcher.add(COMMANDER, envelope()) == []
+    [batch] = batcher.add(COMMANDER, envelope())
+    assert len(batch) == 3
+    assert batcher.pending() == 0
+    assert batcher.stats()["flush_reasons"]["events"] == 1
+
+
+def test_batcher_closes_previous_batch_when_next_event_overflows_bytes():
+    batcher = PortalBatcher(max_events=50, max_bytes=20, max_wait_ms=10_000)
+    assert batcher.add(COMMANDER, envelope(b"x" * 8)) == []
+    [batch] = batcher.add(COMMANDER, envelope(b"y" * 12))
+    assert batch.body() == b"[" + b"x" * 8 + b"]"
+    assert batcher.pending() == 1
+
+
+def test_batcher_keeps_commanders_apart():
+    batcher = PortalBatcher(max_events=2, max_wait_ms=10_000)
+    batcher.add("A", envelope(commander="A"))
+    assert batcher.add("B", envelope(commander="B")) == []
+    [batch] = batcher.add("A", envelope(commander="A"))
+    assert batch.commander == "A"
+    assert [b.commander for b in batcher.drain()] == ["B"]
+
+
+def test_batcher_due_after_max_wait():
+    batcher = PortalBatcher(max_events=50, max_wait_ms=100)
+    batcher.add(COMMANDER, envelope())
+    opened = batcher._open[COMMANDER].opened
+    assert batcher.due(now=opened + 0.05) == []
+    [batch] = batcher.due(now=opened + 0.1)
+    assert len(batch) == 1
+    assert batcher.stats()["flush_reasons"]["wait"] == 1
+
+
+# --- Sender against the portal stub ---
+
+
+def test_single_uploads_report_each_event(portal_stub, make_sender):
+    portal_stub.reject = {"Scan": 500}
+    sender = make_sender()
+
+    send_all(sender, [event("FSDJump"), event("Scan")])
+
+    assert [e["event"] for e in portal_stub.events] == ["FSDJump"]
+    assert [count for _, _, count in portal_stub.requests] == [1, 1]
+    assert portal_stub.requests[0][1]["x-api-key"] == "test-key"
+    assert len(sender.offline_queue) == 1
+
+
+def test_batch_partial_failure(portal_stub, make_sender):
+    portal_stub.reject = {"FSDJump": 500}
+    sender = make_sender(portal_batching=True, portal_batch_max_wait_ms=100)
+
+    send_all(sender, [event("Scan", 1), event("FSDJump", 2), event("Scan", 3)])
+
+    assert [(path, count) for path, _, count in portal_stub.requests] == [
+        (f"{portal_stub.api_path}/batch", 3)
+    ]
+    assert sorted(e["BodyID"] for e in portal_stub.events) == [1, 3]
+    [(_, event_type, _, _, attempts)] = sender.offline_queue.peek(COMMANDER, 10)
+    assert (event_type, attempts) == ("FSDJump", 1)
+
+
+def test_rejected_batch_item_rolls_back_dedup(portal_stub, make_sender):
+    portal_stub.reject = {"Scan": 500}
+    sender = make_sender(portal_batching=True, portal_batch_max_wait_ms=100)
+    send_all(sender, [event("FSDJump"), event("Scan")])
+    portal_stub.reject = {}
+    portal_stub.reset()
+
+    # Принятое событие отсеивается как дубликат, отклонённое отправляется снова
+    send_all(sender, [event("FSDJump"), event("Scan")])
+
+    assert [e["event"] for e in portal_stub.events] == ["Scan"]
+
+
+def test_missing_batch_endpoint_falls_back_to_single_uploads(portal_stub, make_sender):
+    portal_stub.accept_batches = False
+    sender = make_sender(portal_batching=True, portal_batch_max_wait_ms=100)
+
+    send_all(sender, [event("Scan", 1), event("Scan", 2)])
+    send_all(sender, [event("Scan", 3)])
+
+    assert sorted(e["BodyID"] for e in portal_stub.events) == [1, 2, 3]
+    assert sender.portal_batches_supported is False
+    assert [count for _, _, count in portal_stub.requests] == [1, 1, 1]
+
+
+def test_queued_events_go_out_in_batches(portal_stub, make_sender):
+    sender = make_sender(portal_batching=True, portal_batch_max_wait_ms=50)
+
+    send_all(sender, [event("Scan", body_id) for body_id in range(10)])
+
+    assert sorted(e["BodyID"] for e in portal_stub.events) == list(range(10))
+    assert len(portal_stub.requests) < 10
+    assert sender.get_batch_stats()["events_batched"] == 10
@@ -1,9 +1,12 @@
 import hashlib
-import json
 import logging
+import re
+from datetime import datetime
 
 import httpx
 
+from src.services import json_codec
+
 
 def calculate_hash(data, exclude_keys=None):
     """Calculates a SHA-256 hash of the given data, optionally excluding keys."""
@@ -19,7 +22,7 @@ def calculate_hash(data, exclude_keys=None):
             data_to_hash.pop(key, None)
 
     # Sort the dictionary to ensure consistent hash results
-    data_string = json.dumps(data_to_hash, sort_keys=True)
+    data_string = json_codec.dumps_canonical(data_to_hash)
 
     return hashlib.sha256(data_string.encode("utf-8")).hexdigest()
 
@@ -48,11 +51,53 @@ def filter_event_fields(event_data, field_rules):
     return filtered_data
 
 
+_EVENT_NAME_RE = re.compile(r'"event"\s*:\s*"([^"\\]*)"')
+
+
+def extract_event_name(line):
+    """
+    Pulls the "event" value out of a raw journal line without decoding JSON.
+    The game writes `"event":"Name"` compactly, so a plain find() covers almost every line;
+    the regex handles hand-written lines with spaces. Returns None if there is no event key.
+    """
+    idx = line.find('"event":"')
+    if idx >= 0:
+        start = idx + 9
+        end = line.find('"', start)
+        if end > start:
+            return line[start:end]
+    match = _EVENT_NAME_RE.search(line)
+    return match.group(1) if match else None
+
+
+# Journal.2026-03-14T180000.01.log (since 2021) and legacy Journal.170314180000.01.log
+_JOURNAL_NAME_RE = re.compile(
+    r"^Journal\.(?:(\d{4})-(\d{2})-(\d{2})T|(\d{2})(\d{2})(\d{2}))(\d{2})(\d{2})(\d{2})\.(\d{2})\.log$"
+)
+
+
+def parse_journal_filename(name):
+    """Returns (datetime, part) for a journal file name, or None for anything else."""
+    match = _JOURNAL_NAME_RE.match(name)
+    if not match:
+        return None
+    year, month, day, short_year, short_month, short_day, hour, minute, second, part = (
+        match.groups()
+    )
+    try:
+        if year is None:
+            year, month, day = 2000 + int(short_year), short_month, short_day
+        started = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    except ValueError:
+        return None
+    return started, int(part)
+
+
 def parse_json_line(line):
     """Parses a JSON string from a line of text."""
     try:
-        return json.loads(line)
-    except json.JSONDecodeError:
+        return json_codec.loads(line)
+    except ValueError:
         # This can happen if a line is not a valid JSON object, which might be the case for some file entries
         logging.debug(f"Could not decode JSON from line: {line.strip()}")
         return None